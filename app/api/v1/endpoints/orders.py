@@ -1,9 +1,23 @@
+from datetime import date, datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from app.api.v1.endpoints.auth import get_current_user
-from app.schemas.order import OrderCreate, OrderUpdate, OrderFilter
+from app.core.config import settings
+from app.core.count_cache import set_total_headers
+from app.core.order_events import order_event_hub
+from app.schemas.order import (
+    OrderBulkStatusResult,
+    OrderBulkStatusUpdate,
+    OrderCreate,
+    OrderFilter,
+    OrderUpdate,
+    SellerStatsResult,
+)
 from app.models.order import OrderResponse, OrderStatus, PaymentStatus
-from app.services.order_service import order_service
+from app.services.order_service import OrderConflict, order_service
+from app.services.seller_stats_service import seller_stats_service
+from app.utils.export import EXPORT_MEDIA_TYPES, ORDER_EXPORT_FIELDS, encode_rows, export_filename
 
 router = APIRouter()
 
@@ -21,12 +35,24 @@ async def create_order(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/bulk-status", response_model=OrderBulkStatusResult)
+async def bulk_update_order_status(
+    update: OrderBulkStatusUpdate,
+    current_user=Depends(get_current_user)
+):
+    """Move many orders to a new status in one request (only by seller)"""
+    return await order_service.bulk_update_status(update, current_user.id)
+
+
 @router.get("/", response_model=List[OrderResponse])
 async def get_my_orders(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: Optional[OrderStatus] = Query(None),
     payment_status: Optional[PaymentStatus] = Query(None),
+    include_total: bool = Query(False),
+    exact_total: bool = Query(False),
     current_user=Depends(get_current_user)
 ):
     """Get current user's orders (as buyer)"""
@@ -34,15 +60,26 @@ async def get_my_orders(
     orders = await order_service.get_user_orders(
         current_user.id, filter_data, skip, limit, as_buyer=True
     )
+
+    if include_total:
+        total, approximate = await order_service.count_user_orders(
+            current_user.id, filter_data, as_buyer=True,
+            exact=exact_total and settings.EXACT_COUNTS_ENABLED
+        )
+        set_total_headers(response, total, approximate)
+
     return orders
 
 
 @router.get("/sales", response_model=List[OrderResponse])
 async def get_my_sales(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: Optional[OrderStatus] = Query(None),
     payment_status: Optional[PaymentStatus] = Query(None),
+    include_total: bool = Query(False),
+    exact_total: bool = Query(False),
     current_user=Depends(get_current_user)
 ):
     """Get current user's sales (as seller)"""
@@ -50,9 +87,63 @@ async def get_my_sales(
     orders = await order_service.get_user_orders(
         current_user.id, filter_data, skip, limit, as_buyer=False
     )
+
+    if include_total:
+        total, approximate = await order_service.count_user_orders(
+            current_user.id, filter_data, as_buyer=False,
+            exact=exact_total and settings.EXACT_COUNTS_ENABLED
+        )
+        set_total_headers(response, total, approximate)
+
     return orders
 
 
+@router.get("/sales/export")
+async def export_my_sales(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    status: Optional[OrderStatus] = Query(None),
+    payment_status: Optional[PaymentStatus] = Query(None),
+    current_user=Depends(get_current_user)
+):
+    """Stream current user's full sales history as CSV or NDJSON"""
+    filter_data = OrderFilter(status=status, payment_status=payment_status)
+    rows = order_service.export_user_orders(current_user.id, filter_data, as_buyer=False)
+
+    return StreamingResponse(
+        encode_rows(rows, fmt, ORDER_EXPORT_FIELDS),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename("sales", fmt)}"'
+        }
+    )
+
+
+@router.get("/sales/stats", response_model=SellerStatsResult)
+async def get_my_sales_stats(
+    days: int = Query(30, ge=1, le=366),
+    end: Optional[date] = Query(None, description="Last day (UTC), defaults to today"),
+    current_user=Depends(get_current_user)
+):
+    """Daily order count, units and revenue for current user's sales"""
+    end = end or datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    return await seller_stats_service.get_daily_stats(current_user.id, start, end)
+
+
+@router.get("/events")
+async def stream_order_events(current_user=Depends(get_current_user)):
+    """Server-sent events for status changes on current user's orders and sales"""
+    if order_event_hub.connections >= settings.ORDER_EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Too many open event streams",
+                            headers={"Retry-After": "5"})
+
+    return StreamingResponse(
+        order_event_hub.stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: str,
@@ -78,7 +169,12 @@ async def update_order(
     current_user=Depends(get_current_user)
 ):
     """Update order status (only by seller)"""
-    order = await order_service.update_order(order_id, order_data, current_user.id)
+    try:
+        order = await order_service.update_order(order_id, order_data, current_user.id)
+    except OrderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not order:
         raise HTTPException(status_code=404,
                             detail="Order not found or not authorized")
@@ -1,10 +1,36 @@
+import json
+from tempfile import SpooledTemporaryFile
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from app.api.v1.endpoints.auth import get_current_user
-from app.schemas.product import ProductCreate, ProductUpdate, ProductFilter
+from app.core.conditional import (
+    LISTING_CACHE_CONTROL,
+    PRODUCT_CACHE_CONTROL,
+    conditional_body,
+    conditional_json,
+    document_etag,
+    is_not_modified,
+    not_modified,
+    render_json,
+    set_cache_headers,
+)
+from app.core.config import settings
+from app.core.database import CATALOG_READ
+from app.core.count_cache import normalize_query, set_total_headers, total_headers
+from app.core.microcache import CachedBody, product_listing_cache
+from app.schemas.product import (
+    ProductBatchResponse, ProductCreate, ProductFilter, ProductUpdate, TrendingProduct
+)
 from app.models.product import ProductResponse, ProductCondition
+from app.services.duplicate_service import DuplicateListing
 from app.services.product_service import product_service
+from app.services.similarity_service import similarity_service
+from app.services.trending_service import trending_service
+from app.utils.bulk_import import RowTooLarge, iter_csv_rows, iter_lines, iter_ndjson_rows
+from app.utils.export import EXPORT_MEDIA_TYPES, PRODUCT_EXPORT_FIELDS, encode_rows, export_filename
 from app.utils.image_upload import image_upload_service
+from app.utils.object_ids import parse_id_list
 
 router = APIRouter()
 
@@ -15,12 +41,53 @@ async def create_product(
     current_user=Depends(get_current_user)
 ):
     """Create a new product"""
-    product = await product_service.create_product(product_data, current_user.id)
+    try:
+        product = await product_service.create_product(product_data, current_user.id)
+    except DuplicateListing as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return await product_service.get_product_by_id(product.id)
 
 
+@router.post("/bulk")
+async def bulk_import_products(
+    request: Request,
+    current_user=Depends(get_current_user)
+):
+    """Bulk import products from an NDJSON or CSV request body.
+
+    Rows are validated and inserted while the body is still uploading; the
+    per-row results are streamed back as NDJSON.
+    """
+    content_type = request.headers.get("content-type", "")
+    lines = iter_lines(request.stream())
+    if "csv" in content_type:
+        rows = iter_csv_rows(lines)
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        rows = iter_ndjson_rows(lines)
+    else:
+        raise HTTPException(status_code=415,
+                            detail="Use application/x-ndjson or text/csv")
+
+    # Results are spooled (to disk past the threshold) so memory stays flat
+    results = SpooledTemporaryFile(max_size=settings.BULK_IMPORT_RESULT_SPOOL_BYTES)
+    try:
+        async for result in product_service.bulk_create_products(
+                rows, current_user.id, settings.BULK_IMPORT_BATCH_SIZE):
+            results.write(json.dumps(result).encode() + b"\n")
+    except RowTooLarge as e:
+        results.write(json.dumps({"status": "aborted", "error": str(e)}).encode() + b"\n")
+    results.seek(0)
+
+    def stream_results():
+        with results:
+            yield from iter(lambda: results.read(64 * 1024), b"")
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     category: Optional[str] = Query(None),
@@ -28,7 +95,9 @@ async def get_products(
     max_price: Optional[float] = Query(None, ge=0),
     condition: Optional[ProductCondition] = Query(None),
     location: Optional[str] = Query(None),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    include_total: bool = Query(False),
+    exact_total: bool = Query(False)
 ):
     """Get products with filters"""
     filter_data = ProductFilter(
@@ -39,35 +108,134 @@ async def get_products(
         location=location,
         search=search
     )
+    exact = exact_total and settings.EXACT_COUNTS_ENABLED
 
-    products = await product_service.get_products(filter_data, skip, limit)
-    return products
+    async def render() -> CachedBody:
+        products = await product_service.get_products(filter_data, skip, limit)
+        headers = {}
+        if include_total:
+            total, approximate = await product_service.count_products(
+                filter_data, exact=exact)
+            headers = total_headers(total, approximate)
+        return CachedBody(render_json(products), headers)
+
+    if exact:
+        page = await render()
+    else:
+        # The listing doesn't depend on the caller, so identical queries share
+        # one short-lived rendered page
+        key = normalize_query({
+            "filter": filter_data.dict(),
+            "skip": skip,
+            "limit": limit,
+            "include_total": include_total,
+        })
+        page = await product_listing_cache.get_or_compute(key, render)
+
+    return conditional_body(
+        request, page.body, LISTING_CACHE_CONTROL, page.headers, page.etag, page.encoded)
 
 
 @router.get("/my-products", response_model=List[ProductResponse])
 async def get_my_products(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    include_total: bool = Query(False),
+    exact_total: bool = Query(False),
     current_user=Depends(get_current_user)
 ):
     """Get current user's products"""
     products = await product_service.get_user_products(current_user.id, skip, limit)
+
+    if include_total:
+        total, approximate = await product_service.count_user_products(
+            current_user.id, exact=exact_total and settings.EXACT_COUNTS_ENABLED
+        )
+        set_total_headers(response, total, approximate)
+
     return products
 
 
+@router.get("/my-products/export")
+async def export_my_products(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    current_user=Depends(get_current_user)
+):
+    """Stream current user's full catalog as CSV or NDJSON"""
+    rows = product_service.export_user_products(current_user.id)
+
+    return StreamingResponse(
+        encode_rows(rows, fmt, PRODUCT_EXPORT_FIELDS),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename("products", fmt)}"'
+        }
+    )
+
+
+@router.get("/trending", response_model=List[TrendingProduct])
+async def get_trending_products(
+    request: Request,
+    category: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=50)
+):
+    """Get popular products, overall or in one category (precomputed, served from memory)"""
+    return conditional_json(
+        request, trending_service.top(category, limit), LISTING_CACHE_CONTROL)
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated product IDs")
+):
+    """Get several products by ID in request order; views are not counted"""
+    try:
+        product_ids = parse_id_list(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    products, missing = await product_service.get_products_batch(
+        product_ids, route=CATALOG_READ)
+    return conditional_json(
+        request, ProductBatchResponse(items=products, missing=missing),
+        PRODUCT_CACHE_CONTROL)
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str):
+async def get_product(product_id: str, request: Request, response: Response):
     """Get product by ID"""
-    product = await product_service.get_product_by_id(product_id)
+    product = await product_service.get_product_by_id(product_id, route=CATALOG_READ)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     # Increment views
-    await product_service.increment_views(product_id)
+    await product_service.increment_views(product_id, product.category)
+
+    # Answer revalidations before serialization; the embedded seller snapshot's
+    # version is part of the validator so profile changes are picked up
+    seller_version = (product.seller_info or {}).get("version")
+    etag = document_etag(product.id, product.updated_at, seller_version)
+    if is_not_modified(request, etag, product.updated_at):
+        return not_modified(etag, PRODUCT_CACHE_CONTROL, product.updated_at)
+
+    set_cache_headers(response, etag, PRODUCT_CACHE_CONTROL, product.updated_at)
 
     return product
 
 
+@router.get("/{product_id}/similar", response_model=List[ProductResponse])
+async def get_similar_products(
+    product_id: str,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Get products similar to this one (precomputed, same category)"""
+    products = await similarity_service.get_similar(product_id, limit)
+    return conditional_json(request, products, LISTING_CACHE_CONTROL)
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: str,
@@ -75,7 +243,10 @@ async def update_product(
     current_user=Depends(get_current_user)
 ):
     """Update product (only by owner)"""
-    product = await product_service.update_product(product_id, product_data, current_user.id)
+    try:
+        product = await product_service.update_product(product_id, product_data, current_user.id)
+    except DuplicateListing as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not product:
         raise HTTPException(status_code=404,
                             detail="Product not found or not authorized")
@@ -121,9 +292,22 @@ async def upload_product_images(
 @router.get("/user/{user_id}", response_model=List[ProductResponse])
 async def get_user_products(
     user_id: str,
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    include_total: bool = Query(False),
+    exact_total: bool = Query(False)
 ):
     """Get products by user ID"""
-    products = await product_service.get_user_products(user_id, skip, limit)
-    return products
+    products = await product_service.get_user_products(
+        user_id, skip, limit, route=CATALOG_READ)
+
+    if include_total:
+        total, approximate = await product_service.count_user_products(
+            user_id, exact=exact_total and settings.EXACT_COUNTS_ENABLED,
+            route=CATALOG_READ
+        )
+        set_total_headers(response, total, approximate)
+
+    return conditional_json(request, products, LISTING_CACHE_CONTROL, response)
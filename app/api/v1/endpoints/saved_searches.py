@@ -0,0 +1,49 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.v1.endpoints.auth import get_current_user
+from app.schemas.product import SavedSearchCreate, SavedSearchMatch, SavedSearchResponse
+from app.services.saved_search_service import saved_search_service
+
+router = APIRouter()
+
+
+@router.post("/", response_model=SavedSearchResponse)
+async def create_saved_search(
+    search_data: SavedSearchCreate,
+    current_user=Depends(get_current_user)
+):
+    """Save a product filter to be alerted about new matching listings"""
+    try:
+        return await saved_search_service.create_saved_search(current_user.id, search_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/", response_model=List[SavedSearchResponse])
+async def get_my_saved_searches(current_user=Depends(get_current_user)):
+    """Get current user's saved searches"""
+    return await saved_search_service.get_saved_searches(current_user.id)
+
+
+@router.get("/matches", response_model=List[SavedSearchMatch])
+async def get_my_matches(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user=Depends(get_current_user)
+):
+    """Get new listings that matched current user's saved searches"""
+    return await saved_search_service.get_matches(current_user.id, skip, limit)
+
+
+@router.delete("/{search_id}")
+async def delete_saved_search(
+    search_id: str,
+    current_user=Depends(get_current_user)
+):
+    """Delete a saved search (only by owner)"""
+    success = await saved_search_service.delete_saved_search(search_id, current_user.id)
+    if not success:
+        raise HTTPException(status_code=404,
+                            detail="Saved search not found or not authorized")
+
+    return {"message": "Saved search deleted successfully"}
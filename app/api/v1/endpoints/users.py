@@ -1,9 +1,24 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
 from app.api.v1.endpoints.auth import get_current_user
-from app.schemas.user import UserUpdate, UserResponse
+from app.core.conditional import (
+    PRIVATE_USER_CACHE_CONTROL,
+    USER_CACHE_CONTROL,
+    conditional_body,
+    conditional_json,
+    document_etag,
+    is_not_modified,
+    not_modified,
+    render_json,
+    set_cache_headers,
+)
+from app.core.database import PROFILE_READ
+from app.core.microcache import CachedBody
+from app.schemas.user import SellerStorefront, UserBatchResponse, UserUpdate, UserResponse
+from app.services.storefront_service import storefront_cache, storefront_service
 from app.services.user_service import user_service
 from app.utils.image_upload import image_upload_service
+from app.utils.object_ids import parse_id_list
 
 router = APIRouter()
 
@@ -67,13 +82,34 @@ async def upload_avatar(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/batch", response_model=UserBatchResponse)
+async def get_users_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated user IDs")
+):
+    """Get several users' public profiles by ID in request order"""
+    try:
+        user_ids = parse_id_list(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    users, missing = await user_service.get_public_users(user_ids, route=PROFILE_READ)
+    return conditional_json(
+        request, UserBatchResponse(items=users, missing=missing), USER_CACHE_CONTROL)
+
+
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user_by_id(user_id: str):
+async def get_user_by_id(user_id: str, request: Request, response: Response):
     """Get user by ID (public information only)"""
-    user = await user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id, route=PROFILE_READ)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    etag = document_etag(user.id, user.updated_at)
+    if is_not_modified(request, etag, user.updated_at):
+        return not_modified(etag, PRIVATE_USER_CACHE_CONTROL, user.updated_at)
+
+    set_cache_headers(response, etag, PRIVATE_USER_CACHE_CONTROL, user.updated_at)
     return UserResponse(
         id=user.id,
         username=user.username,
@@ -85,3 +121,17 @@ async def get_user_by_id(user_id: str):
         is_active=user.is_active,
         is_verified=user.is_verified
     )
+
+
+@router.get("/{user_id}/storefront", response_model=SellerStorefront)
+async def get_seller_storefront(user_id: str, request: Request):
+    """Seller page: public profile, recent listings, listing counts and sales"""
+    async def render() -> CachedBody:
+        storefront = await storefront_service.get_storefront(user_id)
+        if storefront is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return CachedBody(render_json(storefront))
+
+    page = await storefront_cache.get_or_compute(user_id, render)
+    return conditional_body(
+        request, page.body, USER_CACHE_CONTROL, page.headers, page.etag, page.encoded)
@@ -0,0 +1,225 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Priority classes, highest first. Each class may only fill its share of the
+# worker's in-flight capacity, so browsing traffic is shed before order writes.
+PRIORITY_CRITICAL = "critical"
+PRIORITY_DEFAULT = "default"
+PRIORITY_LOW = "low"
+
+CRITICAL_PREFIXES = ("/api/v1/orders", "/api/v1/auth/login")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = now
+
+    def take(self, now: float) -> Tuple[bool, float]:
+        """Consume one token, returning (allowed, seconds until next token)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class InMemoryRateLimiter:
+    """Per-worker token buckets, bounded to ``max_keys`` most recent clients"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def hit(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+class RedisRateLimiter:
+    """Token buckets shared by every worker through Redis"""
+
+    SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry)}
+"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # optional dependency
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        try:
+            allowed, retry = await self._script(
+                keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()])
+        except Exception:
+            # Fail open: a limiter outage must not take the API down with it
+            metrics.incr("admission.backend_errors")
+            return True, 0.0
+        return bool(allowed), float(retry)
+
+
+def build_rate_limiter():
+    if settings.RATE_LIMIT_BACKEND == "redis" and settings.REDIS_URL:
+        return RedisRateLimiter(settings.REDIS_URL)
+    return InMemoryRateLimiter()
+
+
+def request_priority(method: str, path: str, authenticated: bool) -> str:
+    if method in WRITE_METHODS and path.startswith(CRITICAL_PREFIXES):
+        return PRIORITY_CRITICAL
+    if authenticated:
+        return PRIORITY_DEFAULT
+    return PRIORITY_LOW
+
+
+def token_subject(headers: Headers) -> Optional[str]:
+    """Subject of a bearer token, decoded without touching the database"""
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+def client_ip(scope: Scope, headers: Headers) -> str:
+    """Address of the client as seen by the outermost trusted proxy.
+
+    Each of the TRUSTED_PROXY_HOPS proxies appends the address it was
+    reached from, so the entry that many places from the right is the
+    client; anything further left was sent by the client and may be forged.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    forwarded = headers.get("x-forwarded-for")
+    if not forwarded:
+        return peer
+    if settings.TRUSTED_PROXY_HOPS <= 0:
+        metrics.incr("admission.untrusted_forwarded_for")
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    if not hops:
+        return peer
+    return hops[-min(settings.TRUSTED_PROXY_HOPS, len(hops))]
+
+
+def reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class AdmissionControlMiddleware:
+    """Per-client rate limits plus a per-worker in-flight cap.
+
+    Every request takes a token from its client IP's bucket, and
+    authenticated requests also from their user's bucket, so spreading
+    requests over several tokens does not lift the IP limit. Requests over
+    either bucket get 429; requests arriving while their
+    priority class's share of ``max_in_flight`` is in use get an immediate 503
+    instead of queueing behind the database pool. Requests to
+    ``long_lived_paths`` (event streams) are rate limited but never count as
+    in flight, since they stay open while idle.
+    """
+
+    def __init__(self, app: ASGIApp, max_in_flight: int,
+                 exempt_paths: Tuple[str, ...] = ("/health", "/metrics"),
+                 long_lived_paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.exempt_paths = exempt_paths
+        self.long_lived_paths = long_lived_paths
+        self.limits = {
+            PRIORITY_CRITICAL: max_in_flight,
+            PRIORITY_DEFAULT: int(max_in_flight * settings.ADMISSION_DEFAULT_SHARE),
+            PRIORITY_LOW: int(max_in_flight * settings.ADMISSION_LOW_SHARE),
+        }
+        self.limiter = build_rate_limiter()
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        subject = token_subject(headers)
+
+        allowed, retry_after = await self.limiter.hit(
+            f"ip:{client_ip(scope, headers)}", settings.RATE_LIMIT_IP_PER_SECOND,
+            settings.RATE_LIMIT_IP_BURST)
+        scope_name = "ip"
+        if allowed and subject is not None:
+            allowed, retry_after = await self.limiter.hit(
+                f"user:{subject}", settings.RATE_LIMIT_USER_PER_SECOND,
+                settings.RATE_LIMIT_USER_BURST)
+            scope_name = "user"
+
+        if not allowed:
+            metrics.incr(f"admission.rate_limited.{scope_name}")
+            await reject(429, "Too many requests", retry_after)(scope, receive, send)
+            return
+
+        if scope["path"] in self.long_lived_paths:
+            await self.app(scope, receive, send)
+            return
+
+        priority = request_priority(scope["method"], scope["path"], subject is not None)
+        if self.in_flight >= self.limits[priority]:
+            metrics.incr(f"admission.shed.{priority}")
+            await reject(503, "Server busy, retry shortly",
+                         settings.SHED_RETRY_AFTER_SECONDS)(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        metrics.set_gauge("admission.in_flight", self.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            metrics.set_gauge("admission.in_flight", self.in_flight)
@@ -0,0 +1,153 @@
+import gzip
+import time
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+)
+
+
+def available_encodings() -> List[str]:
+    """Encodings this worker can produce, in order of preference"""
+    if not settings.COMPRESSION_ENABLED:
+        return []
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.insert(0, "br")
+    return encodings
+
+
+def choose_encoding(accept_encoding: str,
+                    offered: Optional[List[str]] = None) -> Optional[str]:
+    """Pick the preferred encoding the client accepts (q > 0)"""
+    offered = available_encodings() if offered is None else offered
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in offered:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body and record ratio and time spent"""
+    started = time.perf_counter()
+    if encoding == "br":
+        result = brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    else:
+        result = gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+    metrics.observe(f"compression.{encoding}", time.perf_counter() - started)
+
+    metrics.incr("compression.bytes_in", len(body))
+    metrics.incr("compression.bytes_out", len(result))
+    metrics.set_gauge(
+        "compression.ratio",
+        metrics.counter("compression.bytes_out") / metrics.counter("compression.bytes_in")
+    )
+    return result
+
+
+def precompress(body: bytes) -> Dict[str, bytes]:
+    """Encode a body once in every available encoding, for cached responses"""
+    if len(body) < settings.COMPRESSION_MIN_SIZE:
+        return {}
+    return {encoding: compress(body, encoding) for encoding in available_encodings()}
+
+
+def weaken_etag(etag: str) -> str:
+    """Encoded bodies are not byte-identical to the strong representation"""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compress complete response bodies above a minimum size.
+
+    Streaming responses (more_body) pass through untouched so exports and
+    event streams are never buffered. Responses that already carry a
+    Content-Encoding (e.g. precompressed cache entries) are left alone.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024,
+                 excluded_paths: Optional[List[str]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.excluded_paths = tuple(excluded_paths or ())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+
+            if message.get("more_body", False) or len(body) < self.minimum_size \
+                    or not is_compressible(headers):
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = weaken_etag(headers["etag"])
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,135 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Mapping, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.compression import choose_encoding, weaken_etag
+from app.core.config import settings
+
+
+def document_etag(doc_id: str, updated_at: datetime, *extra: Any) -> str:
+    """Strong ETag for a single document derived from its id and version"""
+    parts = [doc_id, updated_at.isoformat(), *(str(part) for part in extra)]
+    digest = hashlib.sha1(":".join(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag for a rendered response body"""
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_control(max_age: int, private: bool = False) -> str:
+    scope = "private" if private else "public"
+    return f"{scope}, max-age={max_age}, must-revalidate"
+
+
+def is_not_modified(request: Request, etag: str,
+                    last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current version"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence and uses weak comparison
+        if if_none_match.strip() == "*":
+            return True
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return modified.replace(microsecond=0) <= since
+
+    return False
+
+
+def set_cache_headers(response: Response, etag: str, control: str,
+                      last_modified: Optional[datetime] = None):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = control
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, control: str,
+                 last_modified: Optional[datetime] = None) -> Response:
+    """Build an empty 304 carrying the validators of the current version"""
+    response = Response(status_code=304)
+    set_cache_headers(response, etag, control, last_modified)
+    return response
+
+
+def render_json(content: Any) -> bytes:
+    """Serialize content exactly as FastAPI's JSONResponse would"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def conditional_body(request: Request, body: bytes, control: str,
+                     headers: Optional[Mapping[str, str]] = None,
+                     etag: Optional[str] = None,
+                     encoded: Optional[Mapping[str, bytes]] = None) -> Response:
+    """Send a pre-rendered JSON body tagged with its content hash, or a 304.
+
+    ``encoded`` holds precompressed variants of ``body``; when the client
+    accepts one of them it is sent as-is and the middleware leaves it alone.
+    """
+    etag = etag or content_etag(body)
+    if is_not_modified(request, etag):
+        result = not_modified(etag, control)
+    else:
+        encoding = None
+        if encoded:
+            encoding = choose_encoding(
+                request.headers.get("accept-encoding", ""), list(encoded))
+
+        if encoding is None:
+            result = Response(content=body, media_type="application/json")
+            set_cache_headers(result, etag, control)
+        else:
+            result = Response(content=encoded[encoding], media_type="application/json")
+            result.headers["Content-Encoding"] = encoding
+            result.headers["Vary"] = "Accept-Encoding"
+            set_cache_headers(result, weaken_etag(etag), control)
+
+    for name, value in (headers or {}).items():
+        if name.lower() not in ("content-length", "content-type"):
+            result.headers[name] = value
+    return result
+
+
+def conditional_json(request: Request, content: Any, control: str,
+                     response: Optional[Response] = None) -> Response:
+    """Render content once, tag it with a content hash and honour If-None-Match.
+
+    Headers already set on the injected ``response`` (e.g. listing totals) are
+    carried over, since FastAPI ignores them when a Response is returned.
+    """
+    headers = response.headers if response is not None else None
+    return conditional_body(request, render_json(content), control, headers)
+
+
+PRODUCT_CACHE_CONTROL = cache_control(settings.PRODUCT_CACHE_MAX_AGE)
+LISTING_CACHE_CONTROL = cache_control(settings.LISTING_CACHE_MAX_AGE)
+USER_CACHE_CONTROL = cache_control(settings.USER_CACHE_MAX_AGE)
+# Full user documents carry contact details that shared caches must not keep
+PRIVATE_USER_CACHE_CONTROL = cache_control(settings.USER_CACHE_MAX_AGE, private=True)
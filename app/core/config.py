@@ -1,5 +1,7 @@
+import socket
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -7,6 +9,18 @@ class Settings(BaseSettings):
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "marketplace_db"
 
+    # Also match references stored as hex strings; turn off once
+    # scripts/migrate_object_id_refs.py has converted every document
+    LEGACY_STRING_REFS: bool = True
+
+    # Await index creation during startup instead of running it in the background
+    BLOCKING_INDEX_BUILD: bool = False
+
+    # Read routing: catalog and public profile reads may use secondaries that
+    # lag by at most SECONDARY_MAX_STALENESS_SECONDS (MongoDB's minimum is 90)
+    SECONDARY_READS_ENABLED: bool = True
+    SECONDARY_MAX_STALENESS_SECONDS: int = 90
+
     # Security
     SECRET_KEY: str = "your-super-secret-jwt-key-change-this-in-production"
     ALGORITHM: str = "HS256"
@@ -23,6 +37,128 @@ class Settings(BaseSettings):
     AWS_BUCKET_NAME: Optional[str] = None
     AWS_REGION: str = "us-east-1"
 
+    # Listing totals
+    COUNT_CACHE_TTL_SECONDS: int = 30
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+    EXACT_COUNTS_ENABLED: bool = False
+
+    # HTTP caching (Cache-Control max-age, seconds)
+    PRODUCT_CACHE_MAX_AGE: int = 30
+    LISTING_CACHE_MAX_AGE: int = 10
+    USER_CACHE_MAX_AGE: int = 60
+
+    # Seller storefronts (cached per seller, dropped on product/profile writes)
+    STOREFRONT_CACHE_TTL_SECONDS: float = 60.0
+    STOREFRONT_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    STOREFRONT_RECENT_LISTINGS: int = 12
+    STOREFRONT_MAX_CATEGORIES: int = 20
+
+    # Batch fetch endpoints (/products/batch, /users/batch)
+    BATCH_FETCH_MAX_IDS: int = 100
+
+    # Product listing micro-cache (TTL 0 disables it)
+    PRODUCT_LISTING_CACHE_TTL_SECONDS: float = 2.0
+    PRODUCT_LISTING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Response compression (brotli is used when the package is installed)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_EXCLUDED_PATHS: List[str] = []
+
+    # Admission control and rate limiting
+    ADMISSION_CONTROL_ENABLED: bool = True
+    MAX_IN_FLIGHT_REQUESTS: int = 256
+    ADMISSION_DEFAULT_SHARE: float = 0.85
+    ADMISSION_LOW_SHARE: float = 0.6
+    SHED_RETRY_AFTER_SECONDS: int = 1
+    RATE_LIMIT_USER_PER_SECOND: float = 20.0
+    RATE_LIMIT_USER_BURST: int = 40
+    RATE_LIMIT_IP_PER_SECOND: float = 10.0
+    RATE_LIMIT_IP_BURST: int = 20
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" or "redis"
+    REDIS_URL: Optional[str] = None
+    # Reverse proxies in front of the app that append to X-Forwarded-For.
+    # Leave at 0 only when clients connect directly; behind a proxy every
+    # client would otherwise share the proxy's address and IP bucket
+    TRUSTED_PROXY_HOPS: int = 0
+
+    # Request time budgets (seconds), matched by longest path prefix; queries
+    # get maxTimeMS from whatever is left of the budget
+    DEFAULT_REQUEST_BUDGET_SECONDS: float = 5.0
+    REQUEST_BUDGETS: Dict[str, float] = {
+        "/api/v1/products": 2.0,
+        "/api/v1/products/bulk": 600.0,
+        "/api/v1/users": 2.0,
+        "/api/v1/orders": 5.0,
+    }
+
+    # Bulk import
+    BULK_IMPORT_BATCH_SIZE: int = 500
+    BULK_IMPORT_MAX_ROW_BYTES: int = 64 * 1024
+    BULK_IMPORT_RESULT_SPOOL_BYTES: int = 1024 * 1024
+
+    # Streaming exports
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Order archiving: orders in a final state whose last change is older than
+    # ORDER_ARCHIVE_AFTER_DAYS move to orders_archive (read-only from then on)
+    ORDER_ARCHIVE_ENABLED: bool = True
+    ORDER_ARCHIVE_AFTER_DAYS: int = 180
+    ORDER_ARCHIVE_BATCH_SIZE: int = 500
+    ORDER_ARCHIVE_INTERVAL_SECONDS: int = 3600
+
+    # Trending products: views count 1, ordered units TRENDING_ORDER_WEIGHT,
+    # and scores halve every TRENDING_HALF_LIFE_HOURS
+    TRENDING_ENABLED: bool = True
+    TRENDING_HALF_LIFE_HOURS: float = 24.0
+    TRENDING_ORDER_WEIGHT: float = 5.0
+    TRENDING_TOP_K: int = 50
+    TRENDING_INTERVAL_SECONDS: int = 60
+
+    # Similar products (built by scripts/build_similar_products.py)
+    SIMILAR_PRODUCTS_TOP_N: int = 20
+    SIMILARITY_MAX_TERMS: int = 32
+    SIMILARITY_MODEL_PATH: str = "data/similarity_model.npz"
+
+    # Near-duplicate listing detection (MinHash LSH over title and description);
+    # DUPLICATE_ACTION is "reject", "flag" or "merge"
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_ACTION: str = "reject"
+    DUPLICATE_THRESHOLD: float = 0.7
+    DUPLICATE_MIN_SHINGLES: int = 5
+
+    # Saved search alerts: new listings are matched against an in-memory index
+    # of saved filters and matches queued in notification_outbox. Without change
+    # streams each worker rebuilds the index every SAVED_SEARCHES_RELOAD_SECONDS;
+    # with them, only once deleted searches outnumber live ones
+    SAVED_SEARCHES_ENABLED: bool = True
+    MAX_SAVED_SEARCHES_PER_USER: int = 20
+    SAVED_SEARCHES_RELOAD_SECONDS: int = 300
+
+    # Order status event streams (per worker)
+    ORDER_EVENTS_MAX_CONNECTIONS: int = 20000
+    ORDER_EVENTS_BUFFER_SIZE: int = 32
+    ORDER_EVENTS_HEARTBEAT_SECONDS: float = 25.0
+    ORDER_EVENTS_RETRY_MS: int = 5000
+
+    # Background jobs (jobs collection), consumed by every API worker;
+    # JOB_CONCURRENCY overrides consumers per job type
+    JOBS_ENABLED: bool = True
+    JOB_CONCURRENCY: Dict[str, int] = {}
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 5.0
+    JOB_RETRY_MAX_SECONDS: float = 3600.0
+    JOB_METRICS_INTERVAL_SECONDS: int = 30
+    VIEW_FLUSH_SECONDS: float = 5.0
+
+    # Cross-worker cache invalidation (needs a replica set; TTL-only otherwise)
+    CHANGE_STREAMS_ENABLED: bool = True
+    INSTANCE_ID: str = Field(default_factory=socket.gethostname)
+
     # App Settings
     DEBUG: bool = True
     HOST: str = "0.0.0.0"
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from fastapi import Response
+
+from app.core.config import settings
+from app.core.deadline import clear_budget, max_time_option
+from app.core.invalidation import invalidation_bus
+
+
+def normalize_query(query: dict) -> str:
+    """Build a stable key for a MongoDB filter regardless of key order"""
+    return json.dumps(query, sort_keys=True, default=str)
+
+
+class CountCache:
+    """Cache of listing totals keyed by collection and normalized filter.
+
+    Fresh entries are served as exact. Stale entries are still served, flagged
+    as approximate, while a single background task refreshes them.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def count(self, collection, query: dict,
+                    exact: bool = False) -> Tuple[int, bool]:
+        """Return (total, approximate) for a query on a Motor collection"""
+        key = f"{collection.name}:{normalize_query(query)}"
+
+        if exact:
+            total = await collection.count_documents(query, **max_time_option())
+            self._store(key, total)
+            return total, False
+
+        entry = self._entries.get(key)
+        if entry is None:
+            total = await collection.count_documents(query, **max_time_option())
+            self._store(key, total)
+            return total, False
+
+        total, stored_at = entry
+        self._entries.move_to_end(key)
+        if time.monotonic() - stored_at < self.ttl_seconds:
+            return total, False
+
+        self._schedule_refresh(key, collection, query)
+        return total, True
+
+    def invalidate(self, collection_name: str):
+        """Drop every cached total for a collection"""
+        prefix = f"{collection_name}:"
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def expire(self, collection_name: str):
+        """Mark a collection's totals stale: still served, refreshed on next read"""
+        prefix = f"{collection_name}:"
+        for key, (total, _) in list(self._entries.items()):
+            if key.startswith(prefix):
+                self._entries[key] = (total, float("-inf"))
+
+    def clear(self):
+        self._entries.clear()
+
+    def _store(self, key: str, total: int):
+        self._entries[key] = (total, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _schedule_refresh(self, key: str, collection, query: dict):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            # Not bound by the triggering request's deadline
+            clear_budget()
+            try:
+                total = await collection.count_documents(query)
+            except Exception:
+                # Keep serving the stale total; the next read retries
+                return
+            self._store(key, total)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+
+count_cache = CountCache(
+    ttl_seconds=settings.COUNT_CACHE_TTL_SECONDS,
+    max_entries=settings.COUNT_CACHE_MAX_ENTRIES
+)
+invalidation_bus.subscribe("products", lambda change: count_cache.expire("products"))
+invalidation_bus.subscribe("orders", lambda change: count_cache.expire("orders"))
+
+
+def total_headers(total: int, approximate: bool) -> Dict[str, str]:
+    """Headers exposing a listing total without changing the response body"""
+    return {
+        "X-Total-Count": str(total),
+        "X-Total-Count-Approximate": "true" if approximate else "false",
+    }
+
+
+def set_total_headers(response: Response, total: int, approximate: bool):
+    response.headers.update(total_headers(total, approximate))
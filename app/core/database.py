@@ -1,21 +1,95 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import SecondaryPreferred
 from app.core.config import settings
+from app.core.metrics import metrics
+
+# Read routes. Reads that must see the caller's own writes (re-reads after
+# create/update, auth, owner dashboards) stay on the primary; anonymous
+# catalog browsing and public profiles tolerate bounded staleness.
+PRIMARY_READ = "primary"
+CATALOG_READ = "catalog"
+PROFILE_READ = "profile"
+SECONDARY_READ_ROUTES = (CATALOG_READ, PROFILE_READ)
+
+# Index definitions per collection: (keys, options). Any change here yields
+# a new index version, which the next worker to start applies once.
+INDEXES = {
+    "users": [
+        ("email", {"unique": True}),
+        ("username", {"unique": True}),
+    ],
+    "products": [
+        ("seller_id", {}),
+        ([("seller_id", 1), ("created_at", -1)], {}),
+        ("category", {}),
+        ("created_at", {}),
+        ([("title", "text"), ("description", "text")], {}),
+    ],
+    "orders": [
+        ("buyer_id", {}),
+        ("seller_id", {}),
+        ([("buyer_id", 1), ("created_at", -1)], {}),
+        ([("seller_id", 1), ("created_at", -1)], {}),
+        ("created_at", {}),
+        ([("status", 1), ("updated_at", 1)], {}),
+    ],
+    "product_popularity": [
+        ("updated_at", {}),
+    ],
+    "orders_archive": [
+        ([("buyer_id", 1), ("created_at", -1)], {}),
+        ([("seller_id", 1), ("created_at", -1)], {}),
+    ],
+    "jobs": [
+        ([("type", 1), ("status", 1), ("run_at", 1)], {}),
+        ([("type", 1), ("status", 1), ("locked_until", 1)], {}),
+        ("status", {}),
+    ],
+    "saved_searches": [
+        ([("user_id", 1), ("created_at", -1)], {}),
+    ],
+    "notification_outbox": [
+        ([("user_id", 1), ("created_at", -1)], {}),
+        ([("user_id", 1), ("product_id", 1)], {"unique": True}),
+        ([("status", 1), ("created_at", 1)], {}),
+    ],
+}
+SCHEMA_META_COLLECTION = "schema_meta"
 
 client = None
 database = None
+secondary_database = None
+_index_task = None
 
 
 async def init_db():
-    global client, database
+    global client, database, secondary_database
     client = AsyncIOMotorClient(settings.MONGODB_URL)
     database = client[settings.DATABASE_NAME]
+    secondary_database = database.with_options(read_preference=SecondaryPreferred(
+        max_staleness=settings.SECONDARY_MAX_STALENESS_SECONDS))
 
-    # Create indexes
-    await create_indexes()
+    # Indexes build in the background so the worker can serve right away
+    global _index_task
+    if settings.BLOCKING_INDEX_BUILD:
+        await ensure_indexes()
+    else:
+        _index_task = asyncio.create_task(ensure_indexes())
 
 
 async def close_db():
     global client
+    if _index_task and not _index_task.done():
+        _index_task.cancel()
+        await asyncio.gather(_index_task, return_exceptions=True)
     if client:
         client.close()
 
@@ -24,19 +98,47 @@ async def get_database():
     return database
 
 
+async def get_read_database(route: str = PRIMARY_READ):
+    """Database handle for a read route, recorded in metrics"""
+    if settings.SECONDARY_READS_ENABLED and route in SECONDARY_READ_ROUTES:
+        metrics.incr(f"db.reads.{route}.secondary_preferred")
+        return secondary_database
+    metrics.incr(f"db.reads.{route}.primary")
+    return database
+
+
+def index_version() -> str:
+    """Stable digest of INDEXES, recorded once the indexes exist"""
+    spec = json.dumps(INDEXES, sort_keys=True)
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+
+async def ensure_indexes():
+    """Create indexes unless this index version is already recorded"""
+    version = index_version()
+    meta = database[SCHEMA_META_COLLECTION]
+    try:
+        applied = await meta.find_one({"_id": "indexes"})
+        if applied and applied.get("version") == version:
+            metrics.incr("db.index_build_skipped")
+            return
+
+        started = time.perf_counter()
+        await create_indexes()
+        await meta.update_one(
+            {"_id": "indexes"},
+            {"$set": {"version": version, "applied_at": datetime.utcnow()}},
+            upsert=True
+        )
+        metrics.observe("db.index_build", time.perf_counter() - started)
+    except PyMongoError:
+        # Left unrecorded, so the next worker start retries
+        metrics.incr("db.index_build_errors")
+
+
 async def create_indexes():
     """Create database indexes for better performance"""
-    # User indexes
-    await database.users.create_index("email", unique=True)
-    await database.users.create_index("username", unique=True)
-
-    # Product indexes
-    await database.products.create_index("seller_id")
-    await database.products.create_index("category")
-    await database.products.create_index("created_at")
-    await database.products.create_index([("title", "text"), ("description", "text")])
-
-    # Order indexes
-    await database.orders.create_index("buyer_id")
-    await database.orders.create_index("seller_id")
-    await database.orders.create_index("created_at")
+    for collection, indexes in INDEXES.items():
+        # One createIndexes command per collection
+        await database[collection].create_indexes(
+            [IndexModel(keys, **options) for keys, options in indexes])
@@ -0,0 +1,91 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import ExecutionTimeout
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Monotonic time by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# Never send a query with less time than this; it would only waste a round trip
+MIN_QUERY_TIME_MS = 5
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before a query could be issued"""
+
+
+def start_budget(seconds: float):
+    _deadline.set(time.monotonic() + seconds)
+
+
+def clear_budget():
+    """Detach the current task from any request budget (background work)"""
+    _deadline.set(None)
+
+
+def remaining_seconds() -> Optional[float]:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def query_max_time_ms() -> Optional[int]:
+    """maxTimeMS for the next query, or None when no budget is set"""
+    remaining = remaining_seconds()
+    if remaining is None:
+        return None
+    max_time_ms = int(remaining * 1000)
+    if max_time_ms < MIN_QUERY_TIME_MS:
+        metrics.incr("deadline.exhausted")
+        raise DeadlineExceeded()
+    return max_time_ms
+
+
+def max_time_option() -> Dict[str, int]:
+    """``maxTimeMS`` keyword for aggregate/count_documents, empty without a budget"""
+    max_time_ms = query_max_time_ms()
+    return {} if max_time_ms is None else {"maxTimeMS": max_time_ms}
+
+
+def budget_for_path(path: str) -> float:
+    """Longest configured prefix wins; falls back to the default budget"""
+    best = ""
+    for prefix in settings.REQUEST_BUDGETS:
+        if path.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    if best:
+        return settings.REQUEST_BUDGETS[best]
+    return settings.DEFAULT_REQUEST_BUDGET_SECONDS
+
+
+class DeadlineMiddleware:
+    """Start each HTTP request's time budget in a contextvar"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            start_budget(budget_for_path(scope["path"]))
+        await self.app(scope, receive, send)
+
+
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+
+
+async def execution_timeout_handler(request: Request, exc: ExecutionTimeout):
+    metrics.incr("deadline.query_timeouts")
+    return JSONResponse(
+        {"detail": "Query took too long, retry shortly"},
+        status_code=503,
+        headers={"Retry-After": str(settings.SHED_RETRY_AFTER_SECONDS)}
+    )
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core import database
+from app.core.config import settings
+from app.core.deadline import clear_budget
+from app.core.leases import acquire_lease, release_lease
+from app.core.metrics import metrics
+
+WATCHED_COLLECTIONS = ("products", "users", "orders", "saved_searches")
+TOKENS_COLLECTION = "change_stream_tokens"
+
+# Updates on these carry the whole document, for handlers that route by it
+FULL_DOCUMENT_COLLECTIONS = ("products", "orders")
+
+# Resume token no longer in the oplog; start from "now" instead
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# View counting bumps products on every read; it must not flush listing caches
+CHANGE_STREAM_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": {"$ne": "update"}},
+        {"updateDescription.updatedFields.views": {"$exists": False}},
+    ]}},
+]
+
+ChangeHandler = Callable[[dict], None]
+
+
+class InvalidationBus:
+    """In-process fan-out of change events to the caches that registered for them"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[ChangeHandler]] = defaultdict(list)
+
+    def subscribe(self, collection: str, handler: ChangeHandler):
+        self._subscribers[collection].append(handler)
+
+    def publish(self, collection: str, change: dict):
+        metrics.incr(f"invalidation.events.{collection}")
+        for handler in self._subscribers.get(collection, []):
+            try:
+                handler(change)
+            except Exception:
+                metrics.incr("invalidation.handler_errors")
+
+
+class ChangeStreamWatcher:
+    """Tail change streams and publish them on the invalidation bus.
+
+    Resume tokens are persisted per instance and collection so a restarted
+    worker picks up where it left off. Every worker process on a host shares
+    the instance id, so only the holder of a token's lease writes it; the
+    others would otherwise overwrite it with their own positions. Without a
+    replica set (no change streams) the watcher stays idle and caches rely
+    on their TTLs alone.
+    """
+
+    def __init__(self, bus: InvalidationBus,
+                 collections=WATCHED_COLLECTIONS, token_flush_seconds: float = 5.0):
+        self.bus = bus
+        self.collections = collections
+        self.token_flush_seconds = token_flush_seconds
+        self.mode = "stopped"
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start watching in the background so probing the server never delays startup"""
+        self._set_mode("starting")
+        self._tasks.append(asyncio.create_task(self._run()))
+
+    async def _run(self):
+        if not settings.CHANGE_STREAMS_ENABLED or not await self._supported():
+            self._set_mode("ttl")
+            return
+
+        self._set_mode("change_streams")
+        await asyncio.gather(*(self._watch(collection) for collection in self.collections))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._set_mode("stopped")
+
+    async def _supported(self) -> bool:
+        """Change streams need a replica set or a sharded cluster"""
+        try:
+            hello = await database.client.admin.command("hello")
+        except PyMongoError:
+            return False
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    async def _watch(self, collection: str):
+        clear_budget()
+        db = await database.get_database()
+        token = await self._load_token(collection)
+        backoff = 1.0
+
+        while True:
+            try:
+                full_document = ("updateLookup" if collection in FULL_DOCUMENT_COLLECTIONS
+                                 else None)
+                async with db[collection].watch(
+                        CHANGE_STREAM_PIPELINE, resume_after=token,
+                        full_document=full_document) as stream:
+                    backoff = 1.0
+                    flushed_at = time.monotonic()
+                    async for change in stream:
+                        self.bus.publish(collection, change)
+                        token = stream.resume_token
+                        if time.monotonic() - flushed_at >= self.token_flush_seconds:
+                            await self._save_token(collection, token)
+                            flushed_at = time.monotonic()
+            except asyncio.CancelledError:
+                if token is not None:
+                    await asyncio.shield(self._save_token(collection, token, final=True))
+                raise
+            except OperationFailure as e:
+                metrics.incr("invalidation.stream_errors")
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    token = None
+            except PyMongoError:
+                metrics.incr("invalidation.stream_errors")
+
+            # Anything missed while reconnecting is covered by cache TTLs
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _token_id(self, collection: str) -> str:
+        return f"{settings.INSTANCE_ID}:{collection}"
+
+    def _token_lease(self, collection: str) -> str:
+        return f"change_stream_token:{self._token_id(collection)}"
+
+    async def _load_token(self, collection: str) -> Optional[dict]:
+        db = await database.get_database()
+        stored = await db[TOKENS_COLLECTION].find_one({"_id": self._token_id(collection)})
+        return stored["token"] if stored else None
+
+    async def _save_token(self, collection: str, token: dict, final: bool = False):
+        """Write the token if this process holds its lease; final gives the lease up"""
+        db = await database.get_database()
+        lease = self._token_lease(collection)
+        try:
+            # Held while this worker keeps flushing; lapses a while after it stops
+            if not await acquire_lease(lease, 3 * self.token_flush_seconds):
+                return
+            await db[TOKENS_COLLECTION].update_one(
+                {"_id": self._token_id(collection)},
+                {"$set": {"token": token, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            if final:
+                await release_lease(lease)
+        except PyMongoError:
+            metrics.incr("invalidation.token_save_errors")
+
+    def _set_mode(self, mode: str):
+        self.mode = mode
+        metrics.set_gauge("invalidation.change_streams", 1 if mode == "change_streams" else 0)
+
+
+invalidation_bus = InvalidationBus()
+change_stream_watcher = ChangeStreamWatcher(invalidation_bus)
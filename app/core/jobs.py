@@ -0,0 +1,222 @@
+import asyncio
+import random
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.deadline import clear_budget
+from app.core.leases import LEASE_OWNER
+from app.core.metrics import metrics
+
+JOBS_COLLECTION = "jobs"
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+
+class JobType:
+    def __init__(self, handler: JobHandler, concurrency: int, max_attempts: int):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+
+class JobQueue:
+    """Durable background jobs stored in the jobs collection.
+
+    Request handlers enqueue a job (one insert) and return. Every worker
+    process runs a fixed number of asyncio consumers per job type; a consumer
+    claims the oldest due job with one find_one_and_update that marks it
+    running until a lease expires, so a job whose worker died is picked up
+    again afterwards. Failures are retried with exponential backoff and
+    jitter until the type's max_attempts, then left as failed for
+    inspection. Succeeded jobs are deleted. Handlers must be idempotent,
+    since a job can run again after a lease expires.
+    """
+
+    def __init__(self):
+        self.collection_name = JOBS_COLLECTION
+        self._types: Dict[str, JobType] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, job_type: str, handler: JobHandler,
+                 concurrency: int = 1, max_attempts: Optional[int] = None):
+        """Declare a job type; JOB_CONCURRENCY overrides its concurrency"""
+        self._types[job_type] = JobType(
+            handler=handler,
+            concurrency=settings.JOB_CONCURRENCY.get(job_type, concurrency),
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+
+    async def enqueue(self, job_type: str, payload: dict, delay_seconds: float = 0) -> str:
+        return (await self.enqueue_many(job_type, [payload], delay_seconds))[0]
+
+    async def enqueue_many(self, job_type: str, payloads: Iterable[dict],
+                           delay_seconds: float = 0) -> List[str]:
+        """Persist jobs; they run once due, on whichever worker claims them first"""
+        if job_type not in self._types:
+            raise ValueError(f"Unknown job type {job_type}")
+        now = datetime.utcnow()
+        documents = [{
+            "type": job_type,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "run_at": now + timedelta(seconds=delay_seconds),
+            "enqueued_at": now,
+        } for payload in payloads]
+        if not documents:
+            return []
+
+        db = await get_database()
+        result = await db[self.collection_name].insert_many(documents)
+        metrics.incr(f"jobs.{job_type}.enqueued", len(documents))
+        if not delay_seconds and job_type in self._wakeups:
+            self._wakeups[job_type].set()
+        return [str(job_id) for job_id in result.inserted_ids]
+
+    async def start(self):
+        if not settings.JOBS_ENABLED:
+            return
+        for job_type, spec in self._types.items():
+            self._wakeups[job_type] = asyncio.Event()
+            for _ in range(spec.concurrency):
+                self._tasks.append(asyncio.create_task(self._consume(job_type)))
+        self._tasks.append(asyncio.create_task(self._report_depth()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeups = {}
+
+    async def _consume(self, job_type: str):
+        clear_budget()
+        wakeup = self._wakeups[job_type]
+        while True:
+            try:
+                job = await self._claim(job_type)
+            except PyMongoError:
+                metrics.incr("jobs.claim_errors")
+                job = None
+
+            if job is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job_type, job)
+            except PyMongoError:
+                # The lease runs out and another consumer retries the job
+                metrics.incr("jobs.ack_errors")
+
+    async def _claim(self, job_type: str) -> Optional[dict]:
+        """Take the oldest due job, or one whose previous lease has expired"""
+        db = await get_database()
+        now = datetime.utcnow()
+        return await db[self.collection_name].find_one_and_update(
+            {"type": job_type, "$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lte": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "claim": ObjectId(),
+                    "locked_by": LEASE_OWNER,
+                    "locked_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _run(self, job_type: str, job: dict):
+        spec = self._types[job_type]
+        metrics.observe(f"jobs.{job_type}.wait",
+                        (datetime.utcnow() - job["run_at"]).total_seconds())
+        db = await get_database()
+        mine = {"_id": job["_id"], "claim": job["claim"]}
+
+        started = time.perf_counter()
+        try:
+            clear_budget()
+            await spec.handler(job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.observe(f"jobs.{job_type}.run", time.perf_counter() - started)
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            if job["attempts"] >= spec.max_attempts:
+                metrics.incr(f"jobs.{job_type}.failed")
+                await db[self.collection_name].update_one(mine, {"$set": {
+                    "status": "failed", "last_error": error, "failed_at": datetime.utcnow()}})
+            else:
+                metrics.incr(f"jobs.{job_type}.retried")
+                await db[self.collection_name].update_one(mine, {"$set": {
+                    "status": "queued", "last_error": error,
+                    "run_at": datetime.utcnow() + timedelta(
+                        seconds=self.retry_delay(job["attempts"]))}})
+            return
+
+        metrics.observe(f"jobs.{job_type}.run", time.perf_counter() - started)
+        metrics.incr(f"jobs.{job_type}.succeeded")
+        await db[self.collection_name].delete_one(mine)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff, jittered over its upper half"""
+        ceiling = min(settings.JOB_RETRY_MAX_SECONDS,
+                      settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+        return random.uniform(ceiling / 2, ceiling)
+
+    async def _report_depth(self):
+        """Gauge queued jobs and the age of the oldest due one, per type"""
+        clear_budget()
+        while True:
+            try:
+                await self.report_depth()
+            except PyMongoError:
+                metrics.incr("jobs.depth_errors")
+            await asyncio.sleep(settings.JOB_METRICS_INTERVAL_SECONDS)
+
+    async def report_depth(self) -> Dict[str, dict]:
+        db = await get_database()
+        now = datetime.utcnow()
+        pipeline = [
+            {"$match": {"status": {"$in": ["queued", "running", "failed"]}}},
+            {"$group": {
+                "_id": {"type": "$type", "status": "$status"},
+                "count": {"$sum": 1},
+                "oldest": {"$min": "$run_at"},
+            }},
+        ]
+        depth = {job_type: {"queued": 0, "running": 0, "failed": 0, "oldest_seconds": 0.0}
+                 for job_type in self._types}
+        async for group in db[self.collection_name].aggregate(pipeline):
+            job_type, status = group["_id"]["type"], group["_id"]["status"]
+            stats = depth.setdefault(
+                job_type, {"queued": 0, "running": 0, "failed": 0, "oldest_seconds": 0.0})
+            stats[status] = group["count"]
+            if status == "queued":
+                stats["oldest_seconds"] = max(0.0, (now - group["oldest"]).total_seconds())
+
+        for job_type, stats in depth.items():
+            for name, value in stats.items():
+                metrics.set_gauge(f"jobs.{job_type}.{name}", value)
+        return depth
+
+
+job_queue = JobQueue()
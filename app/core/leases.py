@@ -0,0 +1,43 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.database import get_database
+
+LEASES_COLLECTION = "leases"
+
+# INSTANCE_ID is shared by every worker process on a host, so it cannot tell
+# lease holders apart; each process gets its own owner id
+LEASE_OWNER = f"{settings.INSTANCE_ID}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lease(name: str, ttl_seconds: float) -> bool:
+    """Take or renew a named lease so only one worker runs a background job.
+
+    The lease is held by this process until it expires; renewing it before
+    then extends it. Returns False while another process holds it.
+    """
+    db = await get_database()
+    now = datetime.utcnow()
+    try:
+        await db[LEASES_COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [
+                {"owner": LEASE_OWNER},
+                {"expires_at": {"$lte": now}},
+            ]},
+            {"$set": {"owner": LEASE_OWNER,
+                      "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Held by someone else: the filter missed and the upsert collided
+        return False
+    return True
+
+
+async def release_lease(name: str):
+    db = await get_database()
+    await db[LEASES_COLLECTION].delete_one({"_id": name, "owner": LEASE_OWNER})
@@ -0,0 +1,47 @@
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Minimal in-process metrics registry for a single worker"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1):
+        self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        """Record a duration; keeps count, total and max"""
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "timings": {
+                name: {**timing, "avg": timing["total"] / timing["count"]}
+                for name, timing in self._timings.items()
+            },
+        }
+
+    def reset(self):
+        self._counters.clear()
+        self._gauges.clear()
+        self._timings.clear()
+
+
+metrics = Metrics()
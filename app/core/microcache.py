@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.compression import precompress
+from app.core.conditional import content_etag
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.core.metrics import metrics
+
+
+class CachedBody:
+    """A rendered response body plus the headers that go with it.
+
+    Compressed variants are produced once here, so cached responses pay the
+    compression cost per fill rather than per request.
+    """
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.body = body
+        self.headers = headers or {}
+        self.etag = content_etag(body)
+        self.encoded = precompress(body)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.encoded.values()) + \
+            sum(len(k) + len(v) for k, v in self.headers.items())
+
+
+class MicroCache:
+    """Short-TTL response cache with single-flight fills and a byte budget.
+
+    Concurrent misses for the same key share one execution of ``compute``;
+    entries are evicted least-recently-used once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_bytes: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, CachedBody]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._superseded: Set[str] = set()
+        self._bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_bytes > 0
+
+    async def get_or_compute(
+            self, key: str, compute: Callable[[], Awaitable[CachedBody]]) -> CachedBody:
+        """Serve key from cache, joining or starting a single fill on a miss"""
+        if not self.enabled:
+            return await compute()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._record("hits")
+                return value
+            self._remove(key)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._record("misses")
+            task = asyncio.ensure_future(self._fill(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._fill_done(key, t))
+        else:
+            self._record("coalesced")
+
+        # Shield so a disconnecting caller doesn't cancel the shared fill
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one entry, or everything when no key is given"""
+        if key is None:
+            self._entries.clear()
+            self._bytes = 0
+            self._superseded.update(self._inflight)
+        else:
+            if key in self._entries:
+                self._remove(key)
+            if key in self._inflight:
+                self._superseded.add(key)
+        self._update_gauges()
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[CachedBody]]):
+        value = await compute()
+        # A fill running across an invalidation may have read the old data;
+        # its waiters get it, but it isn't kept
+        if key not in self._superseded:
+            self._store(key, value)
+        return value
+
+    def _fill_done(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        self._superseded.discard(key)
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            task.exception()
+
+    def _store(self, key: str, value: CachedBody):
+        if value.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._bytes += value.size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            metrics.incr(f"{self.name}.evictions")
+        self._update_gauges()
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= value.size
+
+    def _record(self, outcome: str):
+        metrics.incr(f"{self.name}.{outcome}")
+        lookups = sum(metrics.counter(f"{self.name}.{o}")
+                      for o in ("hits", "misses", "coalesced"))
+        served = metrics.counter(f"{self.name}.hits") + \
+            metrics.counter(f"{self.name}.coalesced")
+        metrics.set_gauge(f"{self.name}.hit_ratio", served / lookups)
+
+    def _update_gauges(self):
+        metrics.set_gauge(f"{self.name}.entries", len(self._entries))
+        metrics.set_gauge(f"{self.name}.bytes", self._bytes)
+
+
+product_listing_cache = MicroCache(
+    "product_listing_cache",
+    ttl_seconds=settings.PRODUCT_LISTING_CACHE_TTL_SECONDS,
+    max_bytes=settings.PRODUCT_LISTING_CACHE_MAX_BYTES
+)
+invalidation_bus.subscribe("products", lambda change: product_listing_cache.invalidate())
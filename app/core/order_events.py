@@ -0,0 +1,138 @@
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from app.core.config import settings
+from app.core.invalidation import change_stream_watcher, invalidation_bus
+from app.core.metrics import metrics
+
+WATCHED_FIELDS = ("status", "payment_status")
+
+# Sent instead of the buffered events when a slow client falls behind
+RESYNC_EVENT = "event: resync\ndata: {}\n\n"
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+class Subscription:
+    """One open event stream: a bounded buffer of rendered events"""
+
+    def __init__(self, user_id: str, buffer_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(buffer_size)
+
+    def push(self, event: str):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client refetches its orders rather than replaying each change
+            metrics.incr("order_events.overflows")
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+
+class OrderEventHub:
+    """Pushes order status changes to the buyer's and seller's open streams.
+
+    Each worker only holds the streams connected to it. With change streams
+    every worker sees every order update and routes it to its own clients;
+    without them, a worker publishes the changes it wrote itself, so clients
+    connected elsewhere only see changes made through their own worker.
+    Idle streams only wait on their queue; one task sends every stream its
+    keep-alive, so no stream holds a timer of its own.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.connections = 0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._keep_alive())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(settings.ORDER_EVENTS_HEARTBEAT_SECONDS)
+            for subscriptions in list(self._subscriptions.values()):
+                for subscription in subscriptions:
+                    if subscription.queue.empty():
+                        subscription.queue.put_nowait(KEEP_ALIVE)
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, settings.ORDER_EVENTS_BUFFER_SIZE)
+        self._subscriptions[user_id].add(subscription)
+        self.connections += 1
+        metrics.set_gauge("order_events.connections", self.connections)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+        self.connections -= 1
+        metrics.set_gauge("order_events.connections", self.connections)
+
+    async def stream(self, user_id: str) -> AsyncIterator[str]:
+        """Server-sent events for one connection"""
+        subscription = self.subscribe(user_id)
+        try:
+            yield f"retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n"
+            while True:
+                yield await subscription.queue.get()
+        finally:
+            self.unsubscribe(subscription)
+
+    def publish(self, order: dict, changes: dict):
+        """Route one order's new status and payment status to its parties"""
+        user_ids = {str(order.get("buyer_id")), str(order.get("seller_id"))}
+        targets = [subscription for user_id in user_ids
+                   for subscription in self._subscriptions.get(user_id, ())]
+        if not targets:
+            return
+
+        state = {field: changes.get(field, order.get(field)) for field in WATCHED_FIELDS}
+        updated_at = changes.get("updated_at") or order.get("updated_at")
+        data = json.dumps({
+            "order_id": str(order["_id"]),
+            **{field: getattr(value, "value", value) for field, value in state.items()},
+            "updated_at": updated_at.isoformat() if isinstance(updated_at, datetime) else None,
+        })
+        event = f"event: order_status\ndata: {data}\n\n"
+        for subscription in targets:
+            subscription.push(event)
+        metrics.incr("order_events.delivered", len(targets))
+
+    def record_writes(self, updates: Iterable[tuple]):
+        """Publish (order, changes) pairs written by this worker.
+
+        With change streams running every worker, this one included, gets
+        the same changes from the stream, so nothing is published here.
+        """
+        if change_stream_watcher.mode == "change_streams":
+            return
+        for order, changes in updates:
+            if any(field in changes for field in WATCHED_FIELDS):
+                self.publish(order, changes)
+
+    def on_order_change(self, change: dict):
+        if change.get("operationType") != "update":
+            return
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        order: Optional[dict] = change.get("fullDocument")
+        if order is not None and any(field in updated for field in WATCHED_FIELDS):
+            self.publish(order, updated)
+
+
+order_event_hub = OrderEventHub()
+invalidation_bus.subscribe("orders", order_event_hub.on_order_change)
@@ -3,21 +3,56 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
+from pymongo.errors import ExecutionTimeout
 
+from app.core.admission import AdmissionControlMiddleware
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
 from app.core.database import init_db, close_db
-from app.api.v1.endpoints import auth, products, orders, users
+from app.core.deadline import (
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    deadline_exceeded_handler,
+    execution_timeout_handler,
+)
+from app.core.invalidation import change_stream_watcher
+from app.core.jobs import job_queue
+from app.core.metrics import metrics
+from app.core.order_events import order_event_hub
+from app.api.v1.endpoints import auth, products, orders, saved_searches, users
+from app.services.duplicate_service import duplicate_service
+from app.services.order_archive_service import order_archive_service
+from app.services.product_service import product_service
+from app.services.saved_search_service import saved_search_service
+from app.services.trending_service import trending_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    await change_stream_watcher.start()
+    await order_archive_service.start()
+    await trending_service.start()
+    await duplicate_service.start()
+    await saved_search_service.start()
+    await job_queue.start()
+    await order_event_hub.start()
     yield
     # Shutdown
+    await order_event_hub.stop()
+    await job_queue.stop()
+    await product_service.flush_views()
+    await saved_search_service.stop()
+    await duplicate_service.stop()
+    await trending_service.stop()
+    await order_archive_service.stop()
+    await change_stream_watcher.stop()
     await close_db()
 
 
+ORDER_EVENTS_PATH = "/api/v1/orders/events"
+
 app = FastAPI(
     title="Marketplace API",
     description="A complete buying/selling platform API",
@@ -32,8 +67,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Total-Count",
+        "X-Total-Count-Approximate",
+        "ETag",
+        "Last-Modified"],
 )
 
+# Per-request time budgets, propagated to queries as maxTimeMS
+app.add_middleware(DeadlineMiddleware)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(ExecutionTimeout, execution_timeout_handler)
+
+# Response compression
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        excluded_paths=[*settings.COMPRESSION_EXCLUDED_PATHS, ORDER_EVENTS_PATH]
+    )
+
+# Admission control (outermost, so shed requests cost as little as possible)
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        max_in_flight=settings.MAX_IN_FLIGHT_REQUESTS,
+        long_lived_paths=(ORDER_EVENTS_PATH,)
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
@@ -42,6 +103,10 @@ app.include_router(
     prefix="/api/v1/products",
     tags=["Products"])
 app.include_router(orders.router, prefix="/api/v1/orders", tags=["Orders"])
+app.include_router(
+    saved_searches.router,
+    prefix="/api/v1/saved-searches",
+    tags=["Saved Searches"])
 
 
 @app.get("/")
@@ -54,6 +119,11 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, Set
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from enum import Enum
+from app.utils.object_ids import ObjectIdStr
 
 
 class OrderStatus(str, Enum):
@@ -21,11 +22,36 @@ class PaymentStatus(str, Enum):
     REFUNDED = "refunded"
 
 
+# Allowed state machine edges; a status maps to the statuses it may move to
+ORDER_STATUS_TRANSITIONS: Dict[OrderStatus, Set[OrderStatus]] = {
+    OrderStatus.PENDING: {OrderStatus.CONFIRMED, OrderStatus.CANCELLED},
+    OrderStatus.CONFIRMED: {OrderStatus.SHIPPED, OrderStatus.CANCELLED},
+    OrderStatus.SHIPPED: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: {OrderStatus.REFUNDED},
+    OrderStatus.CANCELLED: set(),
+    OrderStatus.REFUNDED: set(),
+}
+
+PAYMENT_STATUS_TRANSITIONS: Dict[PaymentStatus, Set[PaymentStatus]] = {
+    PaymentStatus.PENDING: {PaymentStatus.COMPLETED, PaymentStatus.FAILED},
+    PaymentStatus.FAILED: {PaymentStatus.PENDING, PaymentStatus.COMPLETED},
+    PaymentStatus.COMPLETED: {PaymentStatus.REFUNDED},
+    PaymentStatus.REFUNDED: set(),
+}
+
+
+def can_transition(transitions: dict, current: str, target: str) -> bool:
+    """Whether a status may move from current to target (staying put is allowed)"""
+    if current == target:
+        return True
+    return target in transitions.get(current, set())
+
+
 class Order(BaseModel):
     id: Optional[str] = Field(default=None, alias="_id")
-    product_id: str = Field(...)
-    buyer_id: str = Field(...)
-    seller_id: str = Field(...)
+    product_id: ObjectIdStr = Field(...)
+    buyer_id: ObjectIdStr = Field(...)
+    seller_id: ObjectIdStr = Field(...)
     quantity: int = Field(..., ge=1)
     total_price: float = Field(..., gt=0)
     status: OrderStatus = OrderStatus.PENDING
@@ -3,6 +3,7 @@ from typing import Optional, List
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from enum import Enum
+from app.utils.object_ids import ObjectIdStr
 
 
 class ProductStatus(str, Enum):
@@ -28,12 +29,14 @@ class Product(BaseModel):
     category: str = Field(..., min_length=1, max_length=50)
     condition: ProductCondition = ProductCondition.GOOD
     images: List[str] = Field(default=[])
-    seller_id: str = Field(...)
-    seller_info: Optional[dict] = None  # Will be populated when fetching
+    seller_id: ObjectIdStr = Field(...)
+    seller_info: Optional[dict] = None  # Embedded seller snapshot (see snapshot_service)
     status: ProductStatus = ProductStatus.ACTIVE
+    quantity_available: int = Field(default=1, ge=0)
     location: Optional[str] = None
     tags: List[str] = Field(default=[])
     views: int = Field(default=0)
+    duplicate_of: Optional[str] = None  # Set when flagged by duplicate detection
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
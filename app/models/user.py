@@ -15,6 +15,7 @@ class User(BaseModel):
     profile_image: Optional[str] = None
     is_active: bool = True
     is_verified: bool = False
+    profile_version: int = 0  # bumped when fields embedded in snapshots change
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -1,5 +1,6 @@
-from typing import Optional
-from pydantic import BaseModel, Field
+from datetime import date
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
 from app.models.order import OrderStatus, PaymentStatus
 
 
@@ -19,3 +20,46 @@ class OrderUpdate(BaseModel):
 class OrderFilter(BaseModel):
     status: Optional[OrderStatus] = None
     payment_status: Optional[PaymentStatus] = None
+
+
+class OrderBulkStatusUpdate(BaseModel):
+    order_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    status: Optional[OrderStatus] = None
+    payment_status: Optional[PaymentStatus] = None
+    seller_notes: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.status is None and self.payment_status is None:
+            raise ValueError("status or payment_status is required")
+        return self
+
+
+class OrderBulkOutcome(BaseModel):
+    order_id: str
+    outcome: str  # updated, unchanged, not_found, invalid_id, invalid_transition, conflict
+    detail: Optional[str] = None
+
+
+class OrderBulkStatusResult(BaseModel):
+    updated: int
+    results: List[OrderBulkOutcome]
+
+
+class SellerDayStats(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float  # gross, every order created that day
+    net_revenue: float  # excluding cancelled and refunded orders
+    orders_by_status: Dict[str, int]
+
+
+class SellerStatsResult(BaseModel):
+    start: date
+    end: date
+    orders: int
+    units: int
+    revenue: float
+    net_revenue: float
+    days: List[SellerDayStats]
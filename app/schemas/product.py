@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
-from app.models.product import ProductStatus, ProductCondition
+from app.models.product import ProductCondition, ProductResponse, ProductStatus
 
 
 class ProductCreate(BaseModel):
@@ -12,6 +13,7 @@ class ProductCreate(BaseModel):
     images: List[str] = Field(default=[])
     location: Optional[str] = None
     tags: List[str] = Field(default=[])
+    quantity_available: int = Field(1, ge=1)
 
 
 class ProductUpdate(BaseModel):
@@ -24,6 +26,19 @@ class ProductUpdate(BaseModel):
     location: Optional[str] = None
     tags: Optional[List[str]] = None
     status: Optional[ProductStatus] = None
+    quantity_available: Optional[int] = Field(None, ge=0)
+
+
+class TrendingProduct(BaseModel):
+    id: str
+    score: float
+    title: str
+    price: float
+    category: str
+    condition: Optional[ProductCondition] = None
+    images: List[str] = []
+    location: Optional[str] = None
+    seller_info: Optional[dict] = None
 
 
 class ProductFilter(BaseModel):
@@ -33,3 +48,29 @@ class ProductFilter(BaseModel):
     condition: Optional[ProductCondition] = None
     location: Optional[str] = None
     search: Optional[str] = None
+
+
+class SavedSearchCreate(BaseModel):
+    name: Optional[str] = Field(None, max_length=100)
+    filter: ProductFilter
+
+
+class SavedSearchResponse(BaseModel):
+    id: str
+    name: Optional[str] = None
+    filter: ProductFilter
+    created_at: datetime
+
+
+class SavedSearchMatch(BaseModel):
+    id: str
+    saved_search_id: str
+    product_id: str
+    title: str
+    price: float
+    created_at: datetime
+
+
+class ProductBatchResponse(BaseModel):
+    items: List[ProductResponse]
+    missing: List[str] = []
@@ -1,5 +1,7 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
+from app.models.product import ProductResponse
+from app.models.user import UserPublic
 
 
 class UserCreate(BaseModel):
@@ -41,3 +43,22 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
+
+class UserBatchResponse(BaseModel):
+    items: List[UserPublic]
+    missing: List[str] = []
+
+
+class StorefrontSales(BaseModel):
+    orders: int = 0  # excluding cancelled and refunded orders
+    units: int = 0
+    delivered_orders: int = 0
+
+
+class SellerStorefront(BaseModel):
+    profile: UserPublic
+    recent_listings: List[ProductResponse]
+    listings_by_status: Dict[str, int]
+    active_listings_by_category: Dict[str, int]
+    sales: StorefrontSales
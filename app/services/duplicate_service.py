@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Optional
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.deadline import clear_budget
+from app.core.invalidation import invalidation_bus
+from app.core.metrics import metrics
+from app.utils import minhash
+
+TEXT_FIELDS = ("title", "description", "status")
+
+# Yield to request handlers this often while rebuilding
+REBUILD_YIELD_EVERY = 1000
+
+
+class DuplicateListing(ValueError):
+    def __init__(self, duplicate_of: str):
+        super().__init__(f"Listing duplicates existing listing {duplicate_of}")
+        self.duplicate_of = duplicate_of
+
+
+class DuplicateService:
+    """Near-duplicate detection over active listings' title and description.
+
+    Every worker holds a MinHash LSH index of active listings, rebuilt from
+    Mongo in the background at startup and kept current by its own writes
+    and by product change events from other workers. Lookups are in-memory
+    and compare at most minhash.MAX_LOOKUP_CANDIDATES listings, so
+    boilerplate text that crowds a bucket costs a few tenths of a millisecond
+    and distinct text much less. What happens to a duplicate is
+    DUPLICATE_ACTION: reject it, flag it with duplicate_of, or merge it into
+    the seller's existing listing.
+    """
+
+    def __init__(self):
+        self.index = minhash.LSHIndex()
+        self.ready = False
+        self._task = None
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.DUPLICATE_DETECTION_ENABLED
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self.rebuild())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._tasks) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._tasks = set()
+
+    def signature(self, title: str, description: str) -> Optional[minhash.Signature]:
+        """MinHash of a listing's text, or None when it is too short to judge"""
+        shingles = minhash.shingles(f"{title}\n{description}")
+        if len(shingles) < settings.DUPLICATE_MIN_SHINGLES:
+            return None
+        return minhash.signature(shingles)
+
+    def find(self, signature: Optional[minhash.Signature],
+             exclude: Optional[str] = None) -> Optional[str]:
+        """Id of the most similar active listing above DUPLICATE_THRESHOLD"""
+        if not self.enabled or signature is None:
+            return None
+        started = time.perf_counter()
+        match = self.index.find(
+            signature, settings.DUPLICATE_THRESHOLD,
+            ObjectId(exclude).binary if exclude else None)
+        metrics.observe("duplicates.lookup", time.perf_counter() - started)
+        if match is None:
+            return None
+        metrics.incr(f"duplicates.found.{settings.DUPLICATE_ACTION}")
+        return str(ObjectId(match[0]))
+
+    def add(self, product_id, signature: Optional[minhash.Signature]):
+        if self.enabled and signature is not None:
+            self.index.add(ObjectId(product_id).binary, signature)
+
+    def remove(self, product_id):
+        self.index.remove(ObjectId(product_id).binary)
+
+    def index_product(self, product_dict: dict):
+        """Index an active listing from its document, or drop it otherwise"""
+        if product_dict.get("status", "active") != "active":
+            self.remove(product_dict["_id"])
+            return
+        self.add(product_dict["_id"], self.signature(
+            product_dict.get("title") or "", product_dict.get("description") or ""))
+
+    async def rebuild(self):
+        """Index every active listing; the live index keeps serving meanwhile"""
+        clear_budget()
+        started = time.perf_counter()
+        db = await get_database()
+        indexed = 0
+        try:
+            cursor = db.products.find(
+                {"status": "active"}, {"title": 1, "description": 1}, batch_size=5000)
+            async for product_dict in cursor:
+                if ObjectId(product_dict["_id"]).binary not in self.index:
+                    self.index_product(product_dict)
+                indexed += 1
+                if indexed % REBUILD_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+        except PyMongoError:
+            metrics.incr("duplicates.rebuild_errors")
+            return
+
+        self.ready = True
+        metrics.observe("duplicates.rebuild", time.perf_counter() - started)
+        metrics.set_gauge("duplicates.index_listings", len(self.index))
+        metrics.set_gauge("duplicates.index_bytes", self.index.memory_bytes())
+
+    def schedule_refresh(self, product_id: str):
+        """Re-read a listing whose text or status changed elsewhere"""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self.refresh(product_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def refresh(self, product_id: str):
+        clear_budget()
+        db = await get_database()
+        try:
+            product_dict = await db.products.find_one(
+                {"_id": ObjectId(product_id)}, {field: 1 for field in TEXT_FIELDS})
+        except PyMongoError:
+            metrics.incr("duplicates.refresh_errors")
+            return
+        if product_dict is None:
+            self.remove(product_id)
+        else:
+            self.index_product(product_dict)
+
+    def on_product_change(self, change: dict):
+        """Follow listings created, edited or deleted by other workers"""
+        if not self.enabled:
+            return
+        operation = change.get("operationType")
+        product_id = change.get("documentKey", {}).get("_id")
+        if operation in ("insert", "replace"):
+            document = change["fullDocument"]
+            if ObjectId(document["_id"]).binary not in self.index:
+                self.index_product(document)
+        elif operation == "delete":
+            self.remove(product_id)
+        elif operation == "update":
+            updated = change.get("updateDescription", {}).get("updatedFields", {})
+            if updated.get("status", "active") != "active":
+                self.remove(product_id)
+            elif any(field in updated for field in TEXT_FIELDS):
+                self.schedule_refresh(str(product_id))
+
+
+duplicate_service = DuplicateService()
+invalidation_bus.subscribe("products", duplicate_service.on_product_change)
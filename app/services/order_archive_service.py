@@ -0,0 +1,141 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.core.count_cache import count_cache
+from app.core.database import get_database
+from app.core.deadline import clear_budget
+from app.core.leases import acquire_lease, release_lease
+from app.core.metrics import metrics
+from app.models.order import OrderStatus
+
+ARCHIVE_COLLECTION = "orders_archive"
+ARCHIVABLE_STATUSES = [
+    OrderStatus.DELIVERED.value,
+    OrderStatus.CANCELLED.value,
+    OrderStatus.REFUNDED.value,
+]
+LEASE_NAME = "order_archiver"
+LEASE_SECONDS = 300
+
+
+class OrderArchiveService:
+    """Moves settled orders from the hot collection to orders_archive.
+
+    Only one worker archives at a time (a lease in MongoDB). Each batch is
+    copied with idempotent upserts, then deleted from orders on condition
+    that it still qualifies. Orders changed in between are dropped from the
+    archive again, so every order is readable from exactly one collection.
+    """
+
+    def __init__(self):
+        self.collection_name = "orders"
+        self.archive_collection_name = ARCHIVE_COLLECTION
+        self._task = None
+
+    def _archivable(self, cutoff: datetime) -> dict:
+        return {"status": {"$in": ARCHIVABLE_STATUSES}, "updated_at": {"$lt": cutoff}}
+
+    async def start(self):
+        if settings.ORDER_ARCHIVE_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                if await acquire_lease(LEASE_NAME, LEASE_SECONDS):
+                    await self.archive()
+            except PyMongoError:
+                metrics.incr("order_archive.errors")
+            await asyncio.sleep(settings.ORDER_ARCHIVE_INTERVAL_SECONDS)
+
+    async def archive(self) -> int:
+        """Archive every qualifying order batch by batch, returning how many moved"""
+        clear_budget()
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+        self._record_working_set("before", await self.working_set())
+
+        moved = 0
+        while True:
+            candidates, archived = await self.archive_batch(cutoff)
+            moved += archived
+            if not candidates or not await acquire_lease(LEASE_NAME, LEASE_SECONDS):
+                break
+        await release_lease(LEASE_NAME)
+
+        if moved:
+            count_cache.expire(self.archive_collection_name)
+        self._record_working_set("after", await self.working_set())
+        metrics.incr("order_archive.moved", moved)
+        metrics.observe("order_archive.run", time.perf_counter() - started)
+        return moved
+
+    async def archive_batch(self, cutoff: datetime) -> Tuple[int, int]:
+        """Move one batch, returning (candidates, archived)"""
+        db = await get_database()
+        hot = db[self.collection_name]
+        archive = db[self.archive_collection_name]
+
+        batch = await hot.find(self._archivable(cutoff)).sort("updated_at", 1).limit(
+            settings.ORDER_ARCHIVE_BATCH_SIZE).to_list(length=settings.ORDER_ARCHIVE_BATCH_SIZE)
+        if not batch:
+            return 0, 0
+
+        # Upserts, so copies left by an interrupted run are simply refreshed
+        now = datetime.utcnow()
+        await archive.bulk_write(
+            [ReplaceOne({"_id": order["_id"]}, {**order, "archived_at": now}, upsert=True)
+             for order in batch],
+            ordered=False
+        )
+
+        ids = [order["_id"] for order in batch]
+        result = await hot.delete_many({"_id": {"$in": ids}, **self._archivable(cutoff)})
+        if result.deleted_count < len(ids):
+            # Changed after the copy: the hot version stays authoritative
+            still_hot = [order["_id"] async for order in hot.find(
+                {"_id": {"$in": ids}}, {"_id": 1})]
+            await archive.delete_many({"_id": {"$in": still_hot}})
+            metrics.incr("order_archive.conflicts", len(still_hot))
+
+        return len(batch), result.deleted_count
+
+    async def working_set(self) -> dict:
+        """Document count, data size and index size of the hot and archive collections"""
+        db = await get_database()
+        sizes = {}
+        for tier, name in (("hot", self.collection_name),
+                           ("archive", self.archive_collection_name)):
+            try:
+                stats = await db[name].aggregate(
+                    [{"$collStats": {"storageStats": {}}}]).to_list(length=1)
+            except OperationFailure:
+                # Collection not created yet
+                stats = []
+            storage = stats[0]["storageStats"] if stats else {}
+            sizes[tier] = {
+                "documents": storage.get("count", 0),
+                "data_bytes": storage.get("size", 0),
+                "index_bytes": storage.get("totalIndexSize", 0),
+            }
+        return sizes
+
+    def _record_working_set(self, phase: str, sizes: dict):
+        for tier, values in sizes.items():
+            for name, value in values.items():
+                metrics.set_gauge(f"order_archive.{tier}.{name}.{phase}", value)
+
+
+order_archive_service = OrderArchiveService()
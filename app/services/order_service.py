@@ -1,11 +1,44 @@
-from typing import List, Optional
+import asyncio
+import heapq
+from itertools import islice
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
 from datetime import datetime
+from app.core.config import settings
+from app.core.count_cache import count_cache
 from app.core.database import get_database
-from app.models.order import Order, OrderInDB, OrderResponse
-from app.schemas.order import OrderCreate, OrderUpdate, OrderFilter
+from app.core.deadline import clear_budget, query_max_time_ms
+from app.core.metrics import metrics
+from app.core.order_events import order_event_hub
+from app.models.order import (
+    ORDER_STATUS_TRANSITIONS,
+    PAYMENT_STATUS_TRANSITIONS,
+    Order,
+    OrderInDB,
+    OrderResponse,
+    can_transition,
+)
+from app.schemas.order import (
+    OrderBulkOutcome,
+    OrderBulkStatusResult,
+    OrderBulkStatusUpdate,
+    OrderCreate,
+    OrderFilter,
+    OrderUpdate,
+)
+from app.services.order_archive_service import ARCHIVE_COLLECTION
 from app.services.user_service import user_service
 from app.services.product_service import product_service
+from app.services.seller_stats_service import seller_stats_service
+from app.services.snapshot_service import snapshot_service
+from app.services.trending_service import trending_service
+from app.utils.object_ids import ref_match, store_refs
+
+
+class OrderConflict(ValueError):
+    """The order changed between reading and writing it"""
 
 
 class OrderService:
@@ -17,36 +50,80 @@ class OrderService:
         """Create a new order"""
         db = await get_database()
 
-        # Get product to validate and get seller info
-        product = await product_service.get_product_by_id(order_data.product_id)
+        # Reserve stock first; the conditional update is the availability check
+        product = await product_service.reserve_stock(
+            order_data.product_id, order_data.quantity, buyer_id)
         if not product:
-            raise ValueError("Product not found")
+            raise ValueError(await self._reservation_error(order_data, buyer_id))
+
+        # Anything failing from here on (deadlines and client disconnects
+        # included) must give the reserved units back
+        order_id = ObjectId()
+        try:
+            # Calculate total price
+            total_price = product["price"] * order_data.quantity
+
+            # Create order
+            seller_id = str(product["seller_id"])
+            order_dict = order_data.dict()
+            order_dict["buyer_id"] = buyer_id
+            order_dict["seller_id"] = seller_id
+            order_dict["total_price"] = total_price
+
+            # Embed product and user snapshots so order reads need no joins
+            users = await snapshot_service.get_snapshots([buyer_id, seller_id])
+            order_dict["product_info"] = {
+                "id": str(product["_id"]),
+                "title": product["title"],
+                "price": product["price"],
+                "images": product.get("images", [])
+            }
+            order_dict["buyer_info"] = users.get(buyer_id)
+            order_dict["seller_info"] = users.get(seller_id)
+
+            order = OrderInDB(**order_dict)
+            order_document = store_refs(order.dict(by_alias=True))
+            order_document["_id"] = order_id
+            await db[self.collection_name].insert_one(order_document)
+        except (Exception, asyncio.CancelledError):
+            # Shielded so a second cancellation can't interrupt the compensation
+            await asyncio.shield(self._release_unless_inserted(order_id, order_data))
+            raise
+        order.id = str(order_id)
+        await seller_stats_service.record_order(order_document)
+        trending_service.record_order(
+            order_data.product_id, product["category"], order_data.quantity)
 
-        if product.seller_id == buyer_id:
-            raise ValueError("Cannot buy your own product")
+        return order
 
+    async def _release_unless_inserted(self, order_id: ObjectId, order_data: OrderCreate):
+        """Undo a reservation, unless its order insert landed despite the error"""
+        db = await get_database()
+        clear_budget()
+        if not await db[self.collection_name].find_one({"_id": order_id}, {"_id": 1}):
+            await product_service.release_stock(order_data.product_id, order_data.quantity)
+
+    async def _reservation_error(self, order_data: OrderCreate, buyer_id: str) -> str:
+        """Explain a failed reservation (only read on the failure path)"""
+        product = await product_service.get_product_by_id(
+            order_data.product_id, populate_seller=False)
+        if not product:
+            return "Product not found"
+        if product.seller_id == buyer_id:
+            return "Cannot buy your own product"
         if product.status != "active":
-            raise ValueError("Product is not available for purchase")
-
-        # Calculate total price
-        total_price = product.price * order_data.quantity
-
-        # Create order
-        order_dict = order_data.dict()
-        order_dict["buyer_id"] = buyer_id
-        order_dict["seller_id"] = product.seller_id
-        order_dict["total_price"] = total_price
-
-        order = OrderInDB(**order_dict)
-        result = await db[self.collection_name].insert_one(order.dict(by_alias=True))
-        order.id = str(result.inserted_id)
-
-        return order
+            return "Product is not available for purchase"
+        return f"Only {product.quantity_available} left in stock"
 
     async def get_order_by_id(self, order_id: str) -> Optional[OrderResponse]:
         """Get order by ID with populated information"""
         db = await get_database()
-        order_dict = await db[self.collection_name].find_one({"_id": ObjectId(order_id)})
+        order_dict = await db[self.collection_name].find_one(
+            {"_id": ObjectId(order_id)}, max_time_ms=query_max_time_ms())
+        if order_dict is None:
+            order_dict = await db[ARCHIVE_COLLECTION].find_one(
+                {"_id": ObjectId(order_id)}, max_time_ms=query_max_time_ms())
+            metrics.incr("orders.reads.archive")
 
         if order_dict:
             order_dict["_id"] = str(order_dict["_id"])
@@ -58,6 +135,19 @@ class OrderService:
             return order
         return None
 
+    def _build_query(self, user_id: str, filter_data: OrderFilter,
+                     as_buyer: bool) -> dict:
+        """Build the MongoDB filter for a user's order listing"""
+        query = {"buyer_id" if as_buyer else "seller_id": ref_match(user_id)}
+
+        if filter_data.status:
+            query["status"] = filter_data.status
+
+        if filter_data.payment_status:
+            query["payment_status"] = filter_data.payment_status
+
+        return query
+
     async def get_user_orders(
         self,
         user_id: str,
@@ -66,24 +156,36 @@ class OrderService:
         limit: int = 10,
         as_buyer: bool = True
     ) -> List[OrderResponse]:
-        """Get orders for a user (as buyer or seller)"""
+        """Get orders for a user (as buyer or seller), newest first.
+
+        A page comes from the hot collection alone unless the user's newest
+        archived order is as recent as the page's oldest one. Orders that
+        never reach a final state stay hot however old they are, so the two
+        collections can overlap in time. Such pages merge the first
+        skip + limit orders of both by created_at.
+        """
         db = await get_database()
+        query = self._build_query(user_id, filter_data, as_buyer)
+        hot = db[self.collection_name]
+        archive = db[ARCHIVE_COLLECTION]
+
+        order_dicts = await self._find_page(hot, query, skip, limit)
+        newest_archived = await self._find_page(archive, query, 0, 1)
+        if newest_archived and (
+                len(order_dicts) < limit
+                or order_dicts[-1]["created_at"] <= newest_archived[0]["created_at"]):
+            window = skip + limit
+            merged = heapq.merge(
+                await self._find_page(hot, query, 0, window),
+                await self._find_page(archive, query, 0, window),
+                key=lambda order_dict: order_dict["created_at"], reverse=True)
+            order_dicts = list(islice(merged, skip, window))
+            metrics.incr("orders.reads.archive")
+        else:
+            metrics.incr("orders.reads.hot")
 
-        # Build filter query
-        query = {"buyer_id" if as_buyer else "seller_id": user_id}
-
-        if filter_data.status:
-            query["status"] = filter_data.status
-
-        if filter_data.payment_status:
-            query["payment_status"] = filter_data.payment_status
-
-        # Execute query
-        cursor = db[self.collection_name].find(query).skip(
-            skip).limit(limit).sort("created_at", -1)
         orders = []
-
-        async for order_dict in cursor:
+        for order_dict in order_dicts:
             order_dict["_id"] = str(order_dict["_id"])
             order = OrderResponse(**order_dict)
 
@@ -94,6 +196,85 @@ class OrderService:
 
         return orders
 
+    async def _find_page(self, collection, query: dict, skip: int, limit: int) -> List[dict]:
+        cursor = collection.find(
+            query, max_time_ms=query_max_time_ms()).skip(
+            skip).limit(limit).sort("created_at", -1)
+        return await cursor.to_list(length=limit)
+
+    async def count_user_orders(
+        self,
+        user_id: str,
+        filter_data: OrderFilter,
+        as_buyer: bool = True,
+        exact: bool = False
+    ) -> Tuple[int, bool]:
+        """Count hot and archived orders for a user, returning (total, approximate)"""
+        db = await get_database()
+        query = self._build_query(user_id, filter_data, as_buyer)
+        hot, hot_approximate = await count_cache.count(
+            db[self.collection_name], query, exact)
+        archived, archived_approximate = await count_cache.count(
+            db[ARCHIVE_COLLECTION], query, exact)
+        return hot + archived, hot_approximate or archived_approximate
+
+    async def export_user_orders(
+        self,
+        user_id: str,
+        filter_data: OrderFilter,
+        as_buyer: bool = False
+    ) -> AsyncIterator[List[dict]]:
+        """Stream orders as batches of flat export rows.
+
+        Product and buyer details are resolved with one $in lookup per cursor
+        batch instead of per order, so memory and round trips stay per batch.
+        Hot orders come first, then archived ones.
+        """
+        # Exports outlive the request budget; don't cap the cursor with maxTimeMS
+        clear_budget()
+        db = await get_database()
+        query = self._build_query(user_id, filter_data, as_buyer)
+        for collection_name in (self.collection_name, ARCHIVE_COLLECTION):
+            cursor = db[collection_name].find(
+                query,
+                projection={"seller_info": 0, "archived_at": 0},
+                batch_size=settings.EXPORT_BATCH_SIZE
+            ).sort("created_at", -1)
+            async for rows in self._export_batches(cursor):
+                yield rows
+
+    async def _export_batches(self, cursor) -> AsyncIterator[List[dict]]:
+        try:
+            while True:
+                batch = await cursor.to_list(length=settings.EXPORT_BATCH_SIZE)
+                if not batch:
+                    break
+
+                # Only orders without embedded snapshots need lookups
+                for order in batch:
+                    order["product_id"] = str(order["product_id"])
+                    order["buyer_id"] = str(order["buyer_id"])
+                products = await product_service.get_products_by_ids(
+                    (order["product_id"] for order in batch if not order.get("product_info")),
+                    {"title": 1})
+                buyers = await user_service.get_users_by_ids(
+                    (order["buyer_id"] for order in batch if not order.get("buyer_info")),
+                    {"username": 1, "full_name": 1})
+
+                rows = []
+                for order in batch:
+                    product = order.pop("product_info", None) or \
+                        products.get(order["product_id"], {})
+                    buyer = order.pop("buyer_info", None) or buyers.get(order["buyer_id"], {})
+                    order["id"] = str(order.pop("_id"))
+                    order["product_title"] = product.get("title")
+                    order["buyer_username"] = buyer.get("username")
+                    order["buyer_full_name"] = buyer.get("full_name")
+                    rows.append(order)
+                yield rows
+        finally:
+            await cursor.close()
+
     async def update_order(self, order_id: str, order_data: OrderUpdate,
                            user_id: str) -> Optional[OrderResponse]:
         """Update order (only by seller)"""
@@ -102,53 +283,178 @@ class OrderService:
         # Check if user is the seller
         existing_order = await db[self.collection_name].find_one({
             "_id": ObjectId(order_id),
-            "seller_id": user_id
-        })
+            "seller_id": ref_match(user_id)
+        }, max_time_ms=query_max_time_ms())
 
         if not existing_order:
             return None
 
         update_data = order_data.dict(exclude_unset=True)
+        for field in ("status", "payment_status"):
+            if update_data.get(field) is None:
+                update_data.pop(field, None)
+        error = self._transition_error(existing_order, order_data)
+        if error:
+            raise ValueError(error)
+
         if update_data:
             update_data["updated_at"] = datetime.utcnow()
-            await db[self.collection_name].update_one(
-                {"_id": ObjectId(order_id)},
+            # Only applies if the order is still in the state just validated
+            result = await db[self.collection_name].update_one(
+                {
+                    "_id": ObjectId(order_id),
+                    "status": existing_order.get("status"),
+                    "payment_status": existing_order.get("payment_status"),
+                },
                 {"$set": update_data}
             )
+            if not result.matched_count:
+                raise OrderConflict("Order changed concurrently, retry")
+            if update_data.get("status"):
+                await seller_stats_service.record_status_changes(
+                    [(existing_order, existing_order["status"], update_data["status"])])
+            order_event_hub.record_writes([(existing_order, update_data)])
 
         return await self.get_order_by_id(order_id)
 
-    async def _populate_order_info(self, order: OrderResponse):
-        """Populate order with related information"""
-        # Get product info
-        product = await product_service.get_product_by_id(order.product_id)
-        if product:
-            order.product_info = {
-                "id": product.id,
-                "title": product.title,
-                "price": product.price,
-                "images": product.images
-            }
+    async def bulk_update_status(self, update: OrderBulkStatusUpdate,
+                                 seller_id: str) -> OrderBulkStatusResult:
+        """Apply one status transition to many orders (only by seller).
 
-        # Get buyer info
-        buyer = await user_service.get_user_by_id(order.buyer_id)
-        if buyer:
-            order.buyer_info = {
-                "id": buyer.id,
-                "username": buyer.username,
-                "full_name": buyer.full_name,
-                "profile_image": buyer.profile_image
-            }
+        Current states are read with one query and validated against the state
+        machine; all valid changes then go out in a single unordered bulk_write.
+        Each update filters on the state it was validated against, so a
+        concurrent change makes that order a conflict rather than a bad write.
+        """
+        db = await get_database()
+        outcomes = {}
+        object_ids = {}
+
+        for order_id in dict.fromkeys(update.order_ids):
+            try:
+                object_ids[order_id] = ObjectId(order_id)
+            except (InvalidId, TypeError):
+                outcomes[order_id] = OrderBulkOutcome(order_id=order_id, outcome="invalid_id")
+
+        current = {}
+        cursor = db[self.collection_name].find(
+            {"_id": {"$in": list(object_ids.values())}, "seller_id": ref_match(seller_id)},
+            {"status": 1, "payment_status": 1, "buyer_id": 1, "seller_id": 1,
+             "created_at": 1, "quantity": 1, "total_price": 1},
+            max_time_ms=query_max_time_ms()
+        )
+        async for order_dict in cursor:
+            current[str(order_dict["_id"])] = order_dict
+
+        now = datetime.utcnow()
+        operations = []
+        pending = []
+        written = {}
+        for order_id, object_id in object_ids.items():
+            order_dict = current.get(order_id)
+            if order_dict is None:
+                outcomes[order_id] = OrderBulkOutcome(order_id=order_id, outcome="not_found")
+                continue
+
+            error = self._transition_error(order_dict, update)
+            if error:
+                outcomes[order_id] = OrderBulkOutcome(
+                    order_id=order_id, outcome="invalid_transition", detail=error)
+                continue
+
+            changes = {}
+            if update.status and update.status != order_dict["status"]:
+                changes["status"] = update.status
+            if update.payment_status and update.payment_status != order_dict["payment_status"]:
+                changes["payment_status"] = update.payment_status
+            if not changes:
+                outcomes[order_id] = OrderBulkOutcome(order_id=order_id, outcome="unchanged")
+                continue
+
+            if update.seller_notes is not None:
+                changes["seller_notes"] = update.seller_notes
+            changes["updated_at"] = now
+            operations.append(UpdateOne(
+                {
+                    "_id": object_id,
+                    "seller_id": ref_match(seller_id),
+                    "status": order_dict["status"],
+                    "payment_status": order_dict["payment_status"],
+                },
+                {"$set": changes}
+            ))
+            pending.append(order_id)
+            written[order_id] = changes
+
+        if operations:
+            result = await db[self.collection_name].bulk_write(operations, ordered=False)
+            applied = set(pending)
+            if result.modified_count != len(operations):
+                # Some orders changed underneath us; our writes carry `now`
+                cursor = db[self.collection_name].find(
+                    {"_id": {"$in": [object_ids[i] for i in pending]}, "updated_at": now},
+                    {"_id": 1}
+                )
+                applied = {str(order_dict["_id"]) async for order_dict in cursor}
+
+            for order_id in pending:
+                if order_id in applied:
+                    outcomes[order_id] = OrderBulkOutcome(order_id=order_id, outcome="updated")
+                else:
+                    outcomes[order_id] = OrderBulkOutcome(
+                        order_id=order_id, outcome="conflict",
+                        detail="Order changed concurrently, retry")
+
+            if update.status:
+                await seller_stats_service.record_status_changes(
+                    (current[order_id], current[order_id]["status"], update.status)
+                    for order_id in pending if order_id in applied)
+            order_event_hub.record_writes(
+                (current[order_id], written[order_id])
+                for order_id in pending if order_id in applied)
+
+        results = [outcomes[order_id] for order_id in dict.fromkeys(update.order_ids)]
+        return OrderBulkStatusResult(
+            updated=sum(outcome.outcome == "updated" for outcome in results),
+            results=results
+        )
+
+    def _transition_error(self, order_dict: dict,
+                          update: Union[OrderUpdate, OrderBulkStatusUpdate]) -> Optional[str]:
+        if update.status and not can_transition(
+                ORDER_STATUS_TRANSITIONS, order_dict["status"], update.status):
+            return f"Cannot move order from {order_dict['status']} to {update.status.value}"
+        if update.payment_status and not can_transition(
+                PAYMENT_STATUS_TRANSITIONS, order_dict["payment_status"], update.payment_status):
+            return (f"Cannot move payment from {order_dict['payment_status']} "
+                    f"to {update.payment_status.value}")
+        return None
 
-        # Get seller info
-        seller = await user_service.get_user_by_id(order.seller_id)
-        if seller:
-            order.seller_info = {
-                "id": seller.id,
-                "username": seller.username,
-                "full_name": seller.full_name,
-                "profile_image": seller.profile_image
-            }
+    async def _populate_order_info(self, order: OrderResponse):
+        """Fill in related information missing from the embedded snapshots"""
+        # Get product info (orders created before snapshots were embedded)
+        if order.product_info is None:
+            product = await product_service.get_product_by_id(
+                order.product_id, populate_seller=False)
+            if product:
+                order.product_info = {
+                    "id": product.id,
+                    "title": product.title,
+                    "price": product.price,
+                    "images": product.images
+                }
+
+        # Get buyer/seller info only when a snapshot is missing or stale
+        stale = [user_id for user_id, snapshot in (
+            (order.buyer_id, order.buyer_info),
+            (order.seller_id, order.seller_info),
+        ) if snapshot_service.is_stale(snapshot)]
+        if stale:
+            users = await snapshot_service.get_snapshots(stale)
+            if order.buyer_id in users:
+                order.buyer_info = users[order.buyer_id]
+            if order.seller_id in users:
+                order.seller_info = users[order.seller_id]
 
 
 order_service = OrderService()
@@ -1,62 +1,283 @@
-from typing import List, Optional
+import asyncio
+import re
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from datetime import datetime
-from app.core.database import get_database
+from app.core.config import settings
+from app.core.count_cache import count_cache
+from app.core.database import (
+    CATALOG_READ, PRIMARY_READ, get_database, get_read_database
+)
+from app.core.deadline import clear_budget, query_max_time_ms
+from app.core.jobs import job_queue
+from app.core.metrics import metrics
 from app.models.product import Product, ProductInDB, ProductResponse
 from app.schemas.product import ProductCreate, ProductUpdate, ProductFilter
-from app.services.user_service import user_service
+from app.services.duplicate_service import DuplicateListing, duplicate_service
+from app.services.saved_search_service import saved_search_service
+from app.services.snapshot_service import snapshot_service
+from app.services.storefront_service import storefront_service
+from app.services.trending_service import trending_service
+from app.utils.bulk_import import Row
+from app.utils.object_ids import ref_match, ref_values, store_refs
+
+VIEWS_JOB = "product_views"
 
 
 class ProductService:
     def __init__(self):
         self.collection_name = "products"
+        self._pending_views: Dict[str, int] = {}
+        self._view_flush = None
 
     async def create_product(
             self, product_data: ProductCreate, seller_id: str) -> ProductInDB:
         """Create a new product"""
         db = await get_database()
 
-        product_dict = product_data.dict()
-        product_dict["seller_id"] = seller_id
-
-        product = ProductInDB(**product_dict)
-        result = await db[self.collection_name].insert_one(product.dict(by_alias=True))
-        product.id = str(result.inserted_id)
+        seller_info = await snapshot_service.get_snapshot(seller_id)
+        product = self._new_product(product_data, seller_id, seller_info)
+        signature = duplicate_service.signature(product.title, product.description)
+        duplicate_of = duplicate_service.find(signature)
+        if duplicate_of:
+            merged = await self._handle_duplicate(product, duplicate_of)
+            if merged:
+                return merged
+
+        document = store_refs(product.dict(by_alias=True, exclude={"id"}))
+        document["_id"] = ObjectId()
+        # Indexed before the insert so a concurrent copy is caught as well
+        duplicate_service.add(document["_id"], signature)
+        try:
+            await db[self.collection_name].insert_one(document)
+        except PyMongoError:
+            duplicate_service.remove(document["_id"])
+            raise
+        product.id = str(document["_id"])
+        storefront_service.invalidate(seller_id)
+        await saved_search_service.enqueue_matching([document])
 
         return product
 
+    async def _handle_duplicate(self, product: ProductInDB,
+                                duplicate_of: str) -> Optional[ProductInDB]:
+        """Apply DUPLICATE_ACTION to a new listing that duplicates another.
+
+        Flagging marks the listing and lets it through. Merging folds it
+        into the seller's own original and returns that instead; duplicates
+        of other sellers' listings cannot merge and are rejected.
+        """
+        action = settings.DUPLICATE_ACTION
+        if action == "flag":
+            product.duplicate_of = duplicate_of
+            return None
+
+        if action == "merge":
+            db = await get_database()
+            merged = await db[self.collection_name].find_one_and_update(
+                {"_id": ObjectId(duplicate_of), "seller_id": ref_match(product.seller_id),
+                 "status": "active"},
+                {"$max": {"quantity_available": product.quantity_available},
+                 "$set": {"updated_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            )
+            if merged:
+                merged["_id"] = str(merged["_id"])
+                return ProductInDB(**merged)
+
+        raise DuplicateListing(duplicate_of)
+
+    async def bulk_create_products(
+        self,
+        rows: AsyncIterator[Row],
+        seller_id: str,
+        batch_size: int = 500
+    ) -> AsyncIterator[dict]:
+        """Validate rows as they arrive and insert them in unordered batches.
+
+        Yields one result per row, then a summary. Only one batch of documents
+        is held in memory at a time. If a batch fails for any reason other
+        than per-row write errors, its rows are reported and the import stops
+        with an "aborted" result instead of the summary.
+        """
+        batch = []
+        created = failed = 0
+        seller_info = await snapshot_service.get_snapshot(seller_id)
+
+        try:
+            async for row, data, error in rows:
+                if error is None:
+                    try:
+                        product = self._new_product(
+                            ProductCreate(**data), seller_id, seller_info)
+                    except ValidationError as e:
+                        error = "; ".join(
+                            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+                            for err in e.errors())
+
+                if error is None:
+                    signature = duplicate_service.signature(product.title, product.description)
+                    duplicate_of = duplicate_service.find(signature)
+                    # Bulk rows are only ever flagged or rejected, never merged
+                    if duplicate_of and settings.DUPLICATE_ACTION == "flag":
+                        product.duplicate_of = duplicate_of
+                    elif duplicate_of:
+                        error = str(DuplicateListing(duplicate_of))
+
+                if error is not None:
+                    failed += 1
+                    yield {"row": row, "status": "error", "error": error}
+                    continue
+
+                document = store_refs(product.dict(by_alias=True))
+                document["_id"] = ObjectId()
+                duplicate_service.add(document["_id"], signature)
+                batch.append((row, document))
+
+                if len(batch) >= batch_size:
+                    pending, batch = batch, []
+                    async for result in self._insert_batch(pending):
+                        created += result["status"] == "created"
+                        failed += result["status"] == "error"
+                        yield result
+                        if result["status"] == "aborted":
+                            return
+
+            if batch:
+                pending, batch = batch, []
+                async for result in self._insert_batch(pending):
+                    created += result["status"] == "created"
+                    failed += result["status"] == "error"
+                    yield result
+                    if result["status"] == "aborted":
+                        return
+        finally:
+            # Rows indexed but never handed to an insert (the body was cut
+            # short) must not linger as phantom duplicates
+            for _, document in batch:
+                duplicate_service.remove(document["_id"])
+
+        yield {"status": "summary", "created": created, "failed": failed}
+
+    async def _insert_batch(self, batch: List[Tuple[int, dict]]) -> AsyncIterator[dict]:
+        db = await get_database()
+        write_errors = {}
+        aborted = None
+        try:
+            await db[self.collection_name].insert_many(
+                [document for _, document in batch], ordered=False)
+        except BulkWriteError as e:
+            write_errors = {err["index"]: err["errmsg"]
+                            for err in e.details.get("writeErrors", [])}
+        except PyMongoError as e:
+            # Part of the batch may have landed; report each row as it stands
+            aborted = f"Import stopped: {e}"
+            write_errors = await self._missing_rows(batch, aborted)
+        except (Exception, asyncio.CancelledError):
+            # Outcome unknown: unindex the whole batch, as create_product does
+            for _, document in batch:
+                duplicate_service.remove(document["_id"])
+            raise
+
+        created = [document for index, (_, document) in enumerate(batch)
+                   if index not in write_errors]
+        if created:
+            storefront_service.invalidate(created[0]["seller_id"])
+            try:
+                await saved_search_service.enqueue_matching(created)
+            except PyMongoError:
+                # The listings exist; only their saved search alerts are lost
+                metrics.incr("saved_searches.enqueue_errors")
+        for index, (row, document) in enumerate(batch):
+            if index in write_errors:
+                duplicate_service.remove(document["_id"])
+                yield {"row": row, "status": "error", "error": write_errors[index]}
+            else:
+                yield {"row": row, "status": "created", "id": str(document["_id"])}
+        if aborted:
+            yield {"status": "aborted", "error": aborted}
+
+    async def _missing_rows(self, batch: List[Tuple[int, dict]], error: str) -> Dict[int, str]:
+        """Errors for the rows of a failed batch that were not inserted"""
+        db = await get_database()
+        try:
+            cursor = db[self.collection_name].find(
+                {"_id": {"$in": [document["_id"] for _, document in batch]}}, {"_id": 1})
+            landed = {product_dict["_id"] async for product_dict in cursor}
+        except PyMongoError:
+            return {index: f"{error} (row may or may not have been created)"
+                    for index in range(len(batch))}
+        return {index: error for index, (_, document) in enumerate(batch)
+                if document["_id"] not in landed}
+
+    def _new_product(self, product_data: ProductCreate, seller_id: str,
+                     seller_info: Optional[dict]) -> ProductInDB:
+        product_dict = product_data.dict()
+        product_dict["seller_id"] = seller_id
+        # Embedded so reads need no join with users
+        product_dict["seller_info"] = seller_info
+        return ProductInDB(**product_dict)
+
     async def get_product_by_id(
-            self, product_id: str) -> Optional[ProductResponse]:
+            self, product_id: str, populate_seller: bool = True,
+            route: str = PRIMARY_READ) -> Optional[ProductResponse]:
         """Get product by ID with seller information"""
-        db = await get_database()
-        product_dict = await db[self.collection_name].find_one({"_id": ObjectId(product_id)})
+        db = await get_read_database(route)
+        product_dict = await db[self.collection_name].find_one(
+            {"_id": ObjectId(product_id)}, max_time_ms=query_max_time_ms())
 
         if product_dict:
             product_dict["_id"] = str(product_dict["_id"])
             product = ProductResponse(**product_dict)
 
-            # Get seller info
-            seller = await user_service.get_user_by_id(product.seller_id)
-            if seller:
-                product.seller_info = {
-                    "id": seller.id,
-                    "username": seller.username,
-                    "full_name": seller.full_name,
-                    "profile_image": seller.profile_image
-                }
+            if populate_seller and snapshot_service.is_stale(product.seller_info):
+                await self.populate_seller_info(product)
 
             return product
         return None
 
-    async def get_products(
-        self,
-        filter_data: ProductFilter,
-        skip: int = 0,
-        limit: int = 10
-    ) -> List[ProductResponse]:
-        """Get products with filters"""
-        db = await get_database()
-
+    async def get_products_batch(
+            self, product_ids: List[str],
+            route: str = PRIMARY_READ) -> Tuple[List[ProductResponse], List[str]]:
+        """Products in the order asked for, plus the ids not found.
+
+        One $in query fetches the products and one more refreshes any stale
+        seller snapshots among them. Views are not counted.
+        """
+        documents = await self.get_products_by_ids(
+            [product_id for product_id in product_ids if ObjectId.is_valid(product_id)],
+            route=route)
+        found = {product_id: ProductResponse(**product_dict)
+                 for product_id, product_dict in documents.items()}
+        await self._refresh_seller_info(found.values())
+
+        products = [found[product_id] for product_id in product_ids if product_id in found]
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        return products, missing
+
+    async def _refresh_seller_info(self, products: Iterable[ProductResponse]):
+        """Replace stale seller snapshots with one query for all their sellers"""
+        stale = [product for product in products
+                 if snapshot_service.is_stale(product.seller_info)]
+        if not stale:
+            return
+        sellers = await snapshot_service.get_snapshots(
+            {product.seller_id for product in stale})
+        for product in stale:
+            if product.seller_id in sellers:
+                product.seller_info = sellers[product.seller_id]
+
+    async def populate_seller_info(self, product: ProductResponse):
+        """Populate product with seller information (fallback for stale snapshots)"""
+        seller_info = await snapshot_service.get_snapshot(product.seller_id)
+        if seller_info:
+            product.seller_info = seller_info
+
+    def _build_query(self, filter_data: ProductFilter) -> dict:
+        """Build the MongoDB filter for a product listing"""
         # Build filter query
         query = {"status": "active"}
 
@@ -76,41 +297,46 @@ class ProductService:
 
         if filter_data.location:
             query["location"] = {
-                "$pattern": filter_data.location,
+                "$regex": re.escape(filter_data.location),
                 "$options": "i"}
 
         if filter_data.search:
             query["$text"] = {"$search": filter_data.search}
 
+        return query
+
+    async def get_products(
+        self,
+        filter_data: ProductFilter,
+        skip: int = 0,
+        limit: int = 10
+    ) -> List[ProductResponse]:
+        """Get products with filters"""
+        db = await get_read_database(CATALOG_READ)
+        query = self._build_query(filter_data)
+
         # Execute query
-        cursor = db[self.collection_name].find(query).skip(
+        cursor = db[self.collection_name].find(
+            query, max_time_ms=query_max_time_ms()).skip(
             skip).limit(limit).sort("created_at", -1)
         products = []
 
         async for product_dict in cursor:
             product_dict["_id"] = str(product_dict["_id"])
-            product = ProductResponse(**product_dict)
-
-            # Get seller info
-            seller = await user_service.get_user_by_id(product.seller_id)
-            if seller:
-                product.seller_info = {
-                    "id": seller.id,
-                    "username": seller.username,
-                    "full_name": seller.full_name,
-                    "profile_image": seller.profile_image
-                }
-
-            products.append(product)
+            products.append(ProductResponse(**product_dict))
 
+        # Seller info is embedded; join only for stale snapshots, once per page
+        await self._refresh_seller_info(products)
         return products
 
     async def get_user_products(
-            self, user_id: str, skip: int = 0, limit: int = 10) -> List[ProductResponse]:
+            self, user_id: str, skip: int = 0, limit: int = 10,
+            route: str = PRIMARY_READ) -> List[ProductResponse]:
         """Get products by user"""
-        db = await get_database()
+        db = await get_read_database(route)
 
-        cursor = db[self.collection_name].find({"seller_id": user_id}).skip(
+        cursor = db[self.collection_name].find(
+            {"seller_id": ref_match(user_id)}, max_time_ms=query_max_time_ms()).skip(
             skip).limit(limit).sort("created_at", -1)
         products = []
 
@@ -121,6 +347,61 @@ class ProductService:
 
         return products
 
+    async def get_products_by_ids(self, product_ids: Iterable[str],
+                                  projection: Optional[dict] = None,
+                                  route: str = PRIMARY_READ) -> Dict[str, dict]:
+        """Get raw product documents by ID in one query, keyed by string ID"""
+        db = await get_read_database(route)
+        object_ids = [ObjectId(product_id) for product_id in set(product_ids)]
+        if not object_ids:
+            return {}
+
+        cursor = db[self.collection_name].find(
+            {"_id": {"$in": object_ids}}, projection,
+            max_time_ms=query_max_time_ms())
+        products = {}
+        async for product_dict in cursor:
+            product_dict["_id"] = str(product_dict["_id"])
+            products[product_dict["_id"]] = product_dict
+        return products
+
+    async def export_user_products(self, user_id: str) -> AsyncIterator[List[dict]]:
+        """Stream a seller's catalog as batches of flat export rows"""
+        # Exports outlive the request budget; don't cap the cursor with maxTimeMS
+        clear_budget()
+        db = await get_database()
+        cursor = db[self.collection_name].find(
+            {"seller_id": ref_match(user_id)},
+            projection={"seller_info": 0, "description": 0},
+            batch_size=settings.EXPORT_BATCH_SIZE
+        ).sort("created_at", -1)
+
+        try:
+            while True:
+                batch = await cursor.to_list(length=settings.EXPORT_BATCH_SIZE)
+                if not batch:
+                    break
+                for product_dict in batch:
+                    product_dict["id"] = str(product_dict.pop("_id"))
+                yield batch
+        finally:
+            await cursor.close()
+
+    async def count_products(
+            self, filter_data: ProductFilter, exact: bool = False) -> Tuple[int, bool]:
+        """Count products matching filters, returning (total, approximate)"""
+        db = await get_read_database(CATALOG_READ)
+        return await count_cache.count(
+            db[self.collection_name], self._build_query(filter_data), exact)
+
+    async def count_user_products(
+            self, user_id: str, exact: bool = False,
+            route: str = PRIMARY_READ) -> Tuple[int, bool]:
+        """Count products by user, returning (total, approximate)"""
+        db = await get_read_database(route)
+        return await count_cache.count(
+            db[self.collection_name], {"seller_id": ref_match(user_id)}, exact)
+
     async def update_product(self, product_id: str, product_data: ProductUpdate,
                              user_id: str) -> Optional[ProductResponse]:
         """Update product (only by owner)"""
@@ -129,19 +410,36 @@ class ProductService:
         # Check if user owns the product
         existing_product = await db[self.collection_name].find_one({
             "_id": ObjectId(product_id),
-            "seller_id": user_id
-        })
+            "seller_id": ref_match(user_id)
+        }, max_time_ms=query_max_time_ms())
 
         if not existing_product:
             return None
 
         update_data = product_data.dict(exclude_unset=True)
+        updated = {**existing_product, **update_data}
+        signature = None
+        if updated.get("status", "active") == "active":
+            signature = duplicate_service.signature(updated["title"], updated["description"])
+        if "title" in update_data or "description" in update_data:
+            # An edit can only be flagged; merging applies to new listings
+            duplicate_of = duplicate_service.find(signature, exclude=product_id)
+            if duplicate_of and settings.DUPLICATE_ACTION != "flag":
+                raise DuplicateListing(duplicate_of)
+            if duplicate_of or existing_product.get("duplicate_of"):
+                update_data["duplicate_of"] = duplicate_of
+
         if update_data:
             update_data["updated_at"] = datetime.utcnow()
             await db[self.collection_name].update_one(
                 {"_id": ObjectId(product_id)},
                 {"$set": update_data}
             )
+            if signature is None:
+                duplicate_service.remove(product_id)
+            else:
+                duplicate_service.add(product_id, signature)
+            storefront_service.invalidate(user_id)
 
         return await self.get_product_by_id(product_id)
 
@@ -151,18 +449,96 @@ class ProductService:
 
         result = await db[self.collection_name].delete_one({
             "_id": ObjectId(product_id),
-            "seller_id": user_id
+            "seller_id": ref_match(user_id)
         })
+        if result.deleted_count:
+            duplicate_service.remove(product_id)
+            storefront_service.invalidate(user_id)
 
         return result.deleted_count > 0
 
-    async def increment_views(self, product_id: str):
-        """Increment product views"""
+    async def reserve_stock(self, product_id: str, quantity: int,
+                            buyer_id: str) -> Optional[dict]:
+        """Atomically take quantity units of an active product.
+
+        One conditional find_one_and_update both checks availability and
+        decrements stock, flipping the product to sold when it reaches zero.
+        Returns the updated document, or None when the product cannot be
+        reserved. Products created before stock tracking count as one unit.
+        """
+        db = await get_database()
+        stock = {"$ifNull": ["$quantity_available", 1]}
+        product = await db[self.collection_name].find_one_and_update(
+            {
+                "_id": ObjectId(product_id),
+                "status": "active",
+                "seller_id": {"$nin": ref_values(buyer_id)},
+                "$expr": {"$gte": [stock, quantity]},
+            },
+            [
+                {"$set": {
+                    "quantity_available": {"$subtract": [stock, quantity]},
+                    "updated_at": datetime.utcnow(),
+                }},
+                {"$set": {"status": {"$cond": [
+                    {"$lte": ["$quantity_available", 0]}, "sold", "$status"]}}},
+            ],
+            projection={"title": 1, "price": 1, "images": 1, "seller_id": 1,
+                        "category": 1, "quantity_available": 1, "status": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if product and product["status"] != "active":
+            duplicate_service.remove(product_id)
+        return product
+
+    async def release_stock(self, product_id: str, quantity: int):
+        """Give back reserved units, reactivating a product sold out by them"""
         db = await get_database()
         await db[self.collection_name].update_one(
             {"_id": ObjectId(product_id)},
-            {"$inc": {"views": 1}}
+            [
+                {"$set": {
+                    "quantity_available": {"$add": [
+                        {"$ifNull": ["$quantity_available", 0]}, quantity]},
+                    "status": {"$cond": [{"$eq": ["$status", "sold"]}, "active", "$status"]},
+                    "updated_at": datetime.utcnow(),
+                }},
+            ]
         )
+        duplicate_service.schedule_refresh(product_id)
+
+    async def increment_views(self, product_id: str, category: Optional[str] = None):
+        """Count a product view; counts are written in bulk every VIEW_FLUSH_SECONDS"""
+        self._pending_views[product_id] = self._pending_views.get(product_id, 0) + 1
+        if self._view_flush is None:
+            self._view_flush = asyncio.create_task(self._flush_views_later())
+        if category:
+            trending_service.record_view(product_id, category)
+
+    async def _flush_views_later(self):
+        clear_budget()
+        await asyncio.sleep(settings.VIEW_FLUSH_SECONDS)
+        self._view_flush = None
+        try:
+            await self.flush_views()
+        except PyMongoError:
+            metrics.incr("products.view_flush_errors")
+
+    async def flush_views(self):
+        """Queue the views counted since the last flush as one job"""
+        counts, self._pending_views = self._pending_views, {}
+        if counts:
+            await job_queue.enqueue(VIEWS_JOB, {"counts": counts})
+
+    async def run_views_job(self, payload: dict):
+        # A retry after a partial write can count some views twice; views are
+        # a popularity signal, not a ledger
+        db = await get_database()
+        await db[self.collection_name].bulk_write([
+            UpdateOne({"_id": ObjectId(product_id)}, {"$inc": {"views": count}})
+            for product_id, count in payload["counts"].items()
+        ], ordered=False)
 
 
 product_service = ProductService()
+job_queue.register(VIEWS_JOB, product_service.run_views_job)
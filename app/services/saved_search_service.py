@@ -0,0 +1,319 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.deadline import clear_budget, query_max_time_ms
+from app.core.invalidation import change_stream_watcher, invalidation_bus
+from app.core.jobs import job_queue
+from app.core.metrics import metrics
+from app.schemas.product import (
+    ProductFilter, SavedSearchCreate, SavedSearchMatch, SavedSearchResponse
+)
+from app.utils.percolator import QueryIndex
+
+SAVED_SEARCHES_COLLECTION = "saved_searches"
+# One document per user counting their saved searches, to enforce the cap
+COUNTS_COLLECTION = "saved_search_counts"
+OUTBOX_COLLECTION = "notification_outbox"
+OUTBOX_BATCH_SIZE = 1000
+MATCH_JOB = "saved_search_match"
+
+# Yield to request handlers this often while loading or matching
+LOAD_YIELD_EVERY = 1000
+MATCH_YIELD_EVERY = 1000
+
+# Rebuild the index once it holds more removed rows than these and live ones
+COMPACT_MIN_TOMBSTONES = 1024
+
+
+class SavedSearchService:
+    """Saved product filters and alerts for new listings that match them.
+
+    Every worker keeps all saved filters in an in-memory query index (see
+    app/utils/percolator.py), loaded at startup and kept current by its own
+    writes and by change events from other workers. Without change streams a
+    worker only hears of its own writes, so it rebuilds the index now and
+    then and checks matched searches still exist before alerting anyone.
+    Deleted searches stay in the index as tombstones until a rebuild, so with
+    change streams the index is rebuilt once they outnumber the live ones.
+    A new listing is matched against the index by a background job queued
+    with the insert, and each matching user gets one pending entry in
+    notification_outbox.
+    """
+
+    def __init__(self):
+        self.collection_name = SAVED_SEARCHES_COLLECTION
+        self.counts_collection_name = COUNTS_COLLECTION
+        self.outbox_collection_name = OUTBOX_COLLECTION
+        self.index = QueryIndex()
+        # The index being rebuilt, which also takes this worker's writes
+        self._reloading: Optional[QueryIndex] = None
+        self._task = None
+        self._loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SAVED_SEARCHES_ENABLED
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        await self.load()
+        while True:
+            await asyncio.sleep(settings.SAVED_SEARCHES_RELOAD_SECONDS)
+            if not self._loaded:
+                await self.load()
+            elif self._needs_rebuild():
+                await self.load(fresh=True)
+
+    def _needs_rebuild(self) -> bool:
+        """Without change streams always; with them once tombstones pile up"""
+        if change_stream_watcher.mode != "change_streams":
+            return True
+        return self.index.tombstones > max(len(self.index), COMPACT_MIN_TOMBSTONES)
+
+    async def load(self, fresh: bool = False):
+        """Index every saved search; the live index keeps serving meanwhile.
+
+        With fresh, the searches go into a new index that replaces the live
+        one once complete, which drops searches deleted through other workers.
+        """
+        clear_budget()
+        started = time.perf_counter()
+        db = await get_database()
+        index = QueryIndex() if fresh else self.index
+        if fresh:
+            self._reloading = index
+        loaded = 0
+        try:
+            cursor = db[self.collection_name].find(
+                {}, {"user_id": 1, "filter": 1}, batch_size=5000)
+            async for search in cursor:
+                search_id = str(search["_id"])
+                if search_id not in index.rows:
+                    index.add(search_id, str(search["user_id"]), search["filter"])
+                loaded += 1
+                if loaded % LOAD_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+        except PyMongoError:
+            metrics.incr("saved_searches.load_errors")
+            return
+        finally:
+            self._reloading = None
+
+        self.index = index
+        self._loaded = True
+        metrics.observe("saved_searches.load", time.perf_counter() - started)
+        metrics.set_gauge("saved_searches.indexed", len(self.index))
+        metrics.set_gauge("saved_searches.tombstones", self.index.tombstones)
+
+    async def create_saved_search(self, user_id: str,
+                                  data: SavedSearchCreate) -> SavedSearchResponse:
+        filter_dict = data.filter.dict(exclude_none=True)
+        if not filter_dict:
+            raise ValueError("A saved search needs at least one filter")
+        if data.filter.condition:
+            filter_dict["condition"] = data.filter.condition.value
+        if (data.filter.min_price is not None and data.filter.max_price is not None
+                and data.filter.min_price > data.filter.max_price):
+            raise ValueError("min_price cannot exceed max_price")
+
+        db = await get_database()
+        if not await self._reserve_slot(db, ObjectId(user_id)):
+            raise ValueError(
+                f"At most {settings.MAX_SAVED_SEARCHES_PER_USER} saved searches per user")
+
+        document = {
+            "user_id": ObjectId(user_id),
+            "name": data.name,
+            "filter": filter_dict,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            result = await db[self.collection_name].insert_one(document)
+        except PyMongoError:
+            await self._release_slot(db, ObjectId(user_id))
+            raise
+        self._index_add(str(result.inserted_id), user_id, filter_dict)
+        return self._response(document)
+
+    async def get_saved_searches(self, user_id: str) -> List[SavedSearchResponse]:
+        db = await get_database()
+        cursor = db[self.collection_name].find(
+            {"user_id": ObjectId(user_id)}, max_time_ms=query_max_time_ms()
+        ).sort("created_at", -1)
+        return [self._response(search) async for search in cursor]
+
+    async def delete_saved_search(self, search_id: str, user_id: str) -> bool:
+        db = await get_database()
+        result = await db[self.collection_name].delete_one(
+            {"_id": ObjectId(search_id), "user_id": ObjectId(user_id)})
+        if result.deleted_count:
+            await self._release_slot(db, ObjectId(user_id))
+            self._index_remove(search_id)
+        return result.deleted_count > 0
+
+    async def _reserve_slot(self, db, user_id: ObjectId) -> bool:
+        """Count one more saved search for a user unless they are at the cap.
+
+        The conditional increment is atomic, so concurrent creates cannot
+        exceed the cap between counting and inserting. A user's counter
+        starts from the searches they saved before it existed.
+        """
+        counts = db[self.counts_collection_name]
+        if await counts.find_one({"_id": user_id}) is None:
+            saved = await db[self.collection_name].count_documents({"user_id": user_id})
+            try:
+                await counts.update_one(
+                    {"_id": user_id}, {"$setOnInsert": {"count": saved}}, upsert=True)
+            except DuplicateKeyError:
+                pass  # Started by a concurrent create
+        reserved = await counts.find_one_and_update(
+            {"_id": user_id, "count": {"$lt": settings.MAX_SAVED_SEARCHES_PER_USER}},
+            {"$inc": {"count": 1}})
+        return reserved is not None
+
+    async def _release_slot(self, db, user_id: ObjectId):
+        await db[self.counts_collection_name].update_one(
+            {"_id": user_id, "count": {"$gt": 0}}, {"$inc": {"count": -1}})
+
+    async def get_matches(self, user_id: str, skip: int = 0,
+                          limit: int = 20) -> List[SavedSearchMatch]:
+        """Newest alerts for a user, delivered or not"""
+        db = await get_database()
+        cursor = db[self.outbox_collection_name].find(
+            {"user_id": ObjectId(user_id)}, max_time_ms=query_max_time_ms()
+        ).sort("created_at", -1).skip(skip).limit(limit)
+        return [SavedSearchMatch(
+            id=str(entry["_id"]),
+            saved_search_id=str(entry["saved_search_id"]),
+            product_id=str(entry["product_id"]),
+            title=entry["title"],
+            price=entry["price"],
+            created_at=entry["created_at"],
+        ) async for entry in cursor]
+
+    async def enqueue_matching(self, product_dicts: List[dict]):
+        """Queue new listings for matching so the request returns first"""
+        if not self.enabled:
+            return
+        await job_queue.enqueue_many(MATCH_JOB, [
+            {"product_id": str(product["_id"])} for product in product_dicts
+            if product.get("status", "active") == "active"
+        ])
+
+    async def run_match_job(self, payload: dict):
+        if not self._loaded:
+            # Retried later, once this worker's index holds every saved search
+            raise RuntimeError("Saved searches are still loading")
+        db = await get_database()
+        product = await db.products.find_one(
+            {"_id": ObjectId(payload["product_id"]), "status": "active"})
+        if product:
+            await self.notify_matches(product)
+
+    async def notify_matches(self, product_dict: dict) -> int:
+        """Queue one outbox entry per user with a saved search matching the listing"""
+        clear_budget()
+        started = time.perf_counter()
+        seller_id = str(product_dict.get("seller_id"))
+        now = datetime.utcnow()
+
+        matches = []
+        for matched, (search_id, owner, *_) in enumerate(self.index.match(product_dict), 1):
+            if matched % MATCH_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            if owner != seller_id:
+                matches.append((search_id, owner))
+
+        db = await get_database()
+        if change_stream_watcher.mode != "change_streams":
+            matches = await self._still_saved(db, matches)
+
+        entries = {}
+        for search_id, owner in matches:
+            if owner not in entries:
+                entries[owner] = {
+                    "user_id": ObjectId(owner),
+                    "type": "saved_search_match",
+                    "saved_search_id": ObjectId(search_id),
+                    "product_id": ObjectId(product_dict["_id"]),
+                    "title": product_dict["title"],
+                    "price": product_dict["price"],
+                    "status": "pending",
+                    "created_at": now,
+                }
+        metrics.observe("saved_searches.match", time.perf_counter() - started)
+
+        documents = list(entries.values())
+        for start in range(0, len(documents), OUTBOX_BATCH_SIZE):
+            try:
+                await db[self.outbox_collection_name].insert_many(
+                    documents[start:start + OUTBOX_BATCH_SIZE], ordered=False)
+            except BulkWriteError as e:
+                # A retried job finds the alerts of its earlier attempt
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+        metrics.incr("saved_searches.matches", len(documents))
+        return len(documents)
+
+    async def _still_saved(self, db, matches: List[tuple]) -> List[tuple]:
+        """Drop matched searches deleted through other workers since the last load"""
+        search_ids = list({search_id for search_id, _ in matches})
+        saved = set()
+        for start in range(0, len(search_ids), OUTBOX_BATCH_SIZE):
+            cursor = db[self.collection_name].find(
+                {"_id": {"$in": [ObjectId(search_id) for search_id
+                                 in search_ids[start:start + OUTBOX_BATCH_SIZE]]}},
+                {"_id": 1})
+            saved.update([str(search["_id"]) async for search in cursor])
+        for search_id in search_ids:
+            if search_id not in saved:
+                self._index_remove(search_id)
+        return [match for match in matches if match[0] in saved]
+
+    def _index_add(self, search_id: str, owner: str, filter_dict: dict):
+        self.index.add(search_id, owner, filter_dict)
+        if self._reloading is not None:
+            self._reloading.add(search_id, owner, filter_dict)
+
+    def _index_remove(self, search_id: str):
+        self.index.remove(search_id)
+        if self._reloading is not None:
+            self._reloading.remove(search_id)
+
+    def on_saved_search_change(self, change: dict):
+        """Follow searches saved or deleted through other workers"""
+        operation = change.get("operationType")
+        if operation in ("insert", "replace"):
+            search = change["fullDocument"]
+            self._index_add(str(search["_id"]), str(search["user_id"]), search["filter"])
+        elif operation == "delete":
+            self._index_remove(str(change["documentKey"]["_id"]))
+
+    def _response(self, search: dict) -> SavedSearchResponse:
+        return SavedSearchResponse(
+            id=str(search["_id"]),
+            name=search.get("name"),
+            filter=ProductFilter(**search["filter"]),
+            created_at=search["created_at"],
+        )
+
+
+saved_search_service = SavedSearchService()
+invalidation_bus.subscribe(SAVED_SEARCHES_COLLECTION, saved_search_service.on_saved_search_change)
+job_queue.register(MATCH_JOB, saved_search_service.run_match_job, concurrency=2)
@@ -0,0 +1,185 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.core.database import get_database
+from app.core.deadline import clear_budget, query_max_time_ms
+from app.core.metrics import metrics
+from app.models.order import OrderStatus
+from app.schemas.order import SellerDayStats, SellerStatsResult
+from app.services.order_archive_service import ARCHIVE_COLLECTION
+
+# Orders in these states don't count towards net revenue
+UNREALIZED_STATUSES = (OrderStatus.CANCELLED.value, OrderStatus.REFUNDED.value)
+
+
+def day_key(seller_id, day) -> str:
+    """Rollup _id: sorts by seller, then day, so a date range is one _id range scan"""
+    return f"{seller_id}:{day.strftime('%Y-%m-%d')}"
+
+
+class SellerStatsService:
+    """Per-seller, per-day order rollups.
+
+    One document per seller and day of order creation holds order count,
+    units and gross revenue, in total and per order status. Order writes
+    keep them current with $inc upserts; scripts/backfill_seller_stats.py
+    rebuilds them from orders with $merge. Dashboards read one small
+    document per day, whatever the order volume.
+    """
+
+    def __init__(self):
+        self.collection_name = "seller_daily_stats"
+
+    def _increments(self, order: dict, status: str, sign: int) -> dict:
+        prefix = f"statuses.{OrderStatus(status).value}"
+        return {
+            f"{prefix}.orders": sign,
+            f"{prefix}.units": sign * order["quantity"],
+            f"{prefix}.revenue": sign * order["total_price"],
+        }
+
+    def _upsert(self, order: dict, increments: dict) -> UpdateOne:
+        created = order["created_at"]
+        return UpdateOne(
+            {"_id": day_key(order["seller_id"], created)},
+            {
+                "$inc": increments,
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": {
+                    "seller_id": ObjectId(str(order["seller_id"])),
+                    "day": datetime(created.year, created.month, created.day),
+                },
+            },
+            upsert=True
+        )
+
+    async def record_order(self, order: dict):
+        """Count a newly created order"""
+        increments = {
+            "orders": 1,
+            "units": order["quantity"],
+            "revenue": order["total_price"],
+            **self._increments(order, order["status"], 1),
+        }
+        await self._write([self._upsert(order, increments)])
+
+    async def record_status_changes(self, changes: Iterable[Tuple[dict, str, str]]):
+        """Move orders between status buckets; changes are (order, old, new)"""
+        operations = [
+            self._upsert(order, {**self._increments(order, old, -1),
+                                 **self._increments(order, new, 1)})
+            for order, old, new in changes if old != new
+        ]
+        if operations:
+            await self._write(operations)
+
+    async def _write(self, operations: List[UpdateOne]):
+        db = await get_database()
+        try:
+            await db[self.collection_name].bulk_write(operations, ordered=False)
+        except PyMongoError:
+            # The order write already happened; a backfill repairs the drift
+            metrics.incr("seller_stats.write_errors")
+
+    async def get_daily_stats(self, seller_id: str, start: date,
+                              end: date) -> SellerStatsResult:
+        """Daily stats from start to end inclusive, with empty days filled in"""
+        db = await get_database()
+        cursor = db[self.collection_name].find(
+            {"_id": {"$gte": day_key(seller_id, start), "$lte": day_key(seller_id, end)}},
+            max_time_ms=query_max_time_ms()
+        )
+        rollups = {rollup["day"].date(): rollup async for rollup in cursor}
+
+        days = []
+        day = start
+        while day <= end:
+            days.append(self._day_stats(day, rollups.get(day, {})))
+            day += timedelta(days=1)
+
+        return SellerStatsResult(
+            start=start,
+            end=end,
+            orders=sum(stats.orders for stats in days),
+            units=sum(stats.units for stats in days),
+            revenue=sum(stats.revenue for stats in days),
+            net_revenue=sum(stats.net_revenue for stats in days),
+            days=days
+        )
+
+    def _day_stats(self, day: date, rollup: dict) -> SellerDayStats:
+        statuses = rollup.get("statuses", {})
+        unrealized = sum(statuses.get(status, {}).get("revenue", 0)
+                         for status in UNREALIZED_STATUSES)
+        return SellerDayStats(
+            day=day,
+            orders=rollup.get("orders", 0),
+            units=rollup.get("units", 0),
+            revenue=rollup.get("revenue", 0),
+            net_revenue=rollup.get("revenue", 0) - unrealized,
+            orders_by_status={status: bucket.get("orders", 0)
+                              for status, bucket in statuses.items()}
+        )
+
+    async def backfill(self, since: Optional[datetime] = None,
+                       seller_id: Optional[str] = None):
+        """Recompute rollups from hot and archived orders server-side with $merge.
+
+        Rollup documents in range are replaced whole, so running it again is
+        safe. Orders written while it runs may be counted twice or not at
+        all; rerun for the affected days once traffic is quiet.
+        """
+        clear_budget()
+        db = await get_database()
+        match = {}
+        if since is not None:
+            match["created_at"] = {"$gte": since}
+        if seller_id is not None:
+            match["seller_id"] = {"$in": [ObjectId(seller_id), seller_id]}
+
+        seller = {"$toObjectId": "$seller_id"}
+        pipeline = [
+            {"$match": match},
+            {"$unionWith": {"coll": ARCHIVE_COLLECTION, "pipeline": [{"$match": match}]}},
+            {"$group": {
+                "_id": {
+                    "seller_id": seller,
+                    "day": {"$dateTrunc": {"date": "$created_at", "unit": "day"}},
+                    "status": "$status",
+                },
+                "orders": {"$sum": 1},
+                "units": {"$sum": "$quantity"},
+                "revenue": {"$sum": "$total_price"},
+            }},
+            {"$group": {
+                "_id": {"seller_id": "$_id.seller_id", "day": "$_id.day"},
+                "orders": {"$sum": "$orders"},
+                "units": {"$sum": "$units"},
+                "revenue": {"$sum": "$revenue"},
+                "statuses": {"$push": {"k": "$_id.status", "v": {
+                    "orders": "$orders", "units": "$units", "revenue": "$revenue"}}},
+            }},
+            {"$project": {
+                "_id": {"$concat": [
+                    {"$toString": "$_id.seller_id"}, ":",
+                    {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id.day"}},
+                ]},
+                "seller_id": "$_id.seller_id",
+                "day": "$_id.day",
+                "orders": 1,
+                "units": 1,
+                "revenue": 1,
+                "statuses": {"$arrayToObject": "$statuses"},
+                "updated_at": "$$NOW",
+            }},
+            {"$merge": {"into": self.collection_name, "on": "_id",
+                        "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ]
+        await db.orders.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+seller_stats_service = SellerStatsService()
@@ -0,0 +1,239 @@
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import CATALOG_READ, get_database, get_read_database
+from app.core.deadline import clear_budget, query_max_time_ms
+from app.core.metrics import metrics
+from app.models.product import ProductResponse
+
+SIMILAR_COLLECTION = "similar_products"
+TEXT_FIELDS = {"title": 1, "description": 1, "tags": 1, "category": 1, "created_at": 1}
+WRITE_BATCH_SIZE = 1000
+
+
+class SimilarityService:
+    """Similar products from TF-IDF nearest neighbours, precomputed per category.
+
+    A full build vectorizes every active product and stores its top-N
+    neighbours within the same category in similar_products; the fitted
+    vocabulary, IDF weights and vectors are saved to SIMILARITY_MODEL_PATH.
+    Incremental updates vectorize only products listed since then against
+    that model and splice them into their neighbours' lists. Builds need
+    NumPy and SciPy; serving does not.
+    """
+
+    def __init__(self):
+        self.collection_name = SIMILAR_COLLECTION
+
+    async def get_similar(self, product_id: str, limit: int = 10) -> List[ProductResponse]:
+        """Precomputed neighbours of a product that are still on sale"""
+        db = await get_read_database(CATALOG_READ)
+        entry = await db[self.collection_name].find_one(
+            {"_id": ObjectId(product_id)}, {"neighbours": 1},
+            max_time_ms=query_max_time_ms())
+        if not entry:
+            return []
+
+        neighbour_ids = [neighbour["id"] for neighbour in entry["neighbours"]]
+        cursor = db.products.find(
+            {"_id": {"$in": neighbour_ids}, "status": "active"},
+            max_time_ms=query_max_time_ms())
+        found = {product_dict["_id"]: product_dict async for product_dict in cursor}
+
+        products = []
+        for neighbour_id in neighbour_ids:
+            product_dict = found.get(neighbour_id)
+            if product_dict is None:
+                continue
+            product_dict["_id"] = str(product_dict["_id"])
+            products.append(ProductResponse(**product_dict))
+            if len(products) == limit:
+                break
+        return products
+
+    async def build(self) -> dict:
+        """Vectorize all active products and rewrite every neighbour list"""
+        import numpy as np
+        from app.utils import similarity
+
+        clear_budget()
+        db = await get_database()
+        started_at = datetime.utcnow()
+        timings = {}
+
+        started = time.perf_counter()
+        ids, categories, terms = await self._load_products({"status": "active"})
+        vocabulary: Dict[str, int] = {}
+        counts = similarity.count_matrix(terms, vocabulary)
+        idf = similarity.fit_idf(counts)
+        vectors = similarity.tfidf(counts, idf, settings.SIMILARITY_MAX_TERMS)
+        del counts, terms
+        timings["vectorize"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        categories = np.asarray(categories)
+        for category in np.unique(categories):
+            rows = np.flatnonzero(categories == category)
+            partition = vectors[rows]
+            neighbours, scores = similarity.top_neighbours(
+                partition, partition, settings.SIMILAR_PRODUCTS_TOP_N, exclude_offset=0,
+                block_rows=similarity.estimate_block_rows(len(rows)))
+            partition_ids = [ids[row] for row in rows]
+            await self._write_neighbours(db, partition_ids, partition_ids, neighbours, scores)
+        timings["neighbours"] = time.perf_counter() - started
+
+        await db[self.collection_name].delete_many({"computed_at": {"$lt": started_at}})
+        self._save_model(ids, categories, vocabulary, idf, vectors, started_at)
+
+        stats = {"products": len(ids), "terms": len(vocabulary),
+                 "vector_bytes": similarity.memory_bytes(vectors), **timings}
+        metrics.observe("similarity.build", sum(timings.values()))
+        return stats
+
+    async def update(self) -> dict:
+        """Add products listed since the last build or update to the model and lists"""
+        import numpy as np
+        from scipy import sparse
+        from app.utils import similarity
+
+        clear_budget()
+        db = await get_database()
+        started_at = datetime.utcnow()
+        model = self._load_model()
+        known = set(model["ids"])
+
+        new_ids, new_categories, terms = await self._load_products(
+            {"status": "active", "created_at": {"$gt": model["built_at"]}})
+        keep = [i for i, product_id in enumerate(new_ids) if product_id not in known]
+        new_ids = [new_ids[i] for i in keep]
+        new_categories = np.asarray([new_categories[i] for i in keep])
+        if not new_ids:
+            return {"products": 0}
+
+        vocabulary = model["vocabulary"]
+        counts = similarity.count_matrix([terms[i] for i in keep], vocabulary, grow=False)
+        new_vectors = similarity.tfidf(counts, model["idf"], settings.SIMILARITY_MAX_TERMS)
+
+        top_n = settings.SIMILAR_PRODUCTS_TOP_N
+        reverse = []
+        for category in np.unique(new_categories):
+            old_rows = np.flatnonzero(model["categories"] == category)
+            new_rows = np.flatnonzero(new_categories == category)
+            candidates = sparse.vstack([model["vectors"][old_rows], new_vectors[new_rows]]).tocsr()
+            candidate_ids = [model["ids"][row] for row in old_rows] + \
+                [new_ids[row] for row in new_rows]
+            query_ids = [new_ids[row] for row in new_rows]
+
+            neighbours, scores = similarity.top_neighbours(
+                new_vectors[new_rows], candidates, top_n, exclude_offset=len(old_rows),
+                block_rows=similarity.estimate_block_rows(candidates.shape[0]))
+            await self._write_neighbours(db, query_ids, candidate_ids, neighbours, scores)
+
+            # Existing products pick up a new listing that ranks among their top N
+            for i, product_id in enumerate(query_ids):
+                for column, score in zip(neighbours[i], scores[i]):
+                    if 0 <= column < len(old_rows):
+                        reverse.append(UpdateOne(
+                            {"_id": ObjectId(candidate_ids[column])},
+                            {"$push": {"neighbours": {
+                                "$each": [{"id": ObjectId(product_id), "score": float(score)}],
+                                "$sort": {"score": -1},
+                                "$slice": top_n,
+                            }}}
+                        ))
+        for start in range(0, len(reverse), WRITE_BATCH_SIZE):
+            await db[self.collection_name].bulk_write(
+                reverse[start:start + WRITE_BATCH_SIZE], ordered=False)
+
+        self._save_model(
+            model["ids"] + new_ids,
+            np.concatenate([model["categories"], new_categories]),
+            vocabulary, model["idf"],
+            sparse.vstack([model["vectors"], new_vectors]).tocsr(),
+            started_at)
+        return {"products": len(new_ids), "reverse_updates": len(reverse)}
+
+    async def _load_products(self, query: dict):
+        """(ids, categories, weighted terms) of matching products in _id order"""
+        from app.utils.similarity import product_terms
+
+        db = await get_database()
+        ids, categories, terms = [], [], []
+        cursor = db.products.find(query, TEXT_FIELDS, batch_size=5000).sort("_id", 1)
+        async for product_dict in cursor:
+            ids.append(str(product_dict["_id"]))
+            categories.append(product_dict.get("category") or "")
+            terms.append(product_terms(product_dict))
+        return ids, categories, terms
+
+    async def _write_neighbours(self, db, query_ids: List[str], candidate_ids: List[str],
+                                neighbours, scores):
+        now = datetime.utcnow()
+        operations = []
+        for i, product_id in enumerate(query_ids):
+            entries = [{"id": ObjectId(candidate_ids[column]), "score": float(score)}
+                       for column, score in zip(neighbours[i], scores[i]) if column >= 0]
+            operations.append(UpdateOne(
+                {"_id": ObjectId(product_id)},
+                {"$set": {"neighbours": entries, "computed_at": now}},
+                upsert=True
+            ))
+            if len(operations) == WRITE_BATCH_SIZE:
+                await db[self.collection_name].bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await db[self.collection_name].bulk_write(operations, ordered=False)
+
+    def _save_model(self, ids: List[str], categories, vocabulary: Dict[str, int],
+                    idf, vectors, built_at: datetime):
+        import numpy as np
+
+        terms = np.empty(len(vocabulary), dtype=object)
+        for term, column in vocabulary.items():
+            terms[column] = term
+
+        path = settings.SIMILARITY_MODEL_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez(
+                f,
+                ids=np.asarray(ids),
+                categories=categories,
+                terms=terms.astype(str),
+                idf=idf,
+                data=vectors.data,
+                indices=vectors.indices,
+                indptr=vectors.indptr,
+                shape=np.asarray(vectors.shape),
+                built_at=np.asarray(built_at.timestamp()),
+            )
+        os.replace(temporary, path)
+
+    def _load_model(self) -> dict:
+        import numpy as np
+        from scipy import sparse
+
+        path = settings.SIMILARITY_MODEL_PATH
+        if not os.path.exists(path):
+            raise ValueError(f"No similarity model at {path}; run a full build first")
+        with np.load(path) as saved:
+            return {
+                "ids": saved["ids"].tolist(),
+                "categories": saved["categories"],
+                "vocabulary": {term: column for column, term in enumerate(saved["terms"].tolist())},
+                "idf": saved["idf"],
+                "vectors": sparse.csr_matrix(
+                    (saved["data"], saved["indices"], saved["indptr"]),
+                    shape=tuple(saved["shape"])),
+                "built_at": datetime.utcfromtimestamp(float(saved["built_at"])),
+            }
+
+
+similarity_service = SimilarityService()
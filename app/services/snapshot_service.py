@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from bson import ObjectId
+from app.core.database import get_database
+from app.core.deadline import clear_budget, query_max_time_ms
+from app.core.invalidation import invalidation_bus
+from app.core.jobs import job_queue
+from app.core.metrics import metrics
+from app.utils.object_ids import ref_match
+
+# User fields copied into product and order documents
+SNAPSHOT_FIELDS = ("username", "full_name", "profile_image")
+FAN_OUT_JOB = "snapshot_fan_out"
+
+# (collection, reference field, embedded snapshot field)
+SNAPSHOT_TARGETS = (
+    ("products", "seller_id", "seller_info"),
+    ("orders", "seller_id", "seller_info"),
+    ("orders", "buyer_id", "buyer_info"),
+)
+BACKFILL_BATCH_SIZE = 500
+
+
+class SnapshotService:
+    """Denormalized user snapshots embedded in products and orders.
+
+    Each snapshot carries the user's ``profile_version``. Profile changes bump
+    the version and fan the new snapshot out with ``update_many`` in the
+    background; until that lands, readers see a snapshot whose version is
+    older than the latest one this worker knows about and fall back to a join.
+    """
+
+    def __init__(self, max_tracked_users: int = 100_000):
+        self.max_tracked_users = max_tracked_users
+        self._known_versions: "OrderedDict[str, int]" = OrderedDict()
+
+    def snapshot(self, user_dict: dict) -> dict:
+        """Build a snapshot from a user document or model dict"""
+        return {
+            "id": str(user_dict.get("_id", user_dict.get("id"))),
+            **{field: user_dict.get(field) for field in SNAPSHOT_FIELDS},
+            "version": user_dict.get("profile_version", 0),
+        }
+
+    async def get_snapshots(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Current snapshots for several users in one query"""
+        db = await get_database()
+        object_ids = [ObjectId(user_id) for user_id in set(user_ids)]
+        if not object_ids:
+            return {}
+
+        projection = {field: 1 for field in SNAPSHOT_FIELDS}
+        projection["profile_version"] = 1
+        cursor = db.users.find(
+            {"_id": {"$in": object_ids}}, projection, max_time_ms=query_max_time_ms())
+        return {str(user_dict["_id"]): self.snapshot(user_dict)
+                async for user_dict in cursor}
+
+    async def get_snapshot(self, user_id: str) -> Optional[dict]:
+        return (await self.get_snapshots([user_id])).get(user_id)
+
+    def record_version(self, user_id: str, version: int):
+        self._known_versions[user_id] = version
+        self._known_versions.move_to_end(user_id)
+        while len(self._known_versions) > self.max_tracked_users:
+            self._known_versions.popitem(last=False)
+
+    def on_user_change(self, change: dict):
+        """Learn about profile changes made by other workers"""
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        if "profile_version" in updated:
+            self.record_version(str(change["documentKey"]["_id"]), updated["profile_version"])
+
+    def is_stale(self, snapshot: Optional[dict]) -> bool:
+        """Missing snapshots and ones older than a known profile change are stale"""
+        if not snapshot or "version" not in snapshot:
+            return True
+        known = self._known_versions.get(snapshot["id"])
+        return known is not None and snapshot["version"] < known
+
+    async def schedule_fan_out(self, user_dict: dict):
+        """Queue a refresh of a user's embedded snapshots without blocking the request"""
+        snapshot = self.snapshot(user_dict)
+        self.record_version(snapshot["id"], snapshot["version"])
+        # Until the job has run, readers fall back to joins
+        await job_queue.enqueue(FAN_OUT_JOB, {"snapshot": snapshot})
+
+    async def run_fan_out_job(self, payload: dict):
+        await self.fan_out(payload["snapshot"])
+
+    async def fan_out(self, snapshot: dict):
+        """Write a snapshot everywhere it is embedded, never going backwards"""
+        clear_budget()
+        started = time.perf_counter()
+        db = await get_database()
+        older = {"$not": {"$gte": snapshot["version"]}}
+        for collection, key, field in SNAPSHOT_TARGETS:
+            result = await db[collection].update_many(
+                {key: ref_match(snapshot["id"]), f"{field}.version": older},
+                {"$set": {field: snapshot}}
+            )
+            metrics.incr("snapshots.fan_out_documents", result.modified_count)
+        metrics.observe("snapshots.fan_out", time.perf_counter() - started)
+
+    async def backfill(self) -> int:
+        """Fan out snapshots of every user referenced by a document lacking one.
+
+        Documents written before snapshots were embedded are otherwise stale
+        forever, since fan-out only runs on profile changes. Returns the
+        number of users fanned out.
+        """
+        clear_budget()
+        db = await get_database()
+        user_ids = set()
+        for collection, key, field in SNAPSHOT_TARGETS:
+            cursor = db[collection].aggregate([
+                {"$match": {field: None}},
+                {"$group": {"_id": f"${key}"}},
+            ])
+            user_ids.update([str(group["_id"]) async for group in cursor
+                             if ObjectId.is_valid(str(group["_id"]))])
+
+        pending = list(user_ids)
+        for start in range(0, len(pending), BACKFILL_BATCH_SIZE):
+            snapshots = await self.get_snapshots(pending[start:start + BACKFILL_BATCH_SIZE])
+            for snapshot in snapshots.values():
+                await self.fan_out(snapshot)
+        return len(user_ids)
+
+
+snapshot_service = SnapshotService()
+invalidation_bus.subscribe("users", snapshot_service.on_user_change)
+job_queue.register(FAN_OUT_JOB, snapshot_service.run_fan_out_job, concurrency=2)
@@ -0,0 +1,150 @@
+from typing import Optional
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.database import PROFILE_READ, get_read_database
+from app.core.deadline import max_time_option
+from app.core.invalidation import invalidation_bus
+from app.core.microcache import MicroCache
+from app.models.order import OrderStatus
+from app.models.product import ProductResponse
+from app.models.user import UserPublic
+from app.schemas.user import SellerStorefront, StorefrontSales
+from app.services.seller_stats_service import UNREALIZED_STATUSES, seller_stats_service
+from app.utils.object_ids import ref_match
+
+storefront_cache = MicroCache(
+    "storefront_cache",
+    ttl_seconds=settings.STOREFRONT_CACHE_TTL_SECONDS,
+    max_bytes=settings.STOREFRONT_CACHE_MAX_BYTES
+)
+
+
+def _status_field(status: str, field: str) -> dict:
+    return {"$ifNull": [f"$statuses.{status}.{field}", 0]}
+
+
+class StorefrontService:
+    """A seller's public page: profile, recent listings, counts and sales.
+
+    Everything comes from one aggregation on users. Listings are joined with
+    a $facet over the seller's products, and sales with a sum over the
+    seller's daily rollups. Rendered storefronts are cached per seller and
+    dropped when the seller's products, profile or orders change.
+    """
+
+    def __init__(self):
+        self.collection_name = "users"
+
+    def pipeline(self, user_id: str) -> list:
+        active = {"$match": {"status": "active"}}
+        return [
+            {"$match": {"_id": ObjectId(user_id), "is_active": {"$ne": False}}},
+            {"$project": {field: 1 for field in UserPublic.model_fields if field != "id"}},
+            {"$lookup": {
+                "from": "products",
+                "pipeline": [
+                    {"$match": {"seller_id": ref_match(user_id)}},
+                    {"$facet": {
+                        "recent": [
+                            active,
+                            {"$sort": {"created_at": -1}},
+                            {"$limit": settings.STOREFRONT_RECENT_LISTINGS},
+                            {"$project": {"seller_info": 0}},
+                        ],
+                        "by_status": [
+                            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+                        ],
+                        "by_category": [
+                            active,
+                            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                            {"$sort": {"count": -1}},
+                            {"$limit": settings.STOREFRONT_MAX_CATEGORIES},
+                        ],
+                    }},
+                ],
+                "as": "listings",
+            }},
+            {"$lookup": {
+                "from": seller_stats_service.collection_name,
+                "pipeline": [
+                    # Rollup ids are "<seller>:<day>", so ";" bounds the seller's range
+                    {"$match": {"_id": {"$gte": f"{user_id}:", "$lt": f"{user_id};"}}},
+                    {"$group": {
+                        "_id": None,
+                        "orders": {"$sum": "$orders"},
+                        "units": {"$sum": "$units"},
+                        "unrealized_orders": {"$sum": {"$add": [
+                            _status_field(status, "orders") for status in UNREALIZED_STATUSES]}},
+                        "unrealized_units": {"$sum": {"$add": [
+                            _status_field(status, "units") for status in UNREALIZED_STATUSES]}},
+                        "delivered_orders": {"$sum": _status_field(
+                            OrderStatus.DELIVERED.value, "orders")},
+                    }},
+                ],
+                "as": "sales",
+            }},
+        ]
+
+    async def get_storefront(self, user_id: str) -> Optional[SellerStorefront]:
+        """Build a seller's storefront in one round trip"""
+        if not ObjectId.is_valid(user_id):
+            return None
+        db = await get_read_database(PROFILE_READ)
+        cursor = db[self.collection_name].aggregate(
+            self.pipeline(user_id), **max_time_option())
+        result = await cursor.to_list(length=1)
+        if not result:
+            return None
+
+        document = result[0]
+        listings = document.pop("listings")[0]
+        sales = (document.pop("sales") or [{}])[0]
+        document["id"] = str(document.pop("_id"))
+
+        recent = []
+        for product_dict in listings["recent"]:
+            product_dict["_id"] = str(product_dict["_id"])
+            recent.append(ProductResponse(**product_dict))
+
+        return SellerStorefront(
+            profile=UserPublic(**document),
+            recent_listings=recent,
+            listings_by_status={group["_id"]: group["count"]
+                                for group in listings["by_status"]},
+            active_listings_by_category={group["_id"]: group["count"]
+                                         for group in listings["by_category"]},
+            sales=StorefrontSales(
+                orders=sales.get("orders", 0) - sales.get("unrealized_orders", 0),
+                units=sales.get("units", 0) - sales.get("unrealized_units", 0),
+                delivered_orders=sales.get("delivered_orders", 0),
+            ),
+        )
+
+    def invalidate(self, seller_id: Optional[str] = None):
+        """Drop one seller's cached storefront, or all of them"""
+        storefront_cache.invalidate(str(seller_id) if seller_id is not None else None)
+
+    def on_product_change(self, change: dict):
+        document = change.get("fullDocument")
+        if document is not None:
+            self.invalidate(document["seller_id"])
+        else:
+            # Deletes don't say whose listing it was
+            self.invalidate()
+
+    def on_order_change(self, change: dict):
+        # Archiving deletes orders but leaves the sales rollups as they are
+        document = change.get("fullDocument")
+        if document is not None:
+            self.invalidate(document["seller_id"])
+
+    def on_user_change(self, change: dict):
+        self.invalidate(change["documentKey"]["_id"])
+
+
+storefront_service = StorefrontService()
+invalidation_bus.subscribe("products", storefront_service.on_product_change)
+invalidation_bus.subscribe("orders", storefront_service.on_order_change)
+invalidation_bus.subscribe("users", storefront_service.on_user_change)
@@ -0,0 +1,183 @@
+import asyncio
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.deadline import clear_budget
+from app.core.leases import acquire_lease
+from app.core.metrics import metrics
+
+POPULARITY_COLLECTION = "product_popularity"
+TRENDING_COLLECTION = "trending_products"
+ALL_CATEGORIES = "_all"
+LEASE_NAME = "trending_ranker"
+
+# Fields kept per ranked product; enough for a listing card
+TRENDING_FIELDS = ("title", "price", "category", "condition", "images",
+                   "location", "seller_info")
+
+# Popularity decayed below this no longer ranks and is pruned
+MIN_SCORE = 0.01
+
+
+class TrendingService:
+    """Time-decayed popularity per product and precomputed top-K lists.
+
+    Views and orders are buffered per worker and flushed every interval as
+    update pipelines that decay the stored score to now before adding the
+    new weight. Scores therefore halve every TRENDING_HALF_LIFE_HOURS
+    without rewriting idle products. One worker (lease) ranks the top K per
+    category into trending_products; every worker loads that small
+    collection into memory and serves it from there.
+    """
+
+    def __init__(self):
+        self.collection_name = POPULARITY_COLLECTION
+        self._pending: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._lists: Dict[str, List[dict]] = {}
+        self._task = None
+
+    @property
+    def decay_rate(self) -> float:
+        """Exponential decay per second for the configured half-life"""
+        return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+    def record_view(self, product_id: str, category: str):
+        self._pending[(product_id, category)] += 1
+
+    def record_order(self, product_id: str, category: str, quantity: int = 1):
+        self._pending[(product_id, category)] += settings.TRENDING_ORDER_WEIGHT * quantity
+
+    def top(self, category: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Ranked products from memory, overall or for one category"""
+        return self._lists.get(category or ALL_CATEGORIES, [])[:limit]
+
+    async def start(self):
+        if settings.TRENDING_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            try:
+                await self.flush()
+            except PyMongoError:
+                metrics.incr("trending.errors")
+
+    async def _run(self):
+        clear_budget()
+        while True:
+            try:
+                await self.flush()
+                if await acquire_lease(LEASE_NAME, settings.TRENDING_INTERVAL_SECONDS * 3):
+                    await self.rank()
+                await self.load()
+            except PyMongoError:
+                metrics.incr("trending.errors")
+            await asyncio.sleep(settings.TRENDING_INTERVAL_SECONDS)
+
+    async def flush(self):
+        """Fold buffered events into the stored decayed scores"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, defaultdict(float)
+
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, "$updated_at"]}, 1000]}
+        decayed = {"$multiply": [
+            {"$ifNull": ["$score", 0]},
+            {"$exp": {"$multiply": [-self.decay_rate, {"$ifNull": [elapsed_seconds, 0]}]}},
+        ]}
+        operations = [
+            UpdateOne(
+                {"_id": ObjectId(product_id)},
+                [{"$set": {"score": {"$add": [decayed, weight]},
+                           "category": category,
+                           "updated_at": now}}],
+                upsert=True
+            )
+            for (product_id, category), weight in pending.items()
+        ]
+        db = await get_database()
+        await db[self.collection_name].bulk_write(operations, ordered=False)
+        metrics.incr("trending.events_flushed", len(operations))
+
+    async def rank(self):
+        """Materialize the top K active products per category and overall"""
+        db = await get_database()
+        now = datetime.utcnow()
+        k = settings.TRENDING_TOP_K
+
+        # A score of s at updated_at is s * exp(-rate * age) now; anything that
+        # can't reach MIN_SCORE any more is dropped instead of ranked
+        cursor = db[self.collection_name].aggregate([
+            {"$set": {"score": self._decayed_score(now)}},
+            {"$match": {"score": {"$gte": MIN_SCORE}}},
+            # Over-fetch so sold or hidden products can be skipped
+            {"$group": {"_id": "$category", "top": {"$topN": {
+                "n": k * 2,
+                "sortBy": {"score": -1},
+                "output": {"id": "$_id", "score": "$score"},
+            }}}},
+        ])
+        candidates = {group["_id"]: group["top"] async for group in cursor}
+
+        products = {}
+        ids = [entry["id"] for top in candidates.values() for entry in top]
+        projection = {field: 1 for field in TRENDING_FIELDS}
+        async for product in db.products.find(
+                {"_id": {"$in": ids}, "status": "active"}, projection):
+            products[product["_id"]] = product
+
+        lists = {}
+        for category, top in candidates.items():
+            lists[category] = [
+                {"id": str(entry["id"]), "score": entry["score"],
+                 **{field: products[entry["id"]].get(field) for field in TRENDING_FIELDS}}
+                for entry in top if entry["id"] in products
+            ][:k]
+        lists[ALL_CATEGORIES] = sorted(
+            (item for items in lists.values() for item in items),
+            key=lambda item: item["score"], reverse=True)[:k]
+
+        trending = db[TRENDING_COLLECTION]
+        await trending.bulk_write([
+            UpdateOne({"_id": category},
+                      {"$set": {"products": items, "computed_at": now}}, upsert=True)
+            for category, items in lists.items()
+        ], ordered=False)
+        await trending.delete_many({"_id": {"$nin": list(lists)}})
+
+        await self.prune(now)
+        metrics.set_gauge("trending.categories", len(lists) - 1)
+
+    async def prune(self, now: datetime) -> int:
+        """Drop products whose score, decayed to now, is below MIN_SCORE"""
+        db = await get_database()
+        result = await db[self.collection_name].delete_many(
+            {"$expr": {"$lt": [self._decayed_score(now), MIN_SCORE]}})
+        return result.deleted_count
+
+    def _decayed_score(self, now: datetime) -> dict:
+        """Expression for the stored score (as of updated_at) decayed to now"""
+        elapsed_seconds = {"$divide": [{"$subtract": [now, "$updated_at"]}, 1000]}
+        return {"$multiply": [
+            "$score", {"$exp": {"$multiply": [-self.decay_rate, elapsed_seconds]}}]}
+
+    async def load(self):
+        """Replace the in-memory lists with the latest materialized ones"""
+        db = await get_database()
+        self._lists = {doc["_id"]: doc["products"]
+                       async for doc in db[TRENDING_COLLECTION].find()}
+
+
+trending_service = TrendingService()
@@ -1,9 +1,14 @@
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from bson import ObjectId
-from app.core.database import get_database
+from pymongo import ReturnDocument
+from datetime import datetime
+from app.core.database import PRIMARY_READ, get_database, get_read_database
+from app.core.deadline import query_max_time_ms
 from app.core.security import get_password_hash, verify_password
-from app.models.user import User, UserInDB
+from app.models.user import User, UserInDB, UserPublic
 from app.schemas.user import UserCreate, UserUpdate
+from app.services.snapshot_service import SNAPSHOT_FIELDS, snapshot_service
+from app.services.storefront_service import storefront_service
 
 
 class UserService:
@@ -20,7 +25,7 @@ class UserService:
                 {"email": user_data.email},
                 {"username": user_data.username}
             ]
-        })
+        }, max_time_ms=query_max_time_ms())
 
         if existing_user:
             raise ValueError("User with this email or username already exists")
@@ -39,23 +44,57 @@ class UserService:
     async def get_user_by_email(self, email: str) -> Optional[UserInDB]:
         """Get user by email"""
         db = await get_database()
-        user_dict = await db[self.collection_name].find_one({"email": email})
+        user_dict = await db[self.collection_name].find_one(
+            {"email": email}, max_time_ms=query_max_time_ms())
 
         if user_dict:
             user_dict["_id"] = str(user_dict["_id"])
             return UserInDB(**user_dict)
         return None
 
-    async def get_user_by_id(self, user_id: str) -> Optional[UserInDB]:
+    async def get_user_by_id(
+            self, user_id: str, route: str = PRIMARY_READ) -> Optional[UserInDB]:
         """Get user by ID"""
-        db = await get_database()
-        user_dict = await db[self.collection_name].find_one({"_id": ObjectId(user_id)})
+        db = await get_read_database(route)
+        user_dict = await db[self.collection_name].find_one(
+            {"_id": ObjectId(user_id)}, max_time_ms=query_max_time_ms())
 
         if user_dict:
             user_dict["_id"] = str(user_dict["_id"])
             return UserInDB(**user_dict)
         return None
 
+    async def get_users_by_ids(self, user_ids: Iterable[str],
+                               projection: Optional[dict] = None,
+                               route: str = PRIMARY_READ) -> Dict[str, dict]:
+        """Get raw user documents by ID in one query, keyed by string ID"""
+        db = await get_read_database(route)
+        object_ids = [ObjectId(user_id) for user_id in set(user_ids)]
+        if not object_ids:
+            return {}
+
+        cursor = db[self.collection_name].find(
+            {"_id": {"$in": object_ids}}, projection,
+            max_time_ms=query_max_time_ms())
+        users = {}
+        async for user_dict in cursor:
+            user_dict["_id"] = str(user_dict["_id"])
+            users[user_dict["_id"]] = user_dict
+        return users
+
+    async def get_public_users(
+            self, user_ids: List[str],
+            route: str = PRIMARY_READ) -> Tuple[List[UserPublic], List[str]]:
+        """Public profiles in the order asked for, plus the ids not found"""
+        users = await self.get_users_by_ids(
+            [user_id for user_id in user_ids if ObjectId.is_valid(user_id)],
+            {field: 1 for field in UserPublic.model_fields if field != "id"},
+            route=route)
+        profiles = [UserPublic(id=user_id, **users[user_id])
+                    for user_id in user_ids if user_id in users]
+        missing = [user_id for user_id in user_ids if user_id not in users]
+        return profiles, missing
+
     async def authenticate_user(self, email: str,
                                 password: str) -> Optional[UserInDB]:
         """Authenticate user with email and password"""
@@ -72,13 +111,29 @@ class UserService:
         db = await get_database()
 
         update_data = user_data.dict(exclude_unset=True)
-        if update_data:
-            await db[self.collection_name].update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": update_data}
-            )
+        if not update_data:
+            return await self.get_user_by_id(user_id)
+
+        update_data["updated_at"] = datetime.utcnow()
+        update = {"$set": update_data}
+        snapshot_changed = any(field in update_data for field in SNAPSHOT_FIELDS)
+        if snapshot_changed:
+            update["$inc"] = {"profile_version": 1}
+
+        user_dict = await db[self.collection_name].find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if not user_dict:
+            return None
+        storefront_service.invalidate(user_id)
+
+        if snapshot_changed:
+            await snapshot_service.schedule_fan_out(user_dict)
 
-        return await self.get_user_by_id(user_id)
+        user_dict["_id"] = str(user_dict["_id"])
+        return UserInDB(**user_dict)
 
 
 user_service = UserService()
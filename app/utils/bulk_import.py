@@ -0,0 +1,96 @@
+# File: app/utils/bulk_import.py
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+from app.core.config import settings
+
+# (row number, parsed row or None, parse error or None)
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+LIST_FIELDS = ("images", "tags")
+CSV_LIST_SEPARATOR = "|"
+
+
+class RowTooLarge(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(buffer) > settings.BULK_IMPORT_MAX_ROW_BYTES:
+            raise RowTooLarge(
+                f"Row exceeds {settings.BULK_IMPORT_MAX_ROW_BYTES} bytes")
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Row]:
+    """One JSON object per line; blank lines are skipped"""
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield row, None, "Row must be a JSON object"
+            continue
+        yield row, data, None
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Row]:
+    """CSV with a header row; list fields are separated by ``|``"""
+    header = None
+    record = ""
+    row = 0
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # A quoted field may span lines; the record is complete once quotes balance
+        if record.count('"') % 2:
+            if len(record) > settings.BULK_IMPORT_MAX_ROW_BYTES:
+                raise RowTooLarge(
+                    f"Row exceeds {settings.BULK_IMPORT_MAX_ROW_BYTES} bytes")
+            continue
+
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row += 1
+        if len(values) != len(header):
+            yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+
+        data = {}
+        for name, value in zip(header, values):
+            if value == "":
+                continue
+            if name in LIST_FIELDS:
+                data[name] = [item.strip() for item in value.split(CSV_LIST_SEPARATOR)
+                              if item.strip()]
+            else:
+                data[name] = value
+        yield row, data, None
+
+    if record:
+        row += 1
+        yield row, None, "Unterminated quoted field"
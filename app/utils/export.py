@@ -0,0 +1,64 @@
+# File: app/utils/export.py
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List
+
+ORDER_EXPORT_FIELDS = [
+    "id", "created_at", "updated_at", "status", "payment_status", "quantity",
+    "total_price", "product_id", "product_title", "buyer_id", "buyer_username",
+    "buyer_full_name", "shipping_address", "buyer_notes", "seller_notes",
+]
+
+PRODUCT_EXPORT_FIELDS = [
+    "id", "title", "price", "category", "condition", "status", "location",
+    "tags", "images", "views", "created_at", "updated_at",
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def encode_rows(rows: AsyncIterator[List[dict]], fmt: str,
+                      fields: List[str]) -> AsyncIterator[bytes]:
+    """Encode batches of flat rows as CSV or NDJSON, one chunk per batch"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue().encode()
+
+        async for batch in rows:
+            buffer.seek(0)
+            buffer.truncate()
+            for row in batch:
+                writer.writerow([_csv_value(row.get(field)) for field in fields])
+            yield buffer.getvalue().encode()
+    else:
+        async for batch in rows:
+            yield "".join(
+                json.dumps({field: row.get(field) for field in fields},
+                           default=_json_default) + "\n"
+                for row in batch
+            ).encode()
+
+
+def export_filename(prefix: str, fmt: str) -> str:
+    return f"{prefix}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
@@ -1,8 +1,4 @@
 # File: app/utils/image_upload.py
-import cloudinary
-import cloudinary.uploader
-import boto3
-from botocore.exceptions import ClientError
 from fastapi import UploadFile, HTTPException
 from app.core.config import settings
 from typing import Optional
@@ -10,30 +6,44 @@ from typing import Optional
 
 class ImageUploadService:
     def __init__(self):
-        # Initialize Cloudinary if credentials are provided
-        if all([settings.CLOUDINARY_CLOUD_NAME,
-               settings.CLOUDINARY_API_KEY, settings.CLOUDINARY_API_SECRET]):
+        # The SDKs are slow to import, so they are loaded on first upload
+        self.cloudinary_enabled = all([settings.CLOUDINARY_CLOUD_NAME,
+                                       settings.CLOUDINARY_API_KEY,
+                                       settings.CLOUDINARY_API_SECRET])
+        self.s3_enabled = all([settings.AWS_ACCESS_KEY_ID,
+                               settings.AWS_SECRET_ACCESS_KEY,
+                               settings.AWS_BUCKET_NAME])
+        self._cloudinary_uploader = None
+        self._s3_client = None
+
+    @property
+    def cloudinary_uploader(self):
+        """Configured cloudinary.uploader module, imported on first use"""
+        if self._cloudinary_uploader is None:
+            import cloudinary
+            import cloudinary.uploader
+
             cloudinary.config(
                 cloud_name=settings.CLOUDINARY_CLOUD_NAME,
                 api_key=settings.CLOUDINARY_API_KEY,
                 api_secret=settings.CLOUDINARY_API_SECRET
             )
-            self.cloudinary_enabled = True
-        else:
-            self.cloudinary_enabled = False
+            self._cloudinary_uploader = cloudinary.uploader
+        return self._cloudinary_uploader
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, built on first use"""
+        if self._s3_client is None:
+            import boto3
 
-        # Initialize S3 if credentials are provided
-        if all([settings.AWS_ACCESS_KEY_ID,
-               settings.AWS_SECRET_ACCESS_KEY, settings.AWS_BUCKET_NAME]):
-            self.s3_client = boto3.client(
+            self._s3_client = boto3.client(
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
                 region_name=settings.AWS_REGION
             )
-            self.s3_enabled = True
-        else:
-            self.s3_enabled = False
+        return self._s3_client
 
     async def upload_to_cloudinary(
             self, file: UploadFile, folder: str = "marketplace") -> str:
@@ -48,7 +58,7 @@ class ImageUploadService:
             contents = await file.read()
 
             # Upload to Cloudinary
-            result = cloudinary.uploader.upload(
+            result = self.cloudinary_uploader.upload(
                 contents,
                 folder=folder,
                 resource_type="auto"
@@ -66,6 +76,8 @@ class ImageUploadService:
         if not self.s3_enabled:
             raise HTTPException(status_code=500, detail="S3 not configured")
 
+        from botocore.exceptions import ClientError
+
         try:
             # Generate unique filename
             import uuid
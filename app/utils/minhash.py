@@ -0,0 +1,225 @@
+# File: app/utils/minhash.py
+# MinHash signatures and a banded LSH index for near-duplicate listing text.
+# Pure Python: one-permutation hashing costs one hash per shingle, and the
+# index keeps listings in flat arrays rather than one object per listing.
+# Hashes use the built-in (per-process) hash, so signatures are never stored.
+import re
+import sys
+from array import array
+from typing import List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+# Dropped so boilerplate phrasing does not make unrelated listings look alike
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or the to with".split())
+SHINGLE_WORDS = 2
+
+NUM_HASHES = 64
+BANDS = 8
+ROWS_PER_BAND = 4
+# Rows walked per bucket on lookup, counting tombstones and rows already
+# compared through another band
+MAX_BUCKET_SCAN = 32
+# Rows compared per lookup across all bands
+MAX_LOOKUP_CANDIDATES = 64
+
+_BIN_BITS = 6  # log2(NUM_HASHES)
+_MASK32 = (1 << 32) - 1
+_MASK64 = (1 << 64) - 1
+_EMPTY = 1 << 64
+# Added per bin skipped when an empty bin borrows its neighbour's value
+_DENSIFY_STEP = 1 << 58
+# Chance that two unrelated 8-bit signature values agree
+_BYTE_COLLISION = 1 / 256
+
+Signature = List[int]
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> Set[str]:
+    """Word n-grams of lower-cased text; short texts become one shingle"""
+    tokens = [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def signature(shingle_set: Set[str]) -> Optional[Signature]:
+    """One-permutation MinHash: the minimum hash per bin, densified by rotation.
+
+    Each shingle is hashed once; its low bits pick one of NUM_HASHES bins and
+    the rest is the value. Empty bins take the value of the nearest filled
+    bin to their right plus a per-step offset, so sets sharing most shingles
+    still agree on them.
+    """
+    if not shingle_set:
+        return None
+    bins = [_EMPTY] * NUM_HASHES
+    low = NUM_HASHES - 1
+    for shingle in shingle_set:
+        h = hash(shingle) & _MASK64
+        value = h >> _BIN_BITS
+        if value < bins[h & low]:
+            bins[h & low] = value
+
+    if _EMPTY in bins:
+        filled = [i for i, value in enumerate(bins) if value != _EMPTY]
+        nearest = filled[0] + NUM_HASHES
+        for i in range(NUM_HASHES - 1, -1, -1):
+            if bins[i] != _EMPTY:
+                nearest = i
+            else:
+                bins[i] = bins[nearest % NUM_HASHES] + (nearest - i) * _DENSIFY_STEP
+    return bins
+
+
+def band_keys(sig: Signature) -> List[int]:
+    """One 32-bit bucket key per LSH band"""
+    return [hash((band,) + tuple(sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))
+            & _MASK32 for band in range(BANDS)]
+
+
+def compact(sig: Signature) -> bytes:
+    """Low 8 bits of every value (b-bit MinHash), enough to estimate similarity"""
+    return bytes(value & 0xFF for value in sig)
+
+
+def estimate_similarity(a: bytes, b: bytes) -> float:
+    """Jaccard similarity estimated from two compact signatures"""
+    return _similarity(int.from_bytes(a, "big") ^ int.from_bytes(b, "big"))
+
+
+def _similarity(differences: int) -> float:
+    """Estimate from the XOR of two compact signatures read as integers"""
+    # Equal bytes XOR to zero; one big-int XOR beats comparing byte by byte
+    agreement = differences.to_bytes(NUM_HASHES, "big").count(0) / NUM_HASHES
+    return max(0.0, (agreement - _BYTE_COLLISION) / (1 - _BYTE_COLLISION))
+
+
+class LSHIndex:
+    """Banded MinHash index over flat arrays.
+
+    Rows hold a 12-byte id, the compact signature and the band keys. An
+    open-addressing table maps each band key to the newest row in its bucket,
+    and per-row links chain the bucket's older rows. Lookups walk at most
+    MAX_BUCKET_SCAN rows per bucket, newest first, and compare at most
+    MAX_LOOKUP_CANDIDATES rows in all, so buckets crowded by boilerplate
+    text stay cheap while recent reposts are always seen.
+    Removed and replaced rows are tombstoned. Rehashing compacts the arrays
+    down to the live rows, and runs once tombstones outnumber live rows.
+    """
+
+    def __init__(self, slots: int = 1024):
+        self.ids = bytearray()
+        self.signatures = bytearray()
+        self.band_keys = array("I")
+        self.links = array("i")
+        self.alive = bytearray()
+        self.rows = {}  # id bytes -> row
+        self._allocate(slots)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.rows
+
+    def _allocate(self, slots: int):
+        self._mask = slots - 1
+        self._keys = array("I", bytes(4 * slots))
+        self._heads = array("i", [-1]) * slots
+        self._used = 0
+
+    def _slot(self, key: int) -> int:
+        """Slot holding key, or the empty slot where it belongs"""
+        i = key & self._mask
+        while self._heads[i] != -1 and self._keys[i] != key:
+            i = (i + 1) & self._mask
+        return i
+
+    def _link(self, row: int):
+        for band in range(BANDS):
+            entry = row * BANDS + band
+            i = self._slot(self.band_keys[entry])
+            if self._heads[i] == -1:
+                self._keys[i] = self.band_keys[entry]
+                self._used += 1
+            self.links[entry] = self._heads[i]
+            self._heads[i] = row
+
+    def _compact(self):
+        """Renumber the live rows, oldest first, dropping every tombstone"""
+        ids, signatures, keys = bytearray(), bytearray(), array("I")
+        for new_row, (key, row) in enumerate(self.rows.items()):
+            ids += self.ids[row * 12:(row + 1) * 12]
+            signatures += self.signatures[row * NUM_HASHES:(row + 1) * NUM_HASHES]
+            keys.extend(self.band_keys[row * BANDS:(row + 1) * BANDS])
+            self.rows[key] = new_row
+        self.ids, self.signatures, self.band_keys = ids, signatures, keys
+        self.links = array("i", [-1]) * (len(self.rows) * BANDS)
+        self.alive = bytearray(b"\x01") * len(self.rows)
+
+    def _rehash(self):
+        """Resize for the live rows and drop tombstoned ones from the arrays"""
+        self._compact()
+        slots = len(self._heads)
+        while slots < 4 * BANDS * len(self.rows):
+            slots *= 2
+        while slots > 1024 and slots >= 8 * BANDS * len(self.rows):
+            slots //= 2
+        self._allocate(slots)
+        for row in self.rows.values():  # oldest first, so buckets stay newest first
+            self._link(row)
+
+    def add(self, key: bytes, sig: Signature):
+        self.remove(key)
+        row = len(self.alive)
+        self.rows[key] = row
+        self.ids += key
+        self.signatures += compact(sig)
+        self.band_keys.extend(band_keys(sig))
+        self.links.extend([-1] * BANDS)
+        self.alive.append(1)
+        tombstones = len(self.alive) - len(self.rows)
+        if (2 * (self._used + BANDS) > len(self._heads)
+                or tombstones > max(len(self.rows), 1024)):
+            self._rehash()
+        else:
+            self._link(row)
+
+    def remove(self, key: bytes):
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.alive[row] = 0
+
+    def find(self, sig: Signature, threshold: float,
+             exclude: Optional[bytes] = None) -> Optional[Tuple[bytes, float]]:
+        """Most similar indexed id at or above threshold, and its similarity"""
+        query = int.from_bytes(compact(sig), "big")
+        best, best_similarity = None, threshold
+        seen = set()
+        for band, band_key in enumerate(band_keys(sig)):
+            row = self._heads[self._slot(band_key)]
+            walked = 0
+            while row != -1 and walked < MAX_BUCKET_SCAN:
+                walked += 1
+                if self.alive[row] and row not in seen:
+                    if len(seen) == MAX_LOOKUP_CANDIDATES:
+                        return (best, best_similarity) if best is not None else None
+                    seen.add(row)
+                    similarity = _similarity(query ^ int.from_bytes(
+                        self.signatures[row * NUM_HASHES:(row + 1) * NUM_HASHES], "big"))
+                    if similarity >= best_similarity:
+                        key = bytes(self.ids[row * 12:(row + 1) * 12])
+                        if key != exclude:
+                            best, best_similarity = key, similarity
+                row = self.links[row * BANDS + band]
+        return (best, best_similarity) if best is not None else None
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint: arrays, the id map and its keys"""
+        arrays = (self.ids, self.signatures, self.band_keys, self.links, self.alive,
+                  self._keys, self._heads)
+        return (sum(sys.getsizeof(buffer) for buffer in arrays)
+                + sys.getsizeof(self.rows)
+                + sum(sys.getsizeof(key) + sys.getsizeof(row)
+                      for key, row in self.rows.items()))
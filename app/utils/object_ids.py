@@ -0,0 +1,54 @@
+# File: app/utils/object_ids.py
+from typing import Annotated, Any, List
+
+from bson import ObjectId
+from pydantic import BeforeValidator
+
+from app.core.config import settings
+
+# References to other documents, stored as ObjectId. Documents written
+# before scripts/migrate_object_id_refs.py ran may still hold hex strings.
+REFERENCE_FIELDS = ("seller_id", "buyer_id", "product_id")
+
+
+def _object_id_to_str(value: Any) -> Any:
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+# Model field type: ObjectId in MongoDB, hex string in Python and the API
+ObjectIdStr = Annotated[str, BeforeValidator(_object_id_to_str)]
+
+
+def ref_values(value: str) -> List[Any]:
+    """Stored forms of a reference: the ObjectId, plus the legacy string if still in use"""
+    if not ObjectId.is_valid(value):
+        return [value]
+    object_id = ObjectId(value)
+    if settings.LEGACY_STRING_REFS:
+        return [object_id, str(object_id)]
+    return [object_id]
+
+
+def ref_match(value: str) -> Any:
+    """Query condition matching a reference in either stored form"""
+    values = ref_values(value)
+    return values[0] if len(values) == 1 else {"$in": values}
+
+
+def parse_id_list(ids: str) -> List[str]:
+    """Distinct ids of a comma-separated list, in request order"""
+    parsed = list(dict.fromkeys(part.strip() for part in ids.split(",") if part.strip()))
+    if not parsed:
+        raise ValueError("No ids given")
+    if len(parsed) > settings.BATCH_FETCH_MAX_IDS:
+        raise ValueError(f"At most {settings.BATCH_FETCH_MAX_IDS} ids per request")
+    return parsed
+
+
+def store_refs(document: dict) -> dict:
+    """Convert reference fields of a document to ObjectId before writing it"""
+    for field in REFERENCE_FIELDS:
+        value = document.get(field)
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            document[field] = ObjectId(value)
+    return document
@@ -0,0 +1,132 @@
+# File: app/utils/percolator.py
+# Inverted index of saved product filters ("percolator"). A new listing is
+# matched against only the filters it could satisfy, found with a handful of
+# dict lookups, instead of running every saved filter as a query.
+import math
+import re
+from itertools import chain, product as combinations
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+WILDCARD = "*"
+ANY_PRICE = -1
+WORD_RE = re.compile(r"\w+")
+
+# Prices are bucketed by powers of ten; a price range is listed under every
+# bucket it overlaps, open ends stopping at the first or last bucket
+MAX_PRICE_BUCKET = 8
+
+# (filter id, owner, min price, max price, location words)
+Entry = Tuple[str, str, Optional[float], Optional[float], Tuple[str, ...]]
+
+
+def price_bucket(price: float) -> int:
+    if price < 1:
+        return 0
+    return min(MAX_PRICE_BUCKET, int(math.log10(price)) + 1)
+
+
+def words(text: Optional[str]) -> Set[str]:
+    return set(WORD_RE.findall(text.lower())) if text else set()
+
+
+class QueryIndex:
+    """Saved filters keyed by category, condition, location word, search term and price.
+
+    A filter is listed under its value for each field, or under the wildcard
+    when it leaves the field open. Text filters are listed once per search
+    term, since a text search matches any of its terms; filters without one
+    are further split by price bucket. Location filters are
+    listed under their longest word and match listings whose location has
+    all of their words (whole words, unlike the listing query's substring
+    match, so "Delhi" does not alert on "Delhigate"). Matching a
+    listing looks up the keys it could satisfy and verifies only those
+    candidates. Removed filters are tombstoned until the index is rebuilt,
+    which is the only way to compact it.
+    """
+
+    def __init__(self):
+        self.entries: List[Optional[Entry]] = []
+        self.rows: Dict[str, int] = {}  # filter id -> row
+        self._index: Dict[Tuple[str, str, str], Dict[str, Dict[int, List[int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def tombstones(self) -> int:
+        """Rows of removed filters still held by the index"""
+        return len(self.entries) - len(self.rows)
+
+    def add(self, filter_id: str, owner: str, filter_dict: dict):
+        """Index a ProductFilter dict (enum values as plain strings)"""
+        self.remove(filter_id)
+        row = len(self.entries)
+        self.rows[filter_id] = row
+
+        min_price = filter_dict.get("min_price")
+        max_price = filter_dict.get("max_price")
+        location_words = tuple(words(filter_dict.get("location")))
+        self.entries.append((filter_id, owner, min_price, max_price, location_words))
+
+        key = (
+            filter_dict.get("category") or WILDCARD,
+            filter_dict.get("condition") or WILDCARD,
+            max(location_words, key=len) if location_words else WILDCARD,
+        )
+        terms = words(filter_dict.get("search"))
+        if terms or (min_price is None and max_price is None):
+            # Search terms are selective enough; price is checked on the candidates
+            buckets = [ANY_PRICE]
+        else:
+            buckets = range(
+                price_bucket(min_price or 0),
+                (price_bucket(max_price) if max_price is not None else MAX_PRICE_BUCKET) + 1)
+
+        by_term = self._index.setdefault(key, {})
+        for term in terms or (WILDCARD,):
+            by_price = by_term.setdefault(term, {})
+            for bucket in buckets:
+                by_price.setdefault(bucket, []).append(row)
+
+    def remove(self, filter_id: str):
+        row = self.rows.pop(filter_id, None)
+        if row is not None:
+            self.entries[row] = None
+
+    def match(self, listing: dict) -> Iterator[Entry]:
+        """Filters that a listing (product document) satisfies"""
+        price = listing.get("price") or 0
+        bucket = price_bucket(price)
+        location = words(listing.get("location"))
+        terms = words(listing.get("title")) | words(listing.get("description"))
+        terms.add(WILDCARD)
+
+        seen = set()
+        for key in combinations(
+                (listing.get("category"), WILDCARD),
+                (listing.get("condition"), WILDCARD),
+                location | {WILDCARD}):
+            by_term = self._index.get(key)
+            if not by_term:
+                continue
+            if len(by_term) < len(terms):
+                matched = [by_price for term, by_price in by_term.items() if term in terms]
+            else:
+                matched = [by_term[term] for term in terms if term in by_term]
+
+            for by_price in matched:
+                for row in chain(by_price.get(ANY_PRICE, ()), by_price.get(bucket, ())):
+                    if row in seen:
+                        continue
+                    seen.add(row)
+                    entry = self.entries[row]
+                    if entry is None:
+                        continue
+                    _, _, min_price, max_price, filter_location = entry
+                    if min_price is not None and price < min_price:
+                        continue
+                    if max_price is not None and price > max_price:
+                        continue
+                    if not all(word in location for word in filter_location):
+                        continue
+                    yield entry
@@ -0,0 +1,144 @@
+# File: app/utils/similarity.py
+# TF-IDF vectors and nearest neighbours over product text. Everything past
+# tokenization is vectorized NumPy / SciPy sparse code. Both are optional
+# dependencies needed only by the similar products job; import lazily.
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+STOP_WORDS = frozenset(
+    "an and are as at be by for from has in is it of on or the to with".split())
+
+# Relative weight of each product field in the term counts
+FIELD_WEIGHTS = (("title", 3.0), ("tags", 2.0), ("category", 1.0), ("description", 1.0))
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def product_terms(product: dict) -> Dict[str, float]:
+    """Weighted term counts for one product"""
+    terms: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS:
+        value = product.get(field) or ""
+        if isinstance(value, list):
+            value = " ".join(value)
+        for token in tokenize(value):
+            terms[token] = terms.get(token, 0.0) + weight
+    return terms
+
+
+def count_matrix(documents: Iterable[Dict[str, float]], vocabulary: Dict[str, int],
+                 grow: bool = True) -> sparse.csr_matrix:
+    """Documents x terms count matrix; unknown terms are added or, with grow=False, dropped"""
+    indptr = [0]
+    indices: List[int] = []
+    data: List[float] = []
+    for terms in documents:
+        for term, count in terms.items():
+            column = vocabulary.get(term)
+            if column is None:
+                if not grow:
+                    continue
+                column = vocabulary[term] = len(vocabulary)
+            indices.append(column)
+            data.append(count)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(vocabulary)))
+
+
+def fit_idf(counts: sparse.csr_matrix) -> np.ndarray:
+    """Smoothed inverse document frequency per term"""
+    n_documents = counts.shape[0]
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    return (np.log((1 + n_documents) / (1 + document_frequency)) + 1).astype(np.float32)
+
+
+def _row_ids(matrix: sparse.csr_matrix) -> np.ndarray:
+    return np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+
+def _keep_top_per_row(rows: np.ndarray, columns: np.ndarray, values: np.ndarray,
+                      n_rows: int, keep: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Entries of the `keep` largest values per row, ordered by row then value descending"""
+    order = np.lexsort((-values, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    starts = np.searchsorted(rows, np.arange(n_rows))
+    rank = np.arange(len(rows)) - starts[rows]
+    mask = rank < keep
+    return rows[mask], columns[mask], values[mask]
+
+
+def tfidf(counts: sparse.csr_matrix, idf: np.ndarray,
+          max_terms: Optional[int] = None) -> sparse.csr_matrix:
+    """Sublinear TF-IDF, optionally pruned to each row's strongest terms, L2-normalized"""
+    rows = _row_ids(counts)
+    columns = counts.indices
+    values = (1 + np.log(counts.data)) * idf[columns]
+    if max_terms:
+        rows, columns, values = _keep_top_per_row(
+            rows, columns, values, counts.shape[0], max_terms)
+
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=counts.shape[0]))
+    values = (values / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+    return sparse.csr_matrix((values, (rows, columns)), shape=counts.shape)
+
+
+def top_neighbours(queries: sparse.csr_matrix, candidates: sparse.csr_matrix, n: int,
+                   exclude_offset: Optional[int] = None,
+                   block_rows: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-n cosine neighbours among candidates for each query row.
+
+    Rows must be L2-normalized. Query row i is excluded from matching
+    candidate ``exclude_offset + i`` (itself, when queries are a slice of
+    candidates). Returns (indices, scores) of shape (queries, n), padded with
+    -1 and 0. Similarities are computed in dense blocks of query rows, since
+    shared common terms make them dense anyway, and selected with
+    argpartition in linear time per row.
+    """
+    n_queries, n_candidates = queries.shape[0], candidates.shape[0]
+    indices = np.full((n_queries, n), -1, dtype=np.int64)
+    scores = np.zeros((n_queries, n), dtype=np.float32)
+    k = min(n, n_candidates)
+    if k == 0:
+        return indices, scores
+    candidates_t = candidates.T.tocsr()
+
+    for start in range(0, n_queries, block_rows):
+        block = (queries[start:start + block_rows] @ candidates_t).toarray()
+        rows = np.arange(block.shape[0])
+        if exclude_offset is not None:
+            own = rows + start + exclude_offset
+            inside = own < n_candidates
+            block[rows[inside], own[inside]] = -1
+
+        if k < n_candidates:
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n_candidates), (block.shape[0], k))
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        matched = top_scores > 0
+        indices[start:start + block.shape[0], :k] = np.where(matched, top, -1)
+        scores[start:start + block.shape[0], :k] = np.where(matched, top_scores, 0)
+
+    return indices, scores
+
+
+def memory_bytes(matrix: sparse.csr_matrix) -> int:
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def estimate_block_rows(n_candidates: int, budget_bytes: int = 256 * 1024 ** 2) -> int:
+    """Query rows per block so a dense block and its argpartition stay within budget"""
+    return max(64, min(4096, budget_bytes // max(1, 12 * n_candidates)))
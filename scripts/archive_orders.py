@@ -0,0 +1,55 @@
+"""Archive settled orders now and report the working set before and after.
+
+Usage:
+    python -m scripts.archive_orders [--after-days 180]
+
+Runs the same pass as the background archiver: orders that are delivered,
+cancelled or refunded, with no change for --after-days, move from orders to
+orders_archive. Prints document count, data size and index size of both
+collections before and after. Runs against MONGODB_URL / DATABASE_NAME.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.core import database
+from app.core.config import settings
+from app.core.leases import acquire_lease
+from app.services.order_archive_service import (
+    LEASE_NAME,
+    LEASE_SECONDS,
+    order_archive_service,
+)
+
+
+def print_working_set(label: str, sizes: dict):
+    print(label)
+    for tier, values in sizes.items():
+        print(f"  {tier:<8} {values['documents']:>10,} docs  "
+              f"{values['data_bytes'] / 1024 ** 2:>9,.1f} MB data  "
+              f"{values['index_bytes'] / 1024 ** 2:>9,.1f} MB indexes")
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--after-days", type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+    settings.ORDER_ARCHIVE_AFTER_DAYS = args.after_days
+
+    await database.init_db()
+    if not await acquire_lease(LEASE_NAME, LEASE_SECONDS):
+        print("another worker is archiving right now, try again later")
+        await database.close_db()
+        return 1
+
+    print_working_set("before:", await order_archive_service.working_set())
+    moved = await order_archive_service.archive()
+    print(f"archived {moved} orders")
+    print_working_set("after:", await order_archive_service.working_set())
+
+    await database.close_db()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,40 @@
+"""Rebuild seller daily stats rollups from orders.
+
+Usage:
+    python -m scripts.backfill_seller_stats [--since 2024-01-01] [--seller <id>]
+
+Aggregates hot and archived orders per seller, day and status on the server
+and writes the result into seller_daily_stats with $merge, replacing the
+rollups it covers. Use it once after deploying rollups and to repair drift
+for a seller or a range of days. Runs against MONGODB_URL / DATABASE_NAME.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from app.core import database
+from app.services.seller_stats_service import seller_stats_service
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="only days from this date (YYYY-MM-DD) on")
+    parser.add_argument("--seller", help="only this seller's rollups")
+    args = parser.parse_args()
+
+    await database.init_db()
+    db = await database.get_database()
+
+    started = time.perf_counter()
+    await seller_stats_service.backfill(since=args.since, seller_id=args.seller)
+    elapsed = time.perf_counter() - started
+
+    rollups = await db[seller_stats_service.collection_name].estimated_document_count()
+    print(f"backfill done in {elapsed:.1f}s, {rollups} rollup documents")
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+"""Embed seller and buyer snapshots in documents written before snapshots existed.
+
+Usage:
+    python -m scripts.backfill_snapshots
+
+Finds every user referenced by a product or order without an embedded
+snapshot and fans that user's current snapshot out, as a profile change
+would. Until then, listings join users for those documents on every read.
+Safe to run again; documents already holding a current snapshot are left
+alone. Runs against MONGODB_URL / DATABASE_NAME.
+"""
+import argparse
+import asyncio
+import time
+
+from app.core import database
+from app.services.snapshot_service import snapshot_service
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    await database.init_db()
+
+    started = time.perf_counter()
+    users = await snapshot_service.backfill()
+    elapsed = time.perf_counter() - started
+
+    print(f"backfill done in {elapsed:.1f}s, snapshots fanned out for {users} users")
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
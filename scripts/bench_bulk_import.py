@@ -0,0 +1,102 @@
+"""Benchmark bulk product import throughput in rows per second.
+
+Usage:
+    python -m scripts.bench_bulk_import --rows 100000 [--batch-size 500] [--dry-run]
+        [--no-duplicate-detection]
+
+Generates an NDJSON body in chunks, feeds it through the same parser and
+ProductService.bulk_create_products path as POST /products/bulk, and reports
+rows/s, the duplicate lookup cost and peak RSS. Rows get random text, so the
+duplicate check accepts them unless --no-duplicate-detection turns it off.
+Without --dry-run it inserts into MONGODB_URL / DATABASE_NAME and deletes
+the generated products afterwards.
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import time
+
+from bson import ObjectId
+
+from app.core import database
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.product_service import product_service
+from app.services.snapshot_service import snapshot_service
+from app.utils.bulk_import import iter_lines, iter_ndjson_rows
+
+
+async def generate_body(rows: int, chunk_rows: int = 1000):
+    rng = random.Random(7)
+    vocabulary = [f"word{i}" for i in range(20_000)]
+    chunk = []
+    for i in range(rows):
+        chunk.append(json.dumps({
+            "title": f"Bench listing {i} " + " ".join(rng.choices(vocabulary, k=5)),
+            "description": " ".join(rng.choices(vocabulary, k=30)),
+            "price": 100 + i % 900,
+            "category": f"category-{i % 20}",
+            "condition": "good",
+            "tags": ["bench", f"tag-{i % 50}"],
+        }))
+        if len(chunk) == chunk_rows:
+            yield ("\n".join(chunk) + "\n").encode()
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="parse and validate only, no inserts")
+    parser.add_argument("--no-duplicate-detection", action="store_true",
+                        help="skip the near-duplicate check")
+    args = parser.parse_args()
+    if args.no_duplicate_detection:
+        settings.DUPLICATE_DETECTION_ENABLED = False
+
+    seller_id = str(ObjectId())
+    if args.dry_run:
+        async def no_insert(batch):
+            for row, document in batch:
+                yield {"row": row, "status": "created", "id": str(document["_id"])}
+        product_service._insert_batch = no_insert
+
+        async def no_snapshot(user_id):
+            return None
+        snapshot_service.get_snapshot = no_snapshot
+    else:
+        await database.init_db()
+
+    rows = iter_ndjson_rows(iter_lines(generate_body(args.rows)))
+    started = time.perf_counter()
+    summary = None
+    async for result in product_service.bulk_create_products(rows, seller_id, args.batch_size):
+        if result["status"] == "summary":
+            summary = result
+    elapsed = time.perf_counter() - started
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"rows:        {args.rows}")
+    print(f"created:     {summary['created']}  failed: {summary['failed']}")
+    print(f"elapsed:     {elapsed:.2f}s")
+    print(f"throughput:  {args.rows / elapsed:,.0f} rows/s")
+    lookups = metrics.snapshot()["timings"].get("duplicates.lookup")
+    if lookups:
+        print(f"duplicates:  {lookups['count']} lookups, avg {lookups['avg'] * 1e3:.3f} ms, "
+              f"max {lookups['max'] * 1e3:.2f} ms")
+    print(f"peak RSS:    {peak_rss_mb:.1f} MB")
+
+    if not args.dry_run:
+        db = await database.get_database()
+        await db.products.delete_many({"seller_id": ObjectId(seller_id)})
+        await database.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
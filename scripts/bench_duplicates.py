@@ -0,0 +1,114 @@
+"""Benchmark the near-duplicate listing index: memory, lookup latency and recall.
+
+Usage:
+    python -m scripts.bench_duplicates [--listings 1000000] [--queries 2000]
+
+Indexes synthetic listings (Zipf-like vocabulary, 8-word titles and 40-word
+descriptions) without MongoDB, then times lookups for lightly edited copies
+of indexed listings and for unrelated text. Reports index memory per million
+listings, lookup latency percentiles, the share of edited copies caught and
+the share of unrelated listings wrongly matched.
+"""
+import argparse
+import bisect
+import itertools
+import random
+import resource
+import time
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.services.duplicate_service import duplicate_service
+from app.utils.minhash import LSHIndex
+
+
+def make_words(vocabulary_size: int, rng: random.Random):
+    words = [f"w{i}" for i in range(vocabulary_size)]
+    cumulative = list(itertools.accumulate(
+        1 / rank ** 1.1 for rank in range(1, vocabulary_size + 1)))
+
+    def sample(count: int):
+        return [words[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+                for _ in range(count)]
+    return sample
+
+
+def edited(words, fraction: float, rng: random.Random, sample):
+    """Copy of a word list with a fraction of its words replaced"""
+    words = list(words)
+    for i in rng.sample(range(len(words)), int(len(words) * fraction)):
+        words[i] = sample(1)[0]
+    return words
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--threshold", type=float, default=settings.DUPLICATE_THRESHOLD)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    sample = make_words(args.vocabulary, rng)
+    index = LSHIndex()
+    kept = []  # listings the edited copies are made from
+    keep_every = max(1, args.listings // args.queries)
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    for i in range(args.listings):
+        title, description = sample(8), sample(40)
+        signature = duplicate_service.signature(" ".join(title), " ".join(description))
+        index.add(ObjectId().binary, signature)
+        if i % keep_every == 0:
+            kept.append((title, description))
+    build_seconds = time.perf_counter() - started
+    index_bytes = index.memory_bytes()
+
+    def lookup(title, description):
+        started = time.perf_counter()
+        signature = duplicate_service.signature(" ".join(title), " ".join(description))
+        match = index.find(signature, args.threshold) if signature else None
+        return match, time.perf_counter() - started
+
+    print(f"listings:            {args.listings:,}")
+    print(f"index build:         {build_seconds:.1f}s "
+          f"({args.listings / build_seconds:,.0f} listings/s)")
+    print(f"index memory:        {index_bytes / 1024 ** 2:,.0f} MB "
+          f"({index_bytes / args.listings:,.0f} B/listing, "
+          f"{index_bytes / args.listings * 1e6 / 1024 ** 2:,.0f} MB per million)")
+    print(f"peak RSS growth:     {peak_rss_mb() - rss_before:,.0f} MB")
+
+    for fraction in (0.0, 0.05, 0.1, 0.2, 0.4):
+        latencies, caught = [], 0
+        for title, description in kept:
+            match, seconds = lookup(title, edited(description, fraction, rng, sample))
+            latencies.append(seconds)
+            caught += match is not None
+        print(f"{fraction:4.0%} words edited:   caught {caught / len(kept):6.1%}, "
+              f"p50 {percentile(latencies, 0.5) * 1e6:,.0f}us "
+              f"p99 {percentile(latencies, 0.99) * 1e6:,.0f}us")
+
+    latencies, false_matches = [], 0
+    for _ in range(len(kept)):
+        match, seconds = lookup(sample(8), sample(40))
+        latencies.append(seconds)
+        false_matches += match is not None
+    print(f"unrelated listings:  matched {false_matches / len(kept):6.2%}, "
+          f"p50 {percentile(latencies, 0.5) * 1e6:,.0f}us "
+          f"p99 {percentile(latencies, 0.99) * 1e6:,.0f}us")
+
+
+if __name__ == "__main__":
+    main()
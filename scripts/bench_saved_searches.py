@@ -0,0 +1,143 @@
+"""Benchmark saved search matching against a large number of saved filters.
+
+Usage:
+    python -m scripts.bench_saved_searches [--searches 1000000] [--listings 10000]
+
+Indexes synthetic saved filters without MongoDB (category on 90%, condition
+on 30%, location on 60%, a price range on 70% and search terms on 50%),
+then matches synthetic new listings against them. Reports build time,
+memory, matches per listing and matching latency percentiles.
+The first --verify listings are also checked against a brute-force scan of
+every filter.
+"""
+import argparse
+import random
+import resource
+import time
+
+from app.utils.percolator import QueryIndex, words
+
+CONDITIONS = ("new", "like_new", "good", "fair", "poor")
+
+
+def zipf_choice(rng: random.Random, count: int, skew: float = 1.0) -> int:
+    return min(count - 1, int(count ** rng.random() ** skew) - 1)
+
+
+def synthetic_filter(rng: random.Random, args) -> dict:
+    filter_dict = {}
+    if rng.random() < 0.9:
+        filter_dict["category"] = f"category-{zipf_choice(rng, args.categories)}"
+    if rng.random() < 0.3:
+        filter_dict["condition"] = rng.choice(CONDITIONS)
+    if rng.random() < 0.6:
+        filter_dict["location"] = f"city{zipf_choice(rng, args.locations)}"
+    if rng.random() < 0.7:
+        low = rng.lognormvariate(4, 1.5)
+        if rng.random() < 0.6:
+            filter_dict["max_price"] = round(low * rng.uniform(1.5, 10), 2)
+        if rng.random() < 0.5:
+            filter_dict["min_price"] = round(low, 2)
+    if rng.random() < 0.5 or not filter_dict:
+        filter_dict["search"] = " ".join(
+            f"word{zipf_choice(rng, args.vocabulary)}" for _ in range(rng.randint(1, 2)))
+    return filter_dict
+
+
+def synthetic_listing(rng: random.Random, args) -> dict:
+    return {
+        "_id": str(rng.getrandbits(64)),
+        "seller_id": "seller",
+        "title": " ".join(f"word{zipf_choice(rng, args.vocabulary)}" for _ in range(6)),
+        "description": " ".join(
+            f"word{zipf_choice(rng, args.vocabulary)}" for _ in range(30)),
+        "category": f"category-{zipf_choice(rng, args.categories)}",
+        "condition": rng.choice(CONDITIONS),
+        "location": f"City{zipf_choice(rng, args.locations)} central",
+        "price": round(rng.lognormvariate(4, 1.5), 2),
+    }
+
+
+def brute_force(filters, listing: dict) -> set:
+    """Ids of filters matching a listing, checked one by one"""
+    terms = words(listing["title"]) | words(listing["description"])
+    matched = set()
+    for filter_id, filter_dict in filters:
+        if filter_dict.get("category", listing["category"]) != listing["category"]:
+            continue
+        if filter_dict.get("condition", listing["condition"]) != listing["condition"]:
+            continue
+        if listing["price"] < filter_dict.get("min_price", 0):
+            continue
+        if listing["price"] > filter_dict.get("max_price", float("inf")):
+            continue
+        if not words(filter_dict.get("location")) <= words(listing["location"]):
+            continue
+        if "search" in filter_dict and not words(filter_dict["search"]) & terms:
+            continue
+        matched.add(filter_id)
+    return matched
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--searches", type=int, default=1_000_000)
+    parser.add_argument("--listings", type=int, default=10_000)
+    parser.add_argument("--verify", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--locations", type=int, default=300)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    filters = [(f"search-{i}", synthetic_filter(rng, args)) for i in range(args.searches)]
+    listings = [synthetic_listing(rng, args) for _ in range(args.listings)]
+
+    rss_before = peak_rss_mb()
+    index = QueryIndex()
+    started = time.perf_counter()
+    for i, (filter_id, filter_dict) in enumerate(filters):
+        index.add(filter_id, f"user-{i % 100_000}", filter_dict)
+    build_seconds = time.perf_counter() - started
+    index_mb = peak_rss_mb() - rss_before
+
+    latencies, match_counts = [], []
+    for listing in listings:
+        started = time.perf_counter()
+        match_counts.append(sum(1 for _ in index.match(listing)))
+        latencies.append(time.perf_counter() - started)
+
+    print(f"saved searches:      {args.searches:,}")
+    print(f"index build:         {build_seconds:.1f}s "
+          f"({args.searches / build_seconds:,.0f} searches/s)")
+    print(f"index memory:        ~{index_mb:,.0f} MB peak RSS growth "
+          f"({index_mb * 1024 ** 2 / args.searches:,.0f} B/search)")
+    print(f"listings matched:    {args.listings:,}")
+    print(f"matches per listing: mean {sum(match_counts) / len(match_counts):,.1f}, "
+          f"max {max(match_counts):,}")
+    print(f"match latency:       p50 {percentile(latencies, 0.5) * 1e3:.2f}ms, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.2f}ms, "
+          f"{args.listings / sum(latencies):,.0f} listings/s")
+
+    if args.verify:
+        started = time.perf_counter()
+        mismatches = 0
+        for listing in listings[:args.verify]:
+            expected = brute_force(filters, listing)
+            mismatches += expected != {entry[0] for entry in index.match(listing)}
+        brute_seconds = (time.perf_counter() - started) / args.verify
+        print(f"brute force:         {brute_seconds * 1e3:,.0f}ms per listing, "
+              f"{mismatches} of {args.verify} listings differ from the index")
+
+
+if __name__ == "__main__":
+    main()
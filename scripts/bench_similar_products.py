@@ -0,0 +1,113 @@
+"""Benchmark similar products build time and memory on a synthetic catalog.
+
+Usage:
+    python -m scripts.bench_similar_products [--products 1000000] [--categories 50]
+
+Generates listings with a Zipf-like vocabulary, then times each phase of a
+full build without MongoDB: term counting, TF-IDF, per-category top-N
+neighbours, and an incremental update with 1% new listings. Reports vector
+memory and peak RSS.
+"""
+import argparse
+import resource
+import time
+
+import numpy as np
+from scipy import sparse
+
+from app.core.config import settings
+from app.utils import similarity
+
+
+def synthetic_products(count: int, categories: int, vocabulary_size: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    words = np.asarray([f"w{i}" for i in range(vocabulary_size)])
+    # Zipf-like term frequencies, shifted per category so categories differ
+    weights = 1 / np.arange(1, vocabulary_size + 1) ** 1.1
+    weights /= weights.sum()
+    category_of = rng.integers(0, categories, count)
+    title_words = rng.choice(vocabulary_size, (count, 5), p=weights)
+    description_words = rng.choice(vocabulary_size, (count, 30), p=weights)
+    shift = category_of[:, None] * 97
+    title_words = (title_words + shift) % vocabulary_size
+    description_words = (description_words + shift) % vocabulary_size
+    for i in range(count):
+        yield {
+            "title": " ".join(words[title_words[i]]),
+            "description": " ".join(words[description_words[i]]),
+            "tags": [f"tag{category_of[i]}"],
+            "category": f"category-{category_of[i]}",
+        }
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--top-n", type=int, default=settings.SIMILAR_PRODUCTS_TOP_N)
+    parser.add_argument("--max-terms", type=int, default=settings.SIMILARITY_MAX_TERMS)
+    args = parser.parse_args()
+
+    timings = {}
+    started = time.perf_counter()
+    products = list(synthetic_products(args.products, args.categories, args.vocabulary))
+    categories = np.asarray([product["category"] for product in products])
+    timings["generate"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vocabulary = {}
+    counts = similarity.count_matrix(
+        (similarity.product_terms(product) for product in products), vocabulary)
+    timings["count terms"] = time.perf_counter() - started
+    del products
+
+    started = time.perf_counter()
+    idf = similarity.fit_idf(counts)
+    vectors = similarity.tfidf(counts, idf, args.max_terms)
+    timings["tf-idf"] = time.perf_counter() - started
+    counts_bytes = similarity.memory_bytes(counts)
+    del counts
+
+    started = time.perf_counter()
+    neighbour_bytes = 0
+    for category in np.unique(categories):
+        rows = np.flatnonzero(categories == category)
+        partition = vectors[rows]
+        neighbours, scores = similarity.top_neighbours(
+            partition, partition, args.top_n, exclude_offset=0,
+            block_rows=similarity.estimate_block_rows(len(rows)))
+        neighbour_bytes += neighbours.nbytes + scores.nbytes
+    timings["neighbours"] = time.perf_counter() - started
+
+    # Incremental: 1% new listings of one category against that partition
+    started = time.perf_counter()
+    new_count = max(1, args.products // 100 // args.categories)
+    new_products = list(synthetic_products(new_count, 1, args.vocabulary, seed=11))
+    new_counts = similarity.count_matrix(
+        (similarity.product_terms(product) for product in new_products), vocabulary, grow=False)
+    new_vectors = similarity.tfidf(new_counts, idf, args.max_terms)
+    rows = np.flatnonzero(categories == "category-0")
+    candidates = sparse.vstack([vectors[rows], new_vectors]).tocsr()
+    similarity.top_neighbours(new_vectors, candidates, args.top_n, exclude_offset=len(rows))
+    timings[f"incremental ({new_count} new)"] = time.perf_counter() - started
+
+    print(f"products:        {args.products:,} in {args.categories} categories")
+    print(f"terms:           {len(vocabulary):,}")
+    for phase, seconds in timings.items():
+        print(f"{phase + ':':<28} {seconds:8.2f}s")
+    build_seconds = sum(seconds for phase, seconds in timings.items()
+                        if phase in ("count terms", "tf-idf", "neighbours"))
+    print(f"build total:                 {build_seconds:8.2f}s")
+    print(f"count matrix:    {counts_bytes / 1024 ** 2:,.0f} MB")
+    print(f"tf-idf vectors:  {similarity.memory_bytes(vectors) / 1024 ** 2:,.0f} MB")
+    print(f"neighbour lists: {neighbour_bytes / 1024 ** 2:,.0f} MB (all categories)")
+    print(f"peak RSS:        {peak_rss_mb():,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
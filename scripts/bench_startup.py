@@ -0,0 +1,93 @@
+"""Benchmark worker startup: import time and time to first request.
+
+Usage:
+    python -m scripts.bench_startup [--runs 5] [--top 10]
+
+Imports app.main in fresh interpreters and reports the median import time and
+the slowest packages from ``-X importtime``. It then starts uvicorn --runs
+times and measures the time from process start until GET /health answers.
+Uses MONGODB_URL / DATABASE_NAME. Indexes build in the background, so
+BLOCKING_INDEX_BUILD=true shows what startup costs without that.
+"""
+import argparse
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def import_seconds() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET],
+                            check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int):
+    """(cumulative microseconds, package) for the slowest top-level packages"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            check=True, capture_output=True, text=True).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+    return sorted(((us, name) for name, us in packages.items()), reverse=True)[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request_seconds(timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning"])
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.01)
+        raise RuntimeError(f"no response within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    print(f"import app.main:       {statistics.median(imports) * 1000:.0f} ms "
+          f"(median of {args.runs})")
+    print("slowest packages:")
+    for cumulative, name in slowest_imports(args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    firsts = [first_request_seconds() for _ in range(args.runs)]
+    print(f"time to first request: {statistics.median(firsts) * 1000:.0f} ms "
+          f"(median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Build or update the precomputed similar products lists.
+
+Usage:
+    python -m scripts.build_similar_products [--incremental]
+
+A full build vectorizes every active product (TF-IDF over title, tags,
+category and description), stores each product's SIMILAR_PRODUCTS_TOP_N
+nearest neighbours within its category in similar_products, and saves the
+model to SIMILARITY_MODEL_PATH. --incremental adds only products listed since
+the last run, using the saved model, and is cheap enough to run every few
+minutes; schedule a full build nightly so vocabulary and IDF weights follow
+the catalog. Needs numpy and scipy. Runs against MONGODB_URL / DATABASE_NAME.
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from app.core import database
+from app.services.similarity_service import similarity_service
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--incremental", action="store_true",
+                        help="only add products listed since the last run")
+    args = parser.parse_args()
+
+    await database.init_db()
+    started = time.perf_counter()
+    if args.incremental:
+        stats = await similarity_service.update()
+    else:
+        stats = await similarity_service.build()
+    elapsed = time.perf_counter() - started
+    await database.close_db()
+
+    for name, value in stats.items():
+        print(f"{name + ':':<16} {value:,.2f}" if isinstance(value, float)
+              else f"{name + ':':<16} {value:,}")
+    print(f"{'elapsed:':<16} {elapsed:.1f}s")
+    print(f"{'peak RSS:':<16} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
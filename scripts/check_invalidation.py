@@ -0,0 +1,87 @@
+"""Check change-stream cache invalidation against a replica set.
+
+Usage:
+    python -m scripts.check_invalidation [--timeout 10]
+
+Starts a change stream watcher on a scratch collection, inserts, updates
+and deletes a document there and waits for each event to reach the
+invalidation bus. Reports the delay from write to event. Runs against
+MONGODB_URL / DATABASE_NAME (a single-node replica set is enough) and drops
+the scratch collection and the watcher's resume token afterwards. Exits
+non-zero if the watcher falls back to TTL-only mode or an event does not
+arrive.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from app.core import database
+from app.core.invalidation import TOKENS_COLLECTION, ChangeStreamWatcher, InvalidationBus
+from app.core.leases import LEASES_COLLECTION
+
+# Never one of the application's collections, so no real data is touched
+SCRATCH_COLLECTION = "invalidation_check"
+
+
+async def check(db, watcher: ChangeStreamWatcher, events: asyncio.Queue,
+                timeout: float) -> bool:
+    await watcher.start()
+    while watcher.mode == "starting":
+        await asyncio.sleep(0.1)
+    if watcher.mode != "change_streams":
+        print("FAIL: change streams unavailable, running in TTL-only mode")
+        return False
+    # Let the stream open before writing
+    await asyncio.sleep(1)
+
+    ok = True
+    result = await db[SCRATCH_COLLECTION].insert_one({"title": "Invalidation check"})
+    writes = (
+        ("insert", None),
+        ("update", db[SCRATCH_COLLECTION].update_one(
+            {"_id": result.inserted_id}, {"$set": {"price": 1}})),
+        ("delete", db[SCRATCH_COLLECTION].delete_one({"_id": result.inserted_id})),
+    )
+    for operation, write in writes:
+        started = time.perf_counter()
+        if write is not None:
+            await write
+        try:
+            change = await asyncio.wait_for(events.get(), timeout)
+        except asyncio.TimeoutError:
+            print(f"{operation:<8} no event within {timeout:.0f}s")
+            ok = False
+            continue
+        delay_ms = (time.perf_counter() - started) * 1000
+        print(f"{operation:<8} {change['operationType']:<8} {delay_ms:.1f} ms")
+        ok = ok and change["operationType"] == operation
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    await database.init_db()
+    db = await database.get_database()
+    bus = InvalidationBus()
+    events: asyncio.Queue = asyncio.Queue()
+    bus.subscribe(SCRATCH_COLLECTION, events.put_nowait)
+    watcher = ChangeStreamWatcher(bus, collections=(SCRATCH_COLLECTION,))
+
+    try:
+        ok = await check(db, watcher, events, args.timeout)
+    finally:
+        await watcher.stop()
+        await db[SCRATCH_COLLECTION].drop()
+        await db[TOKENS_COLLECTION].delete_one({"_id": watcher._token_id(SCRATCH_COLLECTION)})
+        await db[LEASES_COLLECTION].delete_one({"_id": watcher._token_lease(SCRATCH_COLLECTION)})
+        await database.close_db()
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,154 @@
+"""Check stock reservation and order status transitions.
+
+Usage:
+    python -m scripts.check_stock_reservation [--no-db]
+
+Checks can_transition against the order and payment state machines, then
+runs reserve_stock and release_stock through a fixed sequence of cases:
+partial reservations, selling out, buying beyond stock, a seller buying
+their own listing, a product created before stock tracking and an inactive
+product. Runs against MONGODB_URL / DATABASE_NAME (a standalone server is
+enough) and removes everything it created; --no-db only checks transitions.
+Exits non-zero on the first mismatch of each case.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.core import database
+from app.models.order import (
+    ORDER_STATUS_TRANSITIONS,
+    PAYMENT_STATUS_TRANSITIONS,
+    OrderStatus,
+    PaymentStatus,
+    can_transition,
+)
+from app.services.product_service import product_service
+
+# (transitions, current, target, allowed)
+TRANSITION_CASES = (
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.PENDING, OrderStatus.PENDING, True),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.PENDING, OrderStatus.CONFIRMED, True),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.PENDING, OrderStatus.CANCELLED, True),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.PENDING, OrderStatus.SHIPPED, False),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.CONFIRMED, OrderStatus.SHIPPED, True),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.SHIPPED, OrderStatus.CANCELLED, False),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.SHIPPED, OrderStatus.DELIVERED, True),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.DELIVERED, OrderStatus.REFUNDED, True),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.DELIVERED, OrderStatus.PENDING, False),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.CANCELLED, OrderStatus.CONFIRMED, False),
+    (ORDER_STATUS_TRANSITIONS, OrderStatus.REFUNDED, OrderStatus.DELIVERED, False),
+    (PAYMENT_STATUS_TRANSITIONS, PaymentStatus.PENDING, PaymentStatus.COMPLETED, True),
+    (PAYMENT_STATUS_TRANSITIONS, PaymentStatus.PENDING, PaymentStatus.REFUNDED, False),
+    (PAYMENT_STATUS_TRANSITIONS, PaymentStatus.FAILED, PaymentStatus.PENDING, True),
+    (PAYMENT_STATUS_TRANSITIONS, PaymentStatus.COMPLETED, PaymentStatus.FAILED, False),
+    (PAYMENT_STATUS_TRANSITIONS, PaymentStatus.COMPLETED, PaymentStatus.REFUNDED, True),
+    (PAYMENT_STATUS_TRANSITIONS, PaymentStatus.REFUNDED, PaymentStatus.COMPLETED, False),
+)
+
+
+def check_transitions() -> bool:
+    ok = True
+    for transitions, current, target, allowed in TRANSITION_CASES:
+        # Stored orders hold plain strings, updates hold enum members
+        for pair in ((current, target), (current.value, target.value)):
+            if can_transition(transitions, *pair) != allowed:
+                print(f"FAIL transition {current.value} -> {target.value}: "
+                      f"expected {'allowed' if allowed else 'refused'}")
+                ok = False
+    print(f"transitions   {len(TRANSITION_CASES)} cases {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def check_case(db, name: str, product: dict, steps: list) -> bool:
+    """Run (action, quantity, buyer, expected) steps against one product.
+
+    expected is (quantity_available, status) after the step, or None for a
+    reservation that must be refused.
+    """
+    product = {"title": f"Reservation check: {name}", "price": 10.0,
+               "created_at": datetime.utcnow(), **product}
+    product_id = str((await db.products.insert_one(product)).inserted_id)
+    try:
+        for number, (action, quantity, buyer_id, expected) in enumerate(steps, 1):
+            if action == "reserve":
+                reserved = await product_service.reserve_stock(product_id, quantity, buyer_id)
+                if expected is None:
+                    if reserved is not None:
+                        print(f"FAIL {name}, step {number}: reservation was not refused")
+                        return False
+                    continue
+                if reserved is None:
+                    print(f"FAIL {name}, step {number}: reservation was refused")
+                    return False
+            else:
+                await product_service.release_stock(product_id, quantity)
+
+            stored = await db.products.find_one({"_id": ObjectId(product_id)})
+            state = (stored.get("quantity_available"), stored.get("status"))
+            if state != expected:
+                print(f"FAIL {name}, step {number} ({action} {quantity}): "
+                      f"expected {expected}, got {state}")
+                return False
+    finally:
+        await db.products.delete_one({"_id": ObjectId(product_id)})
+    print(f"{name:<13} {len(steps)} steps OK")
+    return True
+
+
+async def check_reservations() -> bool:
+    await database.init_db()
+    db = await database.get_database()
+    seller_id = ObjectId()
+    buyer_id = str(ObjectId())
+
+    cases = (
+        ("stock", {"quantity_available": 3}, [
+            ("reserve", 2, buyer_id, (1, "active")),
+            ("reserve", 2, buyer_id, None),
+            ("reserve", 1, buyer_id, (0, "sold")),
+            ("reserve", 1, buyer_id, None),
+            ("release", 1, None, (1, "active")),
+            ("reserve", 1, buyer_id, (0, "sold")),
+        ]),
+        ("own listing", {"quantity_available": 1}, [
+            ("reserve", 1, str(seller_id), None),
+            ("reserve", 1, buyer_id, (0, "sold")),
+        ]),
+        ("legacy", {}, [
+            ("reserve", 2, buyer_id, None),
+            ("reserve", 1, buyer_id, (0, "sold")),
+            ("release", 1, None, (1, "active")),
+        ]),
+        ("inactive", {"quantity_available": 1, "status": "inactive"}, [
+            ("reserve", 1, buyer_id, None),
+            ("release", 1, None, (2, "inactive")),
+        ]),
+    )
+    results = []
+    for name, fields, steps in cases:
+        product = {"status": "active", "seller_id": seller_id, **fields}
+        results.append(await check_case(db, name, product, steps))
+
+    await database.close_db()
+    return all(results)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-db", action="store_true",
+                        help="only check status transitions")
+    args = parser.parse_args()
+
+    ok = check_transitions()
+    if not args.no_db:
+        ok = await check_reservations() and ok
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,161 @@
+"""Online migration of string references to ObjectId.
+
+Usage:
+    python -m scripts.migrate_object_id_refs [--batch-size 1000] [--rate 5000]
+        [--collection products] [--restart] [--dry-run] [--compact]
+
+Walks products (seller_id), orders and orders_archive (product_id, buyer_id,
+seller_id) in _id order. Each batch becomes one unordered bulk_write. Every update is
+conditional on the old string value, so concurrent writes from the running
+app are never overwritten. Progress is checkpointed per collection in the
+``migrations`` collection, so an interrupted run resumes where it stopped
+(--restart starts over). --rate caps documents scanned per second to
+limit load on a live cluster. Index sizes are reported before and after.
+Old index pages are only returned to the OS after a rebuild, so use
+--compact to run ``compact`` on each collection when done.
+
+Once every collection reports done, set LEGACY_STRING_REFS=false.
+Runs against MONGODB_URL / DATABASE_NAME.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core import database
+
+REFERENCES = {
+    "products": ("seller_id",),
+    "orders": ("product_id", "buyer_id", "seller_id"),
+    # Orders archived before the migration still hold string refs. Walked
+    # after orders, so orders archived mid-run are caught here
+    "orders_archive": ("product_id", "buyer_id", "seller_id"),
+}
+MIGRATION_ID = "object_id_refs"
+
+
+async def index_sizes(db, collection: str) -> dict:
+    stats = await db[collection].aggregate(
+        [{"$collStats": {"storageStats": {}}}]).to_list(length=1)
+    return stats[0]["storageStats"]["indexSizes"] if stats else {}
+
+
+def conversions(document: dict, fields) -> dict:
+    """Reference fields of a document still stored as hex strings"""
+    return {field: document[field] for field in fields
+            if isinstance(document.get(field), str) and ObjectId.is_valid(document[field])}
+
+
+async def migrate(db, collection: str, fields, args):
+    progress = db.migrations
+    checkpoint_id = f"{MIGRATION_ID}:{collection}"
+    if args.restart:
+        await progress.delete_one({"_id": checkpoint_id})
+    checkpoint = await progress.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("done"):
+        print(f"{collection}: already done")
+        return
+
+    last_id = checkpoint.get("last_id")
+    scanned = checkpoint.get("scanned", 0)
+    converted = checkpoint.get("converted", 0)
+    started = time.perf_counter()
+    run_scanned = 0
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await db[collection].find(
+            query, {field: 1 for field in fields}
+        ).sort("_id", 1).limit(args.batch_size).to_list(length=args.batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for document in batch:
+            strings = conversions(document, fields)
+            if strings:
+                operations.append(UpdateOne(
+                    {"_id": document["_id"], **strings},
+                    {"$set": {field: ObjectId(value) for field, value in strings.items()}}
+                ))
+
+        if operations and not args.dry_run:
+            result = await db[collection].bulk_write(operations, ordered=False)
+            converted += result.modified_count
+        elif operations:
+            converted += len(operations)
+
+        last_id = batch[-1]["_id"]
+        scanned += len(batch)
+        run_scanned += len(batch)
+        if not args.dry_run:
+            await progress.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "scanned": scanned,
+                          "converted": converted, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+
+        if args.rate:
+            # Sleep off whatever is ahead of the target rate
+            ahead = run_scanned / args.rate - (time.perf_counter() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    if not args.dry_run:
+        await progress.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"done": True, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+    elapsed = time.perf_counter() - started
+    action = "would convert" if args.dry_run else "converted"
+    print(f"{collection}: scanned {scanned}, {action} {converted} "
+          f"({run_scanned / elapsed if elapsed else 0:,.0f} docs/s this run)")
+
+
+def print_sizes(label: str, sizes: dict):
+    print(label)
+    for collection, indexes in sizes.items():
+        for name, size in sorted(indexes.items()):
+            print(f"  {collection}.{name:<28} {size / 1024:>10,.0f} KB")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=5000,
+                        help="max documents scanned per second (0 = unthrottled)")
+    parser.add_argument("--collection", choices=sorted(REFERENCES))
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    parser.add_argument("--dry-run", action="store_true", help="count only, write nothing")
+    parser.add_argument("--compact", action="store_true",
+                        help="run compact afterwards to release old index pages")
+    args = parser.parse_args()
+
+    await database.init_db()
+    db = await database.get_database()
+    collections = [args.collection] if args.collection else list(REFERENCES)
+
+    before = {collection: await index_sizes(db, collection) for collection in collections}
+    print_sizes("index sizes before:", before)
+
+    for collection in collections:
+        await migrate(db, collection, REFERENCES[collection], args)
+        if args.compact and not args.dry_run:
+            await db.command("compact", collection)
+
+    after = {collection: await index_sizes(db, collection) for collection in collections}
+    print_sizes("index sizes after:", after)
+    for collection in collections:
+        saved = sum(before[collection].values()) - sum(after[collection].values())
+        print(f"{collection}: {saved / 1024:+,.0f} KB freed in indexes")
+
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""Concurrency stress test for stock reservation in OrderService.create_order.
+
+Usage:
+    python -m scripts.stress_stock_reservation [--stock 100] [--buyers 1000]
+
+Creates one product with --stock units, fires --buyers concurrent one-unit
+orders at it and checks that exactly --stock orders succeed, the product ends
+at zero units with status "sold" and no order was created beyond the stock.
+Reports orders/s on the hot product. Runs against MONGODB_URL / DATABASE_NAME
+and removes everything it created: the product, its orders, the seller's
+daily sales rollups and the product's saved search job. Exits non-zero on
+oversell.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bson import ObjectId
+
+from app.core import database
+from app.core.jobs import JOBS_COLLECTION
+from app.schemas.order import OrderCreate
+from app.schemas.product import ProductCreate
+from app.services.order_service import order_service
+from app.services.product_service import product_service
+from app.services.seller_stats_service import seller_stats_service
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--buyers", type=int, default=1000)
+    args = parser.parse_args()
+
+    await database.init_db()
+    db = await database.get_database()
+
+    seller_id = str(ObjectId())
+    product = await product_service.create_product(ProductCreate(
+        title="Flash sale item",
+        description="Stress test product",
+        price=10.0,
+        category="stress-test",
+        quantity_available=args.stock,
+    ), seller_id)
+
+    async def buy():
+        order = OrderCreate(product_id=product.id, quantity=1, shipping_address="Stress Street 1")
+        try:
+            await order_service.create_order(order, str(ObjectId()))
+            return True
+        except ValueError:
+            return False
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(buy() for _ in range(args.buyers)))
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(outcomes)
+    stored = await db.products.find_one({"_id": ObjectId(product.id)})
+    orders = await db.orders.count_documents({"product_id": ObjectId(product.id)})
+
+    print(f"buyers:        {args.buyers}")
+    print(f"stock:         {args.stock}")
+    print(f"succeeded:     {succeeded}")
+    print(f"orders stored: {orders}")
+    print(f"final stock:   {stored['quantity_available']} ({stored['status']})")
+    print(f"elapsed:       {elapsed:.2f}s ({args.buyers / elapsed:,.0f} attempts/s, "
+          f"{succeeded / elapsed:,.0f} orders/s)")
+
+    await db.orders.delete_many({"product_id": ObjectId(product.id)})
+    await db.products.delete_one({"_id": ObjectId(product.id)})
+    # Rollup ids are "<seller>:<day>", so ";" bounds the seller's range
+    await db[seller_stats_service.collection_name].delete_many(
+        {"_id": {"$gte": f"{seller_id}:", "$lt": f"{seller_id};"}})
+    await db[JOBS_COLLECTION].delete_many({"payload.product_id": product.id})
+    await database.close_db()
+
+    expected = min(args.stock, args.buyers)
+    ok = succeeded == orders == expected and stored["quantity_available"] == args.stock - expected
+    if args.buyers >= args.stock:
+        ok = ok and stored["status"] == "sold"
+    print("OK: no oversell" if ok else "FAIL: stock accounting mismatch")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
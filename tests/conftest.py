@@ -0,0 +1,29 @@
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core import database
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    """In-memory database behind every module's get_database"""
+    db = AsyncMongoMockClient()["test"]
+
+    async def get_database():
+        return db
+
+    async def get_read_database(route=None):
+        return db
+
+    replacements = {
+        database.get_database: ("get_database", get_database),
+        database.get_read_database: ("get_read_database", get_read_database),
+    }
+    for name, module in list(sys.modules.items()):
+        if name == "app" or name.startswith("app."):
+            for original, (attribute, replacement) in replacements.items():
+                if getattr(module, attribute, None) is original:
+                    monkeypatch.setattr(module, attribute, replacement)
+    return db
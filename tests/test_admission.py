@@ -0,0 +1,63 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+from starlette.datastructures import Headers
+
+from app.core.admission import AdmissionControlMiddleware, client_ip
+from app.core.config import settings
+
+
+def scope_with(forwarded: str = None) -> tuple:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    scope = {"type": "http", "client": ("10.0.0.2", 5000), "headers": headers}
+    return scope, Headers(scope=scope)
+
+
+def test_client_ip_reads_the_trusted_hop(monkeypatch):
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 0)
+    assert client_ip(*scope_with("1.2.3.4")) == "10.0.0.2"
+
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 1)
+    assert client_ip(*scope_with("6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+    assert client_ip(*scope_with()) == "10.0.0.2"
+
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 2)
+    assert client_ip(*scope_with("6.6.6.6, 1.2.3.4, 10.0.0.1")) == "1.2.3.4"
+    assert client_ip(*scope_with("1.2.3.4")) == "1.2.3.4"
+
+
+def make_client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(settings, "RATE_LIMIT_IP_PER_SECOND", 0.001)
+    monkeypatch.setattr(settings, "RATE_LIMIT_IP_BURST", 3)
+    monkeypatch.setattr(settings, "RATE_LIMIT_USER_PER_SECOND", 0.001)
+    monkeypatch.setattr(settings, "RATE_LIMIT_USER_BURST", 100)
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    app.add_middleware(AdmissionControlMiddleware, max_in_flight=10)
+    return TestClient(app)
+
+
+def test_proxied_clients_get_separate_ip_buckets(monkeypatch):
+    client = make_client(monkeypatch)
+    for _ in range(3):
+        assert client.get("/ping", headers={"X-Forwarded-For": "1.1.1.1"}).status_code == 200
+    assert client.get("/ping", headers={"X-Forwarded-For": "1.1.1.1"}).status_code == 429
+    assert client.get("/ping", headers={"X-Forwarded-For": "2.2.2.2"}).status_code == 200
+
+
+def test_authenticated_requests_count_against_the_ip(monkeypatch):
+    client = make_client(monkeypatch)
+    statuses = []
+    for user in range(5):
+        token = jwt.encode({"sub": f"user-{user}"}, settings.SECRET_KEY,
+                           algorithm=settings.ALGORITHM)
+        statuses.append(client.get("/ping", headers={
+            "Authorization": f"Bearer {token}", "X-Forwarded-For": "3.3.3.3"}).status_code)
+    assert statuses == [200, 200, 200, 429, 429]
@@ -0,0 +1,42 @@
+from app.utils import minhash
+
+
+def listing_signature(number: int) -> minhash.Signature:
+    text = f"vintage road bike model {number} frame size {number * 7} with new tyres"
+    return minhash.signature(minhash.shingles(text))
+
+
+def test_repeated_edits_keep_index_flat():
+    index = minhash.LSHIndex()
+    keys = [bytes([i]) * 12 for i in range(20)]
+    for number, key in enumerate(keys):
+        index.add(key, listing_signature(number))
+    sizes = []
+    for edit in range(5000):
+        key = keys[edit % len(keys)]
+        index.add(key, listing_signature(1000 + edit))
+        if edit % 1000 == 999:
+            sizes.append((len(index.alive), len(index._heads)))
+
+    assert len(index) == len(keys)
+    # Tombstones are compacted away, so neither the rows nor the table grow
+    assert max(rows for rows, _ in sizes) <= 1024 + 2 * len(keys)
+    assert len({slots for _, slots in sizes}) == 1
+    assert len(index.ids) == 12 * len(index.alive)
+
+    latest = listing_signature(1000 + 4999)
+    assert index.find(latest, 0.9) == (keys[4999 % len(keys)], 1.0)
+
+
+def test_removed_rows_are_not_found_after_compaction():
+    index = minhash.LSHIndex()
+    for number in range(3000):
+        index.add(number.to_bytes(12, "big"), listing_signature(number))
+    for number in range(0, 3000, 2):
+        index.remove(number.to_bytes(12, "big"))
+    index.add((5000).to_bytes(12, "big"), listing_signature(5000))
+
+    assert len(index) == 1501
+    assert index.find(listing_signature(10), 0.9) is None
+    match = index.find(listing_signature(11), 0.9)
+    assert match is not None and match[0] == (11).to_bytes(12, "big")
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.schemas.order import OrderFilter
+from app.services.order_archive_service import ARCHIVE_COLLECTION
+from app.services.order_service import order_service
+
+
+def make_order(buyer_id: ObjectId, created_at: datetime, status: str) -> dict:
+    return {
+        "_id": ObjectId(),
+        "product_id": ObjectId(),
+        "buyer_id": buyer_id,
+        "seller_id": ObjectId(),
+        "quantity": 1,
+        "total_price": 10.0,
+        "status": status,
+        "payment_status": "completed",
+        "shipping_address": "1 Main Street",
+        "product_info": {"id": "p", "title": "Item", "price": 10.0},
+        "buyer_info": {"id": str(buyer_id), "username": "buyer"},
+        "seller_info": {"id": "s", "username": "seller"},
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def test_pages_merge_hot_and_archived_orders_by_created_at(mongo_db):
+    buyer_id = ObjectId()
+    start = datetime(2025, 1, 1)
+    hot, archived = [], []
+    for day in range(12):
+        created_at = start + timedelta(days=day)
+        # Recent orders and old ones stuck in a non-final state stay hot
+        if day >= 8 or day % 3 == 0:
+            hot.append(make_order(buyer_id, created_at, "shipped"))
+        else:
+            archived.append(make_order(buyer_id, created_at, "delivered"))
+    asyncio.run(mongo_db.orders.insert_many(hot))
+    asyncio.run(mongo_db[ARCHIVE_COLLECTION].insert_many(archived))
+
+    seen = []
+    for skip in range(0, 14, 5):
+        page = asyncio.run(order_service.get_user_orders(
+            str(buyer_id), OrderFilter(), skip=skip, limit=5))
+        seen += [order.id for order in page]
+
+    expected = sorted(hot + archived, key=lambda order: order["created_at"], reverse=True)
+    assert seen == [str(order["_id"]) for order in expected]
+
+
+def test_recent_page_reads_only_hot_orders(mongo_db):
+    buyer_id = ObjectId()
+    recent = [make_order(buyer_id, datetime(2026, 1, day), "pending") for day in range(1, 6)]
+    old = make_order(buyer_id, datetime(2024, 1, 1), "delivered")
+    asyncio.run(mongo_db.orders.insert_many(recent))
+    asyncio.run(mongo_db[ARCHIVE_COLLECTION].insert_one(old))
+
+    page = asyncio.run(order_service.get_user_orders(
+        str(buyer_id), OrderFilter(), skip=0, limit=3))
+    assert [order.id for order in page] == [str(order["_id"]) for order in recent[::-1][:3]]
+
+    last = asyncio.run(order_service.get_user_orders(
+        str(buyer_id), OrderFilter(), skip=3, limit=3))
+    assert [order.id for order in last] == [
+        str(recent[1]["_id"]), str(recent[0]["_id"]), str(old["_id"])]
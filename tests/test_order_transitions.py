@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.models.order import OrderStatus, PaymentStatus
+from app.schemas.order import OrderUpdate
+from app.services.order_service import OrderConflict, order_service
+
+
+def insert_order(db, status: str, payment_status: str = "completed") -> dict:
+    order = {
+        "_id": ObjectId(),
+        "product_id": ObjectId(),
+        "buyer_id": ObjectId(),
+        "seller_id": ObjectId(),
+        "quantity": 1,
+        "total_price": 10.0,
+        "status": status,
+        "payment_status": payment_status,
+        "shipping_address": "1 Main Street",
+        "created_at": datetime(2026, 1, 1),
+        "updated_at": datetime(2026, 1, 1),
+    }
+    asyncio.run(db.orders.insert_one(order))
+    return order
+
+
+def test_update_order_rejects_invalid_transition(mongo_db):
+    order = insert_order(mongo_db, "delivered")
+
+    with pytest.raises(ValueError, match="Cannot move order from delivered to pending"):
+        asyncio.run(order_service.update_order(
+            str(order["_id"]), OrderUpdate(status=OrderStatus.PENDING), str(order["seller_id"])))
+
+    stored = asyncio.run(mongo_db.orders.find_one({"_id": order["_id"]}))
+    assert stored["status"] == "delivered"
+    assert stored["updated_at"] == order["updated_at"]
+
+
+def test_update_order_rejects_invalid_payment_transition(mongo_db):
+    order = insert_order(mongo_db, "shipped", payment_status="refunded")
+
+    with pytest.raises(ValueError, match="Cannot move payment"):
+        asyncio.run(order_service.update_order(
+            str(order["_id"]), OrderUpdate(payment_status=PaymentStatus.COMPLETED),
+            str(order["seller_id"])))
+
+
+def test_update_order_conflicts_when_status_changed_underneath(mongo_db, monkeypatch):
+    order = insert_order(mongo_db, "pending")
+    collection_class = type(mongo_db.orders)
+    find_one = collection_class.find_one
+
+    async def stale_find_one(self, *args, **kwargs):
+        # Another request cancels the order right after this one read it
+        current = await find_one(self, *args, **kwargs)
+        await self.update_one({"_id": order["_id"]}, {"$set": {"status": "cancelled"}})
+        return current
+
+    monkeypatch.setattr(collection_class, "find_one", stale_find_one)
+    with pytest.raises(OrderConflict):
+        asyncio.run(order_service.update_order(
+            str(order["_id"]), OrderUpdate(status=OrderStatus.CONFIRMED),
+            str(order["seller_id"])))
+    monkeypatch.undo()
+
+    stored = asyncio.run(mongo_db.orders.find_one({"_id": order["_id"]}))
+    assert stored["status"] == "cancelled"
+
+
+def test_update_order_applies_valid_transition(mongo_db):
+    order = insert_order(mongo_db, "confirmed")
+
+    updated = asyncio.run(order_service.update_order(
+        str(order["_id"]), OrderUpdate(status=OrderStatus.SHIPPED, seller_notes="Sent"),
+        str(order["seller_id"])))
+
+    assert updated.status == "shipped"
+    assert updated.seller_notes == "Sent"
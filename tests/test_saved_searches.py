@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.invalidation import change_stream_watcher
+from app.schemas.product import ProductFilter, SavedSearchCreate
+from app.services.saved_search_service import COMPACT_MIN_TOMBSTONES, saved_search_service
+from app.utils.percolator import QueryIndex
+
+
+@pytest.fixture
+def service(mongo_db, monkeypatch):
+    monkeypatch.setattr(saved_search_service, "index", QueryIndex())
+    monkeypatch.setattr(settings, "MAX_SAVED_SEARCHES_PER_USER", 3)
+    return saved_search_service
+
+
+def create(user_id: str, search: str):
+    return saved_search_service.create_saved_search(
+        user_id, SavedSearchCreate(filter=ProductFilter(search=search)))
+
+
+async def create_concurrently(user_id: str, count: int) -> list:
+    return await asyncio.gather(
+        *(create(user_id, f"bike {number}") for number in range(count)),
+        return_exceptions=True)
+
+
+def test_concurrent_creates_stop_at_the_cap(service, mongo_db, monkeypatch):
+    collection = type(mongo_db.saved_searches)
+    insert_one = collection.insert_one
+
+    async def slow_insert_one(self, *args, **kwargs):
+        # Let the other creates run between the cap check and the insert
+        await asyncio.sleep(0)
+        return await insert_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "insert_one", slow_insert_one)
+    user_id = str(ObjectId())
+    results = asyncio.run(create_concurrently(user_id, 8))
+
+    refused = [result for result in results if isinstance(result, ValueError)]
+    assert len(refused) == 5
+    saved = asyncio.run(mongo_db.saved_searches.count_documents({"user_id": ObjectId(user_id)}))
+    assert saved == 3
+
+
+def test_cap_counts_searches_saved_before_the_counter(service, mongo_db):
+    user_id = ObjectId()
+    asyncio.run(mongo_db.saved_searches.insert_many([
+        {"user_id": user_id, "filter": {"search": "lamp"}, "created_at": datetime.utcnow()}
+        for _ in range(2)
+    ]))
+
+    asyncio.run(create(str(user_id), "desk"))
+    with pytest.raises(ValueError):
+        asyncio.run(create(str(user_id), "chair"))
+
+
+def test_delete_frees_a_slot(service):
+    user_id = str(ObjectId())
+    searches = [asyncio.run(create(user_id, term)) for term in ("a", "b", "c")]
+    assert asyncio.run(service.delete_saved_search(searches[0].id, user_id))
+
+    asyncio.run(create(user_id, "d"))
+    with pytest.raises(ValueError):
+        asyncio.run(create(user_id, "e"))
+
+
+def test_change_stream_mode_rebuilds_once_tombstones_pile_up(service, monkeypatch):
+    monkeypatch.setattr(change_stream_watcher, "mode", "change_streams")
+    user_id = str(ObjectId())
+    kept = asyncio.run(create(user_id, "kept"))
+    for number in range(COMPACT_MIN_TOMBSTONES + 1):
+        service.on_saved_search_change({
+            "operationType": "insert",
+            "fullDocument": {"_id": f"gone-{number}", "user_id": user_id,
+                             "filter": {"search": "gone"}},
+        })
+        service.on_saved_search_change({
+            "operationType": "delete", "documentKey": {"_id": f"gone-{number}"}})
+    assert service.index.tombstones == COMPACT_MIN_TOMBSTONES + 1
+    assert service._needs_rebuild()
+
+    asyncio.run(service.load(fresh=True))
+    assert service.index.tombstones == 0
+    assert list(service.index.rows) == [kept.id]
+    assert not service._needs_rebuild()
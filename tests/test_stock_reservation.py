@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.schemas.order import OrderCreate
+from app.services.order_service import order_service
+from app.services.product_service import product_service
+
+
+def insert_product(db, **fields) -> dict:
+    product = {
+        "_id": ObjectId(),
+        "title": "Flash sale item",
+        "description": "Stock reservation test",
+        "price": 10.0,
+        "category": "test",
+        "seller_id": ObjectId(),
+        "status": "active",
+        "created_at": datetime(2026, 1, 1),
+        **fields,
+    }
+    asyncio.run(db.products.insert_one(product))
+    return product
+
+
+def stored(db, product: dict) -> tuple:
+    document = asyncio.run(db.products.find_one({"_id": product["_id"]}))
+    return document.get("quantity_available"), document["status"]
+
+
+def test_reserve_and_release(mongo_db):
+    product = insert_product(mongo_db, quantity_available=3)
+    product_id, buyer_id = str(product["_id"]), str(ObjectId())
+
+    assert asyncio.run(product_service.reserve_stock(product_id, 2, buyer_id))
+    assert stored(mongo_db, product) == (1, "active")
+    assert asyncio.run(product_service.reserve_stock(product_id, 2, buyer_id)) is None
+    assert asyncio.run(product_service.reserve_stock(product_id, 1, buyer_id))
+    assert stored(mongo_db, product) == (0, "sold")
+
+    asyncio.run(product_service.release_stock(product_id, 1))
+    assert stored(mongo_db, product) == (1, "active")
+
+
+def test_seller_cannot_reserve_own_listing(mongo_db):
+    product = insert_product(mongo_db, quantity_available=1)
+
+    assert asyncio.run(product_service.reserve_stock(
+        str(product["_id"]), 1, str(product["seller_id"]))) is None
+    assert stored(mongo_db, product) == (1, "active")
+
+
+def test_legacy_product_counts_as_one_unit(mongo_db):
+    product = insert_product(mongo_db)
+    product_id, buyer_id = str(product["_id"]), str(ObjectId())
+
+    assert asyncio.run(product_service.reserve_stock(product_id, 2, buyer_id)) is None
+    assert asyncio.run(product_service.reserve_stock(product_id, 1, buyer_id))
+    assert stored(mongo_db, product) == (0, "sold")
+
+
+def test_release_keeps_inactive_product_inactive(mongo_db):
+    product = insert_product(mongo_db, quantity_available=1, status="inactive")
+
+    asyncio.run(product_service.release_stock(str(product["_id"]), 1))
+    assert stored(mongo_db, product) == (2, "inactive")
+
+
+def test_concurrent_orders_do_not_oversell(mongo_db):
+    product = insert_product(mongo_db, quantity_available=5)
+
+    async def buy():
+        order = OrderCreate(product_id=str(product["_id"]), quantity=1,
+                            shipping_address="1 Main Street")
+        try:
+            await order_service.create_order(order, str(ObjectId()))
+            return True
+        except ValueError:
+            return False
+
+    async def buy_all():
+        return await asyncio.gather(*(buy() for _ in range(20)))
+
+    assert sum(asyncio.run(buy_all())) == 5
+    assert stored(mongo_db, product) == (0, "sold")
+    assert asyncio.run(mongo_db.orders.count_documents(
+        {"product_id": product["_id"]})) == 5
@@ -0,0 +1,22 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.services.trending_service import trending_service
+
+
+def test_prune_compares_scores_decayed_to_now(mongo_db, monkeypatch):
+    monkeypatch.setattr(settings, "TRENDING_HALF_LIFE_HOURS", 24.0)
+    now = datetime(2026, 1, 31)
+    popularity = mongo_db[trending_service.collection_name]
+    asyncio.run(popularity.insert_many([
+        # Was a hit a month ago: 1000 halved 30 times is about 0.000001
+        {"_id": "stale-hit", "score": 1000.0, "updated_at": now - timedelta(days=30)},
+        {"_id": "fresh", "score": 0.5, "updated_at": now},
+        # 2 halved twice is 0.5, still worth ranking
+        {"_id": "cooling", "score": 2.0, "updated_at": now - timedelta(days=2)},
+    ]))
+
+    assert asyncio.run(trending_service.prune(now)) == 1
+    remaining = asyncio.run(popularity.distinct("_id"))
+    assert sorted(remaining) == ["cooling", "fresh"]
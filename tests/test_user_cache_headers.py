@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.user import UserInDB
+from app.services.user_service import user_service
+
+
+def make_user() -> UserInDB:
+    return UserInDB(
+        _id=str(ObjectId()),
+        username="alice",
+        email="alice@example.com",
+        hashed_password="x",
+        phone="+1 555 0100",
+        address="1 Main Street",
+        updated_at=datetime(2026, 1, 1),
+    )
+
+
+def test_user_document_is_private(monkeypatch):
+    user = make_user()
+
+    async def get_user_by_id(user_id, route=None):
+        return user
+
+    monkeypatch.setattr(user_service, "get_user_by_id", get_user_by_id)
+    client = TestClient(app)
+
+    response = client.get(f"/api/v1/users/{user.id}")
+    assert response.status_code == 200
+    assert response.json()["email"] == user.email
+    assert response.headers["Cache-Control"].startswith("private,")
+
+    revalidated = client.get(f"/api/v1/users/{user.id}",
+                             headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["Cache-Control"].startswith("private,")